@@ -0,0 +1,225 @@
+##################################################################
+#        HEADLESS BATCH RENDERFARM PACKAGER (RUN WITH MAYAPY)    #
+##################################################################
+#
+#   mayapy batch.py shot_010.ma shot_020.ma -l D:/RenderFarm -j 4
+#   mayapy batch.py -m shots.json -r report.json
+#   mayapy batch.py --smoke
+#
+#   A shot manifest is a JSON list of scenes, either plain paths or
+#   {"scene": path, "project": project name, "name": scene name}.
+#   Project and scene name default to the scene file name, and two scenes
+#   can't be packaged into the same project. --smoke packages an empty
+#   scene in a temporary folder, to check the packager still runs.
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+
+# Start Maya once in every worker process
+def init_worker():
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+
+
+"""
+    Desc:
+        Worker: open one scene and run every preparation step on it
+    Parameters:
+        job: dict with scene, project, name, location, textures,
+             referencedOnly, incremental, store and resume keys
+    Returns:
+        summary dict of the scene
+"""
+def package_scene(job):
+    import maya.cmds as mc
+    import farmprep
+
+    summary = {"scene": job["scene"], "project": job["project"], "status": "ok",
+               "error": "", "timings": [], "resumed": "", "zip": "", "bytes": 0, "copied": 0}
+    start = time.time()
+    try:
+        mc.file(job["scene"], open=True, force=True)
+        maya_dir = job["location"] + "/" + job["project"]
+        # Scenes already run in parallel, so each one zips on a single core
+        result = farmprep.prepare_scene(maya_dir, job["name"], job["textures"],
+                                        job["referencedOnly"], job["incremental"], processes=0,
+                                        store=job["store"], resume=job["resume"])
+        summary["timings"] = result["timings"]
+        summary["resumed"] = result["resumed"]
+        summary["zip"] = maya_dir + ".zip"
+        if result["zip"] is not None:
+            summary["bytes"] = result["zip"].totals["total"][0]
+        if result["sync"] is not None:
+            summary["copied"] = len(result["sync"].copied)
+    except Exception:
+        summary["status"] = "failed"
+        summary["error"] = traceback.format_exc()
+    summary["elapsed"] = time.time() - start
+
+    return summary
+
+
+# Read the scenes of a shot manifest
+def read_manifest(filename):
+    with open(filename) as f:
+        entries = json.load(f)
+    shots = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            shots.append(entry)
+        else:
+            shots.append({"scene": entry})
+    return shots
+
+
+# Build the jobs handed to the workers
+def make_jobs(shots, args):
+    jobs = []
+    for shot in shots:
+        base = os.path.splitext(os.path.basename(shot["scene"]))[0]
+        jobs.append({
+            "scene": os.path.abspath(shot["scene"]),
+            "project": shot.get("project") or base,
+            "name": shot.get("name") or base,
+            "location": args.location,
+            "textures": args.textures,
+            "referencedOnly": not args.all_textures,
+            "incremental": not args.full_copy,
+            "store": args.store,
+            "resume": not args.no_resume,
+        })
+    return jobs
+
+
+# Jobs packaged into the same project folder (and so the same journal and
+# zip), as {project folder: [scenes]}
+def duplicate_projects(jobs):
+    scenes = {}
+    for job in jobs:
+        key = os.path.normcase(os.path.normpath(os.path.join(job["location"], job["project"])))
+        scenes.setdefault(key, []).append(job["scene"])
+    return dict((key, s) for key, s in scenes.items() if len(s) > 1)
+
+
+"""
+    Desc:
+        Package an empty scene in a temporary folder, in this process,
+        through the same steps as a real job. Catches a packager that
+        can't even be imported under mayapy.
+    Parameters:
+        NONE
+    Returns:
+        summary dict of the scene, see package_scene
+"""
+def smoke_test():
+    import maya.cmds as mc
+
+    tmp = tempfile.mkdtemp(prefix="farmSmoke")
+    try:
+        textures = os.path.join(tmp, "textures")
+        os.makedirs(textures)
+        scene = os.path.join(tmp, "smoke.ma")
+        mc.file(new=True, force=True)
+        mc.file(rename=scene)
+        mc.file(save=True, type='mayaAscii')
+
+        job = make_jobs([{"scene": scene}], argparse.Namespace(
+            location=os.path.join(tmp, "farm").replace("\\", "/"), textures=textures, all_textures=False,
+            full_copy=False, store=None, no_resume=True))[0]
+        summary = package_scene(job)
+        if summary["status"] == "ok" and not os.path.isfile(summary["zip"]):
+            summary["status"] = "failed"
+            summary["error"] = "no zip file written"
+        return summary
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# Print the summary of every scene
+def print_report(summaries, elapsed):
+    failed = [s for s in summaries if s["status"] != "ok"]
+    print("")
+    print("%-40s %-7s %8s %10s  %s" % ("scene", "status", "time", "MB", "steps"))
+    for s in summaries:
+        steps = ", ".join("%s %.1fs" % t for t in s["timings"])
+        print("%-40s %-7s %7.1fs %10.1f  %s" % (os.path.basename(s["scene"]), s["status"],
+                                                s["elapsed"], s["bytes"] / (1024.0 * 1024.0), steps))
+    for s in summaries:
+        if s["resumed"]:
+            print("%s resumed after: %s" % (os.path.basename(s["scene"]), s["resumed"]))
+    for s in failed:
+        print("")
+        print("%s failed:" % s["scene"])
+        print(s["error"])
+    print("%d scenes packaged, %d failed in %.1fs" % (len(summaries) - len(failed), len(failed), elapsed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Package Maya scenes for the render farm")
+    parser.add_argument("scenes", nargs="*", help="scenes to package")
+    parser.add_argument("-m", "--manifest", help="JSON shot manifest listing the scenes")
+    parser.add_argument("-l", "--location", default="D:/RenderFarm", help="folder the projects are created in")
+    parser.add_argument("-t", "--textures", default=None, help="texture library")
+    parser.add_argument("-s", "--store", help="shared content-addressed texture store, see castore")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of scenes packaged in parallel")
+    parser.add_argument("-r", "--report", help="write the summary to this JSON file")
+    parser.add_argument("--all-textures", action="store_true", help="copy the whole texture library")
+    parser.add_argument("--full-copy", action="store_true", help="wipe sourceimages instead of syncing it")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="start from zero instead of resuming interrupted scenes")
+    parser.add_argument("--smoke", action="store_true",
+                        help="package an empty scene in a temporary folder and exit")
+    args = parser.parse_args(argv)
+
+    if args.smoke:
+        init_worker()
+        summary = smoke_test()
+        print_report([summary], summary["elapsed"])
+        return 0 if summary["status"] == "ok" else 1
+
+    if args.textures is None:
+        import farmprep
+        args.textures = farmprep.g_texturesPath
+
+    shots = [{"scene": scene} for scene in args.scenes]
+    if args.manifest:
+        shots += read_manifest(args.manifest)
+    if not shots:
+        parser.error("no scenes to package")
+
+    jobs = make_jobs(shots, args)
+    duplicates = duplicate_projects(jobs)
+    if duplicates:
+        parser.error("scenes sharing a project folder, give them a project name in a manifest:\n"
+                     + "\n".join("%s: %s" % (key, ", ".join(s)) for key, s in sorted(duplicates.items())))
+    start = time.time()
+    # A fresh Maya for every scene, so one scene can't leak into the next
+    pool = multiprocessing.Pool(args.jobs, initializer=init_worker, maxtasksperchild=1)
+    summaries = []
+    try:
+        for summary in pool.imap_unordered(package_scene, jobs):
+            print("%s: %s (%.1fs)" % (summary["scene"], summary["status"], summary["elapsed"]))
+            summaries.append(summary)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    print_report(summaries, time.time() - start)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summaries, f, indent=4)
+
+    return 0 if all(s["status"] == "ok" for s in summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+##################################################################
+#          CONTENT-ADDRESSED STORE FOR PACKAGED TEXTURES          #
+##################################################################
+#
+#   Textures are stored once, by sha1, in a store shared by every shot:
+#       <store>/objects/<first 2 chars of hash>/<hash>
+#   A shot archive carries the manifest of its sourceimages folder and
+#   only the blobs the store doesn't have yet. On the farm:
+#       python castore.py unpack shot.zip <store> <dest>
+#   extracts the archive, moves the new blobs into the store and rebuilds
+#   sourceimages with hard links (or reflinks/copies) from the store.
+#   Blobs are made read-only: a hard link shares its data with the store,
+#   so a texture edited in place in sourceimages would otherwise change
+#   every shot using it.
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+import texturesync
+
+
+# Manifest of the sourceimages folder, saved in the project folder
+MANIFEST_NAME = "sourceimages.cas.json"
+MANIFEST_VERSION = 1
+
+# Folder of the archive holding the blobs missing from the store
+BLOBS_DIR = ".blobs"
+
+
+# Path of a blob in the store
+def blob_path(store, digest):
+    return os.path.join(store, "objects", digest[:2], digest)
+
+
+# Archive name of a blob, the extension lets the packager store/deflate it
+def blob_arcname(project, digest, relpath):
+    return "/".join([project, BLOBS_DIR, digest + os.path.splitext(relpath)[1].lower()])
+
+
+"""
+    Desc:
+        Build the manifest of a folder: hash and size of every file. The
+        hashes of an incremental texture sync are reused when size and
+        mtime still match, so a synced folder isn't read again.
+    Parameters:
+        root: folder to describe, e.g. the project sourceimages folder
+        progress: optional Progress
+    Returns:
+        dict {relative path: {"hash": sha1, "size": bytes}}
+"""
+def build_manifest(root, progress=None):
+    synced = texturesync.load_manifest(root)
+    files = texturesync.scan_files(root)
+    manifest = {}
+    toHash = []
+
+    for relpath, (size, mtime) in files.items():
+        known = synced.get(relpath)
+        if known and known["size"] == size and known["mtime"] == mtime:
+            manifest[relpath] = {"hash": known["hash"], "size": size}
+        else:
+            toHash.append(relpath)
+
+    if progress is not None:
+        progress.start("Hashing textures", sum(files[r][0] for r in toHash))
+    for relpath in toHash:
+        digest = texturesync.hash_file(os.path.join(root, relpath), progress)
+        manifest[relpath] = {"hash": digest, "size": files[relpath][0]}
+
+    return manifest
+
+
+def write_manifest(filename, manifest):
+    with open(filename, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": manifest}, f, indent=1, sort_keys=True)
+
+
+def read_manifest(filename):
+    with open(filename) as f:
+        data = json.load(f)
+    if data.get("version") != MANIFEST_VERSION:
+        raise ValueError("Unsupported manifest version in %s" % filename)
+    return data["files"]
+
+
+"""
+    Desc:
+        Find the blobs of a manifest the store doesn't have yet
+    Parameters:
+        manifest: dict as returned by build_manifest
+        store: path to the shared store
+    Returns:
+        dict {sha1: relative path of one file with that content}
+"""
+def missing_blobs(manifest, store):
+    missing = {}
+    for relpath in sorted(manifest):
+        digest = manifest[relpath]["hash"]
+        if digest not in missing and not os.path.isfile(blob_path(store, digest)):
+            missing[digest] = relpath
+    return missing
+
+
+"""
+    Desc:
+        Copy a file into the store under its hash, atomically. The data is
+        hashed while it is copied and the blob is made read-only. When
+        another unpack adds the same blob at the same time, its copy is
+        kept and this one dropped.
+    Parameters:
+        store: path to the shared store
+        digest: sha1 the data must have
+        fileobj: file object to read the data from
+    Returns:
+        path of the blob
+    Raises:
+        ValueError if the data doesn't match the digest
+"""
+def add_blob(store, digest, fileobj):
+    dest = blob_path(store, digest)
+    if os.path.isfile(dest):
+        return dest
+    destdir = os.path.dirname(dest)
+    if not os.path.exists(destdir):
+        try:
+            os.makedirs(destdir)
+        except OSError:
+            if not os.path.isdir(destdir):
+                raise
+    fd, tmpname = tempfile.mkstemp(prefix=digest, dir=destdir)
+    try:
+        sha = hashlib.sha1()
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(texturesync.CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+        if sha.hexdigest() != digest:
+            raise ValueError("Blob %s is corrupt, its data hashes to %s" % (digest, sha.hexdigest()))
+        os.chmod(tmpname, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        if not os.path.isfile(dest):
+            try:
+                os.rename(tmpname, dest)
+            except OSError:
+                # Added by another unpack in the meantime (Windows won't
+                # rename over an existing file)
+                if not os.path.isfile(dest):
+                    raise
+    finally:
+        if os.path.exists(tmpname):
+            os.chmod(tmpname, stat.S_IWRITE | stat.S_IREAD)
+            os.remove(tmpname)
+    return dest
+
+
+# Hard link src to dest, else try a reflink (copy on write), else copy
+def link_file(src, dest):
+    try:
+        os.link(src, dest)
+        return "linked"
+    except (OSError, AttributeError):
+        pass
+    if sys.platform.startswith("linux"):
+        with open(os.devnull, "w") as devnull:
+            if subprocess.call(["cp", "--reflink=always", src, dest], stderr=devnull) == 0:
+                return "reflinked"
+    shutil.copy2(src, dest)
+    return "copied"
+
+
+"""
+    Desc:
+        Rebuild a folder from a manifest and the store
+    Parameters:
+        manifest: dict as returned by build_manifest
+        store: path to the shared store
+        dest: folder to rebuild, e.g. the project sourceimages folder
+    Returns:
+        dict counting the linked, reflinked and copied files
+"""
+def rebuild(manifest, store, dest):
+    counts = {"linked": 0, "reflinked": 0, "copied": 0}
+    for relpath, entry in manifest.items():
+        target = os.path.join(dest, relpath)
+        targetdir = os.path.dirname(target)
+        if not os.path.exists(targetdir):
+            os.makedirs(targetdir)
+        if os.path.exists(target):
+            os.remove(target)
+        counts[link_file(blob_path(store, entry["hash"]), target)] += 1
+    return counts
+
+
+"""
+    Desc:
+        Farm side: extract a shot archive, move its blobs into the store
+        and rebuild the sourceimages folder of every project it holds
+    Parameters:
+        archive: shot zip made in content-addressed mode
+        store: path to the shared store
+        dest: folder to extract to
+    Returns:
+        dict counting the linked, reflinked and copied files
+"""
+def unpack_archive(archive, store, dest):
+    counts = {"linked": 0, "reflinked": 0, "copied": 0}
+    projects = []
+    with zipfile.ZipFile(archive) as zf:
+        for zinfo in zf.infolist():
+            parts = zinfo.filename.rstrip("/").split("/")
+            if len(parts) == 3 and parts[1] == BLOBS_DIR:
+                digest = os.path.splitext(parts[2])[0]
+                with zf.open(zinfo) as blob:
+                    add_blob(store, digest, blob)
+                continue
+            zf.extract(zinfo, dest)
+            if len(parts) == 2 and parts[1] == MANIFEST_NAME:
+                projects.append(parts[0])
+
+    for project in projects:
+        projectDir = os.path.join(dest, project)
+        manifest = read_manifest(os.path.join(projectDir, MANIFEST_NAME))
+        for key, value in rebuild(manifest, store, os.path.join(projectDir, "sourceimages")).items():
+            counts[key] += value
+    return counts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 5 or sys.argv[1] != "unpack":
+        print("usage: python castore.py unpack <archive.zip> <store> <dest>")
+        sys.exit(2)
+    print("Rebuilt sourceimages: %s" % unpack_archive(sys.argv[2], sys.argv[3], sys.argv[4]))
@@ -0,0 +1,192 @@
+##################################################################
+#          COLLECT FILES ACTUALLY REFERENCED BY THE SCENE         #
+##################################################################
+
+import maya.cmds as mc
+import maya.api.OpenMaya as om
+import hashlib
+import os
+import re
+
+import pathremap
+
+
+# Node types carrying a file path and the attribute holding it
+FILE_ATTRIBUTES = [
+    ("file", "fileTextureName"),
+    ("aiImage", "filename"),
+    ("aiPhotometricLight", "aiFilename"),
+    ("aiStandIn", "dso"),
+    ("aiVolume", "filename"),
+    ("imagePlane", "imageName"),
+    ("gpuCache", "cacheFileName"),
+    ("AlembicNode", "abc_File"),
+]
+
+# uvTilingMode values of the file node
+TILING_OFF = 0
+TILING_ZBRUSH = 1
+TILING_MUDBOX = 2
+TILING_MARI = 3
+
+# Tile and frame tokens, and the regex each one stands for on disk
+TOKENS = [
+    (r"<udim>|_MAPID_", r"\d{4}"),
+    (r"<uvtile>", r"u-?\d+_v-?\d+"),
+    (r"<u>|<v>", r"-?\d+"),
+    (r"<f\d*>|<frame>", r"-?\d+"),
+    (r"#+", r"-?\d+"),
+    (r"%0?\d*d", r"-?\d+"),
+]
+TOKEN_RE = re.compile("|".join("(%s)" % t for t, _ in TOKENS), re.IGNORECASE)
+
+# UDIM tiles go from 1001 to 9999
+UDIM_RE = re.compile(r"(?<!\d)(100[1-9]|10[1-9]\d|1[1-9]\d\d|[2-9]\d{3})(?!\d)")
+UVTILE_RE = re.compile(r"u-?\d+_v-?\d+", re.IGNORECASE)
+DIGITS_RE = re.compile(r"\d+")
+
+# Folder of sourceimages the textures found outside the library are copied to
+EXTERNAL_DIR = "external"
+
+
+# Path in sourceimages of a file outside the library: one folder per source
+# folder, named after it and a hash of its full path so names don't clash
+def external_relpath(filename):
+    dirname, basename = os.path.split(os.path.abspath(filename))
+    key = hashlib.sha1(os.path.normcase(dirname).encode("utf-8")).hexdigest()[:8]
+    return "/".join([EXTERNAL_DIR, "%s_%s" % (os.path.basename(dirname), key), basename])
+
+
+# Turn a file name with tokens into a regex matching every tile/frame on disk
+def token_regex(basename):
+    pattern = ""
+    pos = 0
+    for match in TOKEN_RE.finditer(basename):
+        pattern += re.escape(basename[pos:match.start()])
+        pattern += TOKENS[match.lastindex - 1][1]
+        pos = match.end()
+    pattern += re.escape(basename[pos:])
+    return re.compile(pattern + "$", re.IGNORECASE)
+
+
+# Put the tile/frame token back in a path written with a single tile or frame
+def tokenize(path, tilingMode=TILING_OFF, useFrameExtension=False):
+    dirname, basename = os.path.split(path)
+    if TOKEN_RE.search(basename):
+        return path
+
+    if tilingMode == TILING_MARI:
+        matches = list(UDIM_RE.finditer(basename))
+        if matches:
+            m = matches[-1]
+            basename = basename[:m.start()] + "<UDIM>" + basename[m.end():]
+    elif tilingMode in (TILING_ZBRUSH, TILING_MUDBOX):
+        basename = UVTILE_RE.sub("<UVTILE>", basename)
+
+    if useFrameExtension:
+        stem, ext = os.path.splitext(basename)
+        matches = [m for m in DIGITS_RE.finditer(stem)]
+        if matches:
+            m = matches[-1]
+            stem = stem[:m.start()] + "#" + stem[m.end():]
+        basename = stem + ext
+
+    return os.path.join(dirname, basename)
+
+
+"""
+    Desc:
+        Expand UDIM/<UDIM>, <UVTILE> and frame sequence tokens of a path
+        to the files existing on disk
+    Parameters:
+        path: file path, with or without tokens
+        listings: optional dict used to cache directory listings
+    Returns:
+        sorted list of existing file paths
+"""
+def expand_path(path, listings=None):
+    if listings is None:
+        listings = {}
+    dirname, basename = os.path.split(path)
+    if not TOKEN_RE.search(basename):
+        return [path] if os.path.isfile(path) else []
+
+    if dirname not in listings:
+        try:
+            listings[dirname] = os.listdir(dirname or ".")
+        except OSError:
+            listings[dirname] = []
+
+    regex = token_regex(basename)
+    return sorted(os.path.join(dirname, f) for f in listings[dirname] if regex.match(f))
+
+
+# Return the node types of FILE_ATTRIBUTES known to this session
+def available_file_attributes():
+    known = set(mc.allNodeTypes())
+    return [(t, a) for t, a in FILE_ATTRIBUTES if t in known]
+
+
+"""
+    Desc:
+        Gather the paths used by file bearing nodes of the scene, with
+        tile and frame tokens still in them
+    Parameters:
+        NONE
+    Returns:
+        list of (node, path) tuples
+"""
+def scene_file_paths():
+    paths = []
+    for nodeType, attr in available_file_attributes():
+        if nodeType == "file":
+            # Tiling and frame settings read in the same pass as the path
+            readers = [(attr, om.MPlug.asString), ("uvTilingMode", om.MPlug.asInt),
+                       ("useFrameExtension", om.MPlug.asBool)]
+            for node, (path, tilingMode, useFrameExtension) in pathremap.read_attributes(nodeType, readers):
+                if path:
+                    paths.append((node, tokenize(path, tilingMode, useFrameExtension)))
+            continue
+        for node, path in pathremap.read_paths(nodeType, attr):
+            if path:
+                paths.append((node, path))
+    return paths
+
+
+"""
+    Desc:
+        Collect the closure of files referenced by the scene which live
+        under root, after expanding tiles and frame sequences
+    Parameters:
+        root: library folder the textures are copied from
+    Returns:
+        (set of paths relative to root, missing paths, paths outside root).
+        The .tx made next to a texture is collected along with it. Files
+        outside root are meant to be copied to external_relpath.
+"""
+def collect_files(root):
+    rootKey = os.path.normcase(os.path.abspath(root)) + os.sep
+    listings = {}
+    relpaths = set()
+    missing = []
+    external = []
+
+    for node, path in scene_file_paths():
+        files = expand_path(path, listings)
+        if not files:
+            missing.append(path)
+            continue
+        # Arnold picks the .tx made next to a texture when there is one
+        for filename in list(files):
+            tx = os.path.splitext(filename)[0] + ".tx"
+            if tx != filename and os.path.isfile(tx):
+                files.append(tx)
+
+        for filename in files:
+            key = os.path.normcase(os.path.abspath(filename))
+            if key.startswith(rootKey):
+                relpaths.add(os.path.relpath(os.path.abspath(filename), os.path.abspath(root)).replace(os.sep, "/"))
+            elif filename not in external:
+                external.append(filename)
+
+    return relpaths, missing, external
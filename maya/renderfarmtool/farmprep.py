@@ -0,0 +1,369 @@
+##################################################################
+#      RENDERFARM FILE PREPARATION STEPS, WITHOUT ANY UI          #
+##################################################################
+
+import maya.cmds as mc
+import maya.mel as mel
+import os
+import shutil
+import time
+
+import packager
+import castore
+import journal
+import dependencies
+import pathremap
+import references
+import texturesync
+
+
+# Global variable
+g_texturesPath = "R:/Hand-ins/MDDN541/TOM/MAYA/TEXTURES"
+g_storePath = "R:/Hand-ins/MDDN541/TOM/MAYA/TEXTURESTORE"
+
+
+# Create folder function definition
+def create_folder( directory ):
+    if not os.path.exists( directory ):
+        os.makedirs( directory )
+
+
+# Import all references into current scene file, and print the slowest ones
+def import_references():
+    report = references.import_references()
+    print("References: %s" % report)
+    for rn, path, seconds in report.slowest():
+        print("  %6.2fs %s (%s)" % (seconds, rn, path))
+    for rn, reason in report.skipped:
+        print("  skipped %s: %s" % (rn, reason))
+    return report
+
+
+# Mapper making paths relative to the project: the texture library, the
+# external textures (dict {relative path in sourceimages: source file}) and
+# any "sourceimages" folder all end up in the project sourceimages folder
+def sourceimages_mapper(texturesPath, externals=None):
+    rootKey = os.path.normcase(os.path.normpath(texturesPath)) + os.sep
+    # Tile and frame tokens are only ever in the file name, the folder of
+    # a path is enough to find where its files were copied
+    externalDirs = dict((os.path.normcase(os.path.dirname(os.path.abspath(filename))), relpath.rsplit("/", 1)[0])
+                        for relpath, filename in (externals or {}).items())
+    def mapper(path):
+        key = os.path.normcase(os.path.normpath(path))
+        if key.startswith(rootKey):
+            return "sourceimages/" + os.path.normpath(path)[len(rootKey):].replace(os.sep, "/")
+        folder = externalDirs.get(os.path.normcase(os.path.dirname(os.path.abspath(path))))
+        if folder is not None:
+            return "sourceimages/%s/%s" % (folder, os.path.basename(path))
+        return pathremap.sourceimages_relative(path)
+    return mapper
+
+
+# Normalized path and modification time of a scene file
+def scene_stamp(path):
+    if not path or not os.path.isfile(path):
+        return "", None
+    return os.path.normcase(os.path.abspath(path)), os.path.getmtime(path)
+
+
+"""
+    Desc:
+        What a run depends on: the open scene file and its modification
+        time, and the settings of every stage. A journal recorded with
+        other ones is stale.
+    Parameters:
+        sceneName, texturesPath, referencedOnly, incremental, store: see
+        prepare_scene
+    Returns:
+        dict of the settings
+"""
+def run_settings(sceneName, texturesPath=g_texturesPath, referencedOnly=True, incremental=True, store=None):
+    source, mtime = scene_stamp(mc.file(query=True, sceneName=True))
+    return {"source": source, "mtime": mtime, "sceneName": sceneName, "texturesPath": texturesPath,
+            "referencedOnly": referencedOnly, "incremental": incremental, "store": store}
+
+
+# Whether a journal was recorded for these settings. The open scene may
+# also be the one the interrupted run saved, if it is still untouched.
+def journal_matches(runJournal, settings):
+    recorded = runJournal.settings()
+    if recorded is None:
+        return False
+    if any(recorded.get(key) != value for key, value in settings.items() if key not in ("source", "mtime")):
+        return False
+    stamp = [settings["source"], settings["mtime"]]
+    if stamp == [recorded.get("source"), recorded.get("mtime")]:
+        return True
+    saved = runJournal.data("scene")
+    return saved is not None and stamp == [saved.get("saved"), saved.get("savedMtime")]
+
+
+"""
+    Desc:
+        Open the checkpoint journal of a preparation run, kept next to the
+        project folder so it isn't zipped with it
+    Parameters:
+        maya_dir: path to the Maya project folder
+        resume: keep what a previous, interrupted run recorded
+        settings: optional run_settings, the journal is reset when it was
+                  recorded for another scene or other settings
+    Returns:
+        journal.Journal
+"""
+def open_journal(maya_dir, resume=True, settings=None):
+    # The settings are recorded before the project folder is created
+    create_folder(os.path.dirname(os.path.abspath(maya_dir)))
+    runJournal = journal.Journal(os.path.normpath(maya_dir) + ".journal")
+    if not resume:
+        runJournal.reset()
+    elif settings is not None and runJournal.records and not journal_matches(runJournal, settings):
+        print("Journal of another scene or other settings, starting from zero")
+        runJournal.reset()
+    if settings is not None and not runJournal.records:
+        runJournal.start(settings)
+    return runJournal
+
+
+# Describe what an interrupted run already did, empty when nothing
+def describe_resume(runJournal):
+    done = []
+    for stage in ("scene", "textures", "zip"):
+        if runJournal.isDone(stage):
+            done.append("%s done" % stage)
+        elif runJournal.batches(stage):
+            done.append("%s %d batches" % (stage, len(runJournal.batches(stage))))
+    return ", ".join(done)
+
+
+"""
+    Desc:
+        Create the Maya project folder and the folders of every workspace
+        file rule
+    Parameters:
+        maya_dir: path to the Maya project folder
+    Returns:
+        NONE
+"""
+def create_project(maya_dir):
+    # Create project structure
+    create_folder(maya_dir)
+
+    mel.eval('setProject \"' + maya_dir + '\"')
+
+    # Create folder structure
+    for file_rule in mc.workspace(query=True, fileRuleList=True):
+        file_rule_dir = mc.workspace(fileRuleEntry=file_rule)
+        create_folder(os.path.join(maya_dir, file_rule_dir))
+
+
+"""
+    Desc:
+        Run the steps which need the Maya API on the open scene: project
+        creation, reference import, texture collection, relative path
+        rewrite and save
+    Parameters:
+        maya_dir: path to the Maya project folder
+        sceneName: name of the .ma file to save, without extension
+        texturesPath: texture library the textures are copied from
+        referencedOnly: only collect the textures the scene uses
+        status: function called with a message before every step
+        runJournal: optional journal, skips everything if the scene was
+                    saved by a previous run
+    Returns:
+        relative paths of the textures to copy, None to copy them all, and
+        dict {relative path in sourceimages: source file} of the textures
+        found outside the library, copied along with them
+"""
+def prepare_maya_scene(maya_dir, sceneName, texturesPath=g_texturesPath, referencedOnly=True, status=None,
+                       runJournal=None):
+    status = status or (lambda text: None)
+    if runJournal is not None and runJournal.isDone("scene"):
+        status("Scene already prepared by the previous run, skipped.")
+        data = runJournal.data("scene")
+        return data["textures"], data.get("externals", {})
+
+    status("Creating project and workspace ...")
+    create_project(maya_dir)
+
+    # Import the references into maya file before saving
+    status("Importing references ...")
+    import_references()
+
+    # The textures used by the scene, with UDIMs and sequences expanded,
+    # collected while the paths are still absolute. Those outside the
+    # library are copied too, whether or not the whole library is.
+    status("Collecting referenced textures ...")
+    textures, missing, external = dependencies.collect_files(texturesPath)
+    print("%d referenced textures, %d missing, %d outside of %s"
+          % (len(textures), len(missing), len(external), texturesPath))
+    for path in missing:
+        print("Missing texture: " + path)
+    externals = {}
+    for filename in external:
+        relpath = dependencies.external_relpath(filename)
+        externals[relpath] = filename
+        print("Texture outside of %s, copied to sourceimages/%s: %s" % (texturesPath, relpath, filename))
+    if not referencedOnly:
+        textures = None
+
+    status("Setting relative path to textures ...")
+    result = pathremap.remap_paths(sourceimages_mapper(texturesPath, externals),
+                                   dependencies.available_file_attributes())
+    print("Relative paths: %s" % result)
+    for node, path in result.skipped:
+        print("No sourceimages folder in %s: %s" % (node, path))
+
+    # Save the file as .ma
+    status("Saving scene file ...")
+    mc.file(rename=sceneName + ".ma")
+    mc.file(save=True, type='mayaAscii')
+
+    if runJournal is not None:
+        saved, savedMtime = scene_stamp(mc.file(query=True, sceneName=True))
+        runJournal.complete("scene", {"textures": sorted(textures) if textures is not None else None,
+                                      "externals": externals, "saved": saved, "savedMtime": savedMtime})
+
+    return textures, externals
+
+
+"""
+    Desc:
+        Copy the textures into the project sourceimages folder
+    Parameters:
+        maya_dir: path to the Maya project folder
+        textures: relative paths to copy, None to copy the whole library
+        texturesPath: texture library the textures are copied from
+        incremental: only copy what changed since the last run, otherwise
+                     sourceimages is wiped and copied again
+        progress: optional Progress
+        runJournal: optional journal, the copy is checkpointed in it
+        externals: optional dict {relative path in sourceimages: source
+                   file} of textures from outside the library
+    Returns:
+        texturesync.SyncResult, None if done by the previous run
+"""
+def copy_textures(maya_dir, textures=None, texturesPath=g_texturesPath, incremental=True, progress=None,
+                  runJournal=None, externals=None):
+    if runJournal is not None and runJournal.isDone("textures"):
+        return None
+
+    destexpath = maya_dir + "/sourceimages"
+    resuming = runJournal is not None and runJournal.batches("textures")
+    if not incremental and not resuming and os.path.exists(destexpath):
+        # Delete sourceimages folder and copy everything again
+        shutil.rmtree(destexpath)
+
+    checkpoint = None
+    if runJournal is not None:
+        checkpoint = lambda data: runJournal.batch("textures", data)
+    result = texturesync.sync_directory(texturesPath, destexpath, textures, progress=progress,
+                                        checkpoint=checkpoint, extra=externals)
+
+    if runJournal is not None:
+        runJournal.complete("textures")
+    return result
+
+
+"""
+    Desc:
+        Zip the project folder next to it, with the same name. With a store
+        the archive carries the manifest of sourceimages and only the
+        textures the store doesn't have, see castore.
+    Parameters:
+        maya_dir: path to the Maya project folder
+        processes: number of compression processes, see packager
+        progress: optional Progress
+        store: optional path to the shared content-addressed store
+        runJournal: optional journal, the zip is checkpointed in it
+    Returns:
+        packager.PackStats, None if done by the previous run
+"""
+def zip_project(maya_dir, processes=None, progress=None, store=None, runJournal=None):
+    if runJournal is not None and runJournal.isDone("zip"):
+        return None
+
+    # The sync manifest is only of use to the next sync
+    options = {"processes": processes, "progress": progress,
+               "exclude": ["sourceimages/" + texturesync.MANIFEST_NAME]}
+    if runJournal is not None:
+        batches = runJournal.batches("zip")
+        if batches:
+            options["resume"] = {"offset": batches[-1]["offset"],
+                                 "entries": [e for b in batches for e in b["entries"]]}
+        options["checkpoint"] = lambda data: runJournal.batch("zip", data)
+
+    if store:
+        options.update(content_addressed_options(maya_dir, store, progress))
+    stats = packager.make_zipfile(maya_dir + ".zip", maya_dir, **options)
+
+    if runJournal is not None:
+        runJournal.complete("zip")
+    return stats
+
+
+# Archive options of the content-addressed mode, see castore
+def content_addressed_options(maya_dir, store, progress=None):
+    sourceimages = os.path.join(maya_dir, "sourceimages")
+    manifest = castore.build_manifest(sourceimages, progress)
+    castore.write_manifest(os.path.join(maya_dir, castore.MANIFEST_NAME), manifest)
+
+    project = os.path.basename(os.path.normpath(maya_dir))
+    blobs = [(os.path.join(sourceimages, relpath), castore.blob_arcname(project, digest, relpath))
+             for digest, relpath in castore.missing_blobs(manifest, store).items()]
+    print("%d textures, %d new blobs for the store" % (len(manifest), len(blobs)))
+
+    return {"exclude": ["sourceimages"], "extra_files": blobs}
+
+
+"""
+    Desc:
+        Run every preparation step on the open scene, one after the other.
+        Every step is checkpointed in a journal next to the project, so a
+        run interrupted by a crash picks up where it stopped.
+    Parameters:
+        maya_dir: path to the Maya project folder
+        sceneName: name of the .ma file to save, without extension
+        texturesPath: texture library the textures are copied from
+        referencedOnly: only copy the textures the scene uses
+        incremental: only copy the textures which changed
+        processes: number of compression processes, see packager
+        store: optional path to the shared content-addressed store
+        status: function called with a message before every step
+        resume: resume an interrupted run of the same scene with the same
+                settings instead of starting from zero
+    Returns:
+        dict with the seconds spent per step, the sync result and zip stats
+        (None for the steps done by a previous run)
+"""
+def prepare_scene(maya_dir, sceneName, texturesPath=g_texturesPath, referencedOnly=True,
+                  incremental=True, processes=None, store=None, status=None, resume=True):
+    status = status or (lambda text: None)
+    runJournal = open_journal(maya_dir, resume,
+                              run_settings(sceneName, texturesPath, referencedOnly, incremental, store))
+    resumed = describe_resume(runJournal)
+    if resumed:
+        status("Resuming previous run: " + resumed)
+    timings = []
+
+    start = time.time()
+    textures, externals = prepare_maya_scene(maya_dir, sceneName, texturesPath, referencedOnly, status,
+                                             runJournal)
+    timings.append(("scene", time.time() - start))
+
+    start = time.time()
+    status("Copying textures ...")
+    syncResult = copy_textures(maya_dir, textures, texturesPath, incremental, runJournal=runJournal,
+                               externals=externals)
+    if syncResult is None:
+        status("Textures already copied by the previous run, skipped.")
+    timings.append(("textures", time.time() - start))
+
+    start = time.time()
+    status("Creating zip file ...")
+    stats = zip_project(maya_dir, processes, store=store, runJournal=runJournal)
+    if stats is None:
+        status("Zip file already created by the previous run, skipped.")
+    timings.append(("zip", time.time() - start))
+
+    runJournal.reset()
+    return {"timings": timings, "sync": syncResult, "zip": stats, "resumed": resumed}
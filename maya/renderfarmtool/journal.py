@@ -0,0 +1,93 @@
+##################################################################
+#        CHECKPOINT JOURNAL OF THE FILE PREPARATION STAGES        #
+##################################################################
+
+import json
+import os
+import time
+
+
+"""
+    Desc:
+        Append-only journal of a preparation run, one JSON record per
+        line. A record is written and synced to disk after every stage
+        and every file batch, so a rerun after a crash knows what is done.
+    Parameters:
+        filename: path to the journal file
+"""
+class Journal(object):
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = []
+        if os.path.isfile(filename):
+            with open(filename) as f:
+                for line in f:
+                    try:
+                        self.records.append(json.loads(line))
+                    except ValueError:
+                        # Last line cut short by the crash
+                        break
+
+    def write(self, record):
+        record["time"] = time.time()
+        with open(self.filename, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.append(record)
+
+    """
+    Desc:
+        Method to mark a stage as done
+    Parameters:
+        stage: name of the stage
+        data: optional data needed by the next stages on resume
+    Returns:
+        NONE
+    """
+    def complete(self, stage, data=None):
+        self.write({"stage": stage, "event": "done", "data": data})
+
+    """
+    Desc:
+        Method to record a batch of work done within a stage
+    Parameters:
+        stage: name of the stage
+        data: data needed to resume the stage after this batch
+    Returns:
+        NONE
+    """
+    def batch(self, stage, data):
+        self.write({"stage": stage, "event": "batch", "data": data})
+
+    # Record what the run depends on, first record of a new journal
+    def start(self, settings):
+        self.write({"stage": "run", "event": "start", "data": settings})
+
+    # Settings the run was started with, None for a journal without them
+    def settings(self):
+        for record in self.records:
+            if record["stage"] == "run" and record["event"] == "start":
+                return record["data"]
+        return None
+
+    def isDone(self, stage):
+        return any(r["stage"] == stage and r["event"] == "done" for r in self.records)
+
+    # Data given when the stage was completed
+    def data(self, stage):
+        for record in self.records:
+            if record["stage"] == stage and record["event"] == "done":
+                return record["data"]
+        return None
+
+    # Data of every batch recorded for a stage, oldest first
+    def batches(self, stage):
+        return [r["data"] for r in self.records if r["stage"] == stage and r["event"] == "batch"]
+
+    # Forget everything, the next run starts from zero
+    def reset(self):
+        self.records = []
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -0,0 +1,491 @@
+##################################################################
+#              PARALLEL, STREAMING ZIP PACKAGER                  #
+##################################################################
+
+import os
+import sys
+import time
+import zlib
+import zipfile
+import tempfile
+import shutil
+import multiprocessing
+
+from progress import Progress
+
+
+# Formats which are already compressed, deflating them again only burns CPU
+STORED_EXTENSIONS = frozenset([
+    '.exr', '.tx', '.tex', '.jpg', '.jpeg', '.png', '.abc',
+    '.zip', '.gz', '.7z', '.mov', '.mp4',
+])
+
+# Read/write block size used while streaming file data
+CHUNK_SIZE = 1024 * 1024
+
+# Deflated entries bigger than this are spooled to a temp file by the
+# worker instead of being sent back to the main process in memory
+SPOOL_LIMIT = 64 * 1024 * 1024
+
+MEGABYTE = 1024.0 * 1024.0
+
+# Bytes written between two checkpoints of a resumable zip
+CHECKPOINT_BYTES = 256 * 1024 * 1024
+
+# ZipInfo fields needed to rebuild the central directory when resuming
+ZIPINFO_FIELDS = ('filename', 'compress_type', 'CRC', 'compress_size', 'file_size', 'header_offset',
+                  'external_attr', 'flag_bits', 'create_system', 'create_version', 'extract_version')
+
+# Private ZipFile members ZipAppender relies on, checked on Python 2.7 and
+# 3.7 to 3.13. Python 3 also writes the central directory at start_dir.
+ZIPFILE_INTERNALS = ('_writecheck', '_didModify', 'filelist', 'NameToInfo', 'fp')
+ZIPFILE_INTERNALS_PY3 = ('start_dir',)
+
+
+"""
+    Desc:
+        Class to collect bytes and time spent for every packaging stage
+        and report the throughput in MB/s
+"""
+class PackStats(object):
+
+    def __init__(self):
+        self.stages = []
+        self.totals = {}
+
+    """
+    Desc:
+        Method to add bytes and seconds to a stage
+    Parameters:
+        stage: name of the stage
+        nbytes: number of bytes processed
+        seconds: time spent on those bytes
+    Returns:
+        NONE
+    """
+    def add(self, stage, nbytes, seconds):
+        if stage not in self.totals:
+            self.stages.append(stage)
+            self.totals[stage] = [0, 0.0]
+        self.totals[stage][0] += nbytes
+        self.totals[stage][1] += seconds
+
+    """
+    Desc:
+        Method to return the throughput of a stage in MB/s
+    Parameters:
+        stage: name of the stage
+    Returns:
+        float
+    """
+    def throughput(self, stage):
+        nbytes, seconds = self.totals.get(stage, (0, 0.0))
+        if seconds <= 0.0:
+            return 0.0
+        return nbytes / MEGABYTE / seconds
+
+    """
+    Desc:
+        Method to return one printable line per stage
+    Parameters:
+        NONE
+    Returns:
+        list of strings
+    """
+    def report(self):
+        lines = []
+        for stage in self.stages:
+            nbytes, seconds = self.totals[stage]
+            lines.append("%-8s %10.1f MB in %7.2fs (%.1f MB/s)"
+                         % (stage, nbytes / MEGABYTE, seconds, self.throughput(stage)))
+        return lines
+
+
+# Returns True when the file gains nothing from being deflated again
+def is_precompressed(filename):
+    return os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS
+
+
+# Create the pool of compression workers
+def create_pool(processes=None):
+    # Inside the Maya UI sys.executable is maya itself, which can't run the
+    # workers, so point multiprocessing to mayapy from the same install
+    exe = os.path.basename(sys.executable).lower()
+    if exe.startswith('maya') and not exe.startswith('mayapy'):
+        mayapy = os.path.join(os.path.dirname(sys.executable), 'mayapy')
+        if sys.platform == 'win32':
+            mayapy += '.exe'
+        if os.path.isfile(mayapy):
+            multiprocessing.set_executable(mayapy)
+    return multiprocessing.Pool(processes)
+
+
+# Walk the source folder and split it into directories, stored and deflated files
+def scan_tree(source_dir, exclude=None, extra_files=None):
+    relroot = os.path.abspath(os.path.join(source_dir, os.pardir))
+    excluded = set(os.path.normpath(os.path.join(source_dir, d)) for d in exclude or [])
+    dirs = []
+    stored = []
+    deflated = []
+    entries = []
+    for root, subdirs, files in os.walk(source_dir):
+        subdirs[:] = [d for d in subdirs if os.path.normpath(os.path.join(root, d)) not in excluded]
+        arcroot = os.path.relpath(root, relroot)
+        dirs.append((root, arcroot))
+        for file in files:
+            filename = os.path.join(root, file)
+            if os.path.normpath(filename) in excluded:
+                continue
+            if os.path.isfile(filename): # regular files only
+                entries.append((filename, os.path.join(arcroot, file)))
+    entries.extend(extra_files or [])
+
+    for filename, arcname in entries:
+        entry = (filename, arcname, os.path.getsize(filename))
+        if is_precompressed(arcname):
+            stored.append(entry)
+        else:
+            deflated.append(entry)
+    return dirs, stored, deflated
+
+
+# Worker: deflate a single file, returns the raw deflate stream and its CRC
+def deflate_file(job):
+    filename, arcname, spooldir, level = job
+    start = time.time()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = 0
+    size = 0
+    compress_size = 0
+    spooled = os.path.getsize(filename) > SPOOL_LIMIT
+
+    if spooled:
+        fd, out_name = tempfile.mkstemp(suffix='.deflate', dir=spooldir)
+        out = os.fdopen(fd, 'wb')
+        chunks = None
+    else:
+        out_name = None
+        out = None
+        chunks = []
+
+    try:
+        with open(filename, 'rb') as src:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                crc = zlib.crc32(chunk, crc) & 0xffffffff
+                data = compressor.compress(chunk)
+                if data:
+                    compress_size += len(data)
+                    if spooled:
+                        out.write(data)
+                    else:
+                        chunks.append(data)
+            data = compressor.flush()
+            compress_size += len(data)
+            if spooled:
+                out.write(data)
+            else:
+                chunks.append(data)
+    finally:
+        if out is not None:
+            out.close()
+
+    payload = None if spooled else b''.join(chunks)
+    return (filename, arcname, crc, size, compress_size, payload, out_name, time.time() - start)
+
+
+# Build the ZipInfo header for a file on disk
+def zipinfo_for(filename, arcname):
+    st = os.stat(filename)
+    date_time = time.localtime(st.st_mtime)[0:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    zinfo = zipfile.ZipInfo(arcname.replace(os.sep, '/'), date_time)
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    return zinfo
+
+
+# Entry of the archive as a dict which can be saved in a journal
+def zipinfo_to_dict(zinfo):
+    data = dict((field, getattr(zinfo, field)) for field in ZIPINFO_FIELDS)
+    data['date_time'] = list(zinfo.date_time)
+    return data
+
+
+# Entry of the archive back from zipinfo_to_dict
+def zipinfo_from_dict(data):
+    zinfo = zipfile.ZipInfo(data['filename'], tuple(data['date_time']))
+    for field in ZIPINFO_FIELDS[1:]:
+        setattr(zinfo, field, data[field])
+    return zinfo
+
+
+"""
+    Desc:
+        Class appending entries whose data is written outside of ZipFile,
+        the only place the packager touches private zipfile members. They
+        are checked once, when the archive is opened.
+    Parameters:
+        zf: ZipFile opened for writing
+    Raises:
+        RuntimeError if the zipfile of this Python lacks one of them
+"""
+class ZipAppender(object):
+
+    def __init__(self, zf):
+        internals = ZIPFILE_INTERNALS
+        if sys.version_info[0] >= 3:
+            internals += ZIPFILE_INTERNALS_PY3
+        missing = [name for name in internals if not hasattr(zf, name)]
+        if missing:
+            raise RuntimeError("The zipfile module of Python %d.%d has no %s, the packager can't write to it"
+                               % (sys.version_info[0], sys.version_info[1], ", ".join(missing)))
+        self.zf = zf
+        self.fp = zf.fp
+
+    # Make the central directory start after the data written so far
+    def _commit(self):
+        if sys.version_info[0] >= 3:
+            self.zf.start_dir = self.fp.tell()
+        self.zf._didModify = True
+
+    # Register the entries of a resumed archive, already written in it
+    def restore(self, zinfos):
+        for zinfo in zinfos:
+            self.zf.filelist.append(zinfo)
+            self.zf.NameToInfo[zinfo.filename] = zinfo
+        self._commit()
+
+    # Write the local header of a new entry at the end of the archive
+    def begin(self, zinfo, zip64):
+        self.zf._writecheck(zinfo)
+        # the data always ends the file while the archive is being written
+        self.fp.seek(0, 2)
+        zinfo.header_offset = self.fp.tell()
+        self.fp.write(zinfo.FileHeader(zip64))
+
+    # Register an entry once its data is written, optionally rewriting its header
+    def end(self, zinfo, zip64, rewrite=False):
+        if rewrite:
+            end = self.fp.tell()
+            self.fp.seek(zinfo.header_offset)
+            self.fp.write(zinfo.FileHeader(zip64))
+            self.fp.seek(end)
+        self.zf.filelist.append(zinfo)
+        self.zf.NameToInfo[zinfo.filename] = zinfo
+        self._commit()
+
+
+# Open the partial archive, truncated to the last checkpoint when resuming
+def open_partial(partial, resume):
+    if resume and os.path.isfile(partial) and os.path.getsize(partial) >= resume['offset']:
+        fp = open(partial, 'r+b')
+        fp.truncate(resume['offset'])
+        fp.seek(resume['offset'])
+        restored = [zipinfo_from_dict(e) for e in resume['entries']]
+    else:
+        fp = open(partial, 'wb')
+        restored = []
+
+    zf = zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+    appender = ZipAppender(zf)
+    appender.restore(restored)
+    return fp, zf, appender
+
+
+# Append a file without compression, streamed in chunks
+def write_stored(appender, filename, arcname, progress):
+    zinfo = zipinfo_for(filename, arcname)
+    zinfo.compress_type = zipfile.ZIP_STORED
+    zinfo.file_size = zinfo.compress_size = os.path.getsize(filename)
+    zinfo.CRC = 0
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT
+
+    appender.begin(zinfo, zip64)
+    crc = 0
+    with open(filename, 'rb') as src:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc) & 0xffffffff
+            appender.fp.write(chunk)
+            progress.advance(len(chunk))
+    zinfo.CRC = crc
+    appender.end(zinfo, zip64, rewrite=True)
+
+
+# Append an entry whose deflate stream was produced outside of zipfile
+def write_precompressed(appender, result):
+    filename, arcname, crc, size, compress_size, payload, spool_name, _ = result
+    zinfo = zipinfo_for(filename, arcname)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.file_size = size
+    zinfo.compress_size = compress_size
+    zip64 = size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT
+
+    appender.begin(zinfo, zip64)
+    if spool_name is None:
+        appender.fp.write(payload)
+    else:
+        with open(spool_name, 'rb') as spool:
+            shutil.copyfileobj(spool, appender.fp, CHUNK_SIZE)
+        os.remove(spool_name)
+    appender.end(zinfo, zip64)
+
+
+"""
+    Desc:
+        Zip the entire project folder. Compressible files are deflated in
+        parallel by a pool of worker processes and streamed into the
+        archive as they finish, already compressed formats are stored.
+        The archive is written to <output_filename>.partial and renamed
+        once complete.
+    Parameters:
+        output_filename: path to the zip file to create
+        source_dir: project folder to zip, its name is kept in the archive
+        processes: number of worker processes, defaults to the number of
+                   cores; 0 deflates everything in the current process
+        level: zlib compression level
+        progress: optional Progress
+        exclude: folders and files, relative to source_dir, left out of
+                 the archive
+        extra_files: (filename, arcname) tuples of files outside of
+                     source_dir to add to the archive
+        checkpoint: optional function called every CHECKPOINT_BYTES with
+                    {"offset", "entries"} for the entries written since
+                    the previous call. When given, the partial archive is
+                    kept on failure so the zip can be resumed.
+        resume: {"offset", "entries"} with all the entries of the previous
+                checkpoints, the files in it are not zipped again
+    Returns:
+        PackStats with bytes and time spent per stage. The deflate stage
+        is timed on the wall clock, from the first job handed to the
+        workers to the last result back, not summed over the workers.
+"""
+def make_zipfile(output_filename, source_dir, processes=None, level=zlib.Z_DEFAULT_COMPRESSION, progress=None,
+                 exclude=None, extra_files=None, checkpoint=None, resume=None):
+    stats = PackStats()
+    start = time.time()
+    progress = progress or Progress()
+    partial = output_filename + ".partial"
+
+    fp, zf, appender = open_partial(partial, resume)
+    done = set(zf.namelist())
+    dirs, stored, deflated = scan_tree(source_dir, exclude, extra_files)
+    dirs = [d for d in dirs if d[1].replace(os.sep, '/') + '/' not in done]
+    resumed = [e for e in stored + deflated if e[1].replace(os.sep, '/') in done]
+    stored = [e for e in stored if e[1].replace(os.sep, '/') not in done]
+    deflated = [e for e in deflated if e[1].replace(os.sep, '/') not in done]
+
+    totalBytes = sum(e[2] for e in stored + deflated)
+    stats.add('scan', totalBytes, time.time() - start)
+    if resumed:
+        stats.add('resumed', sum(e[2] for e in resumed), 0.0)
+    progress.start("Creating zip file", totalBytes)
+
+    spooldir = tempfile.mkdtemp(prefix='packager_', dir=os.path.dirname(os.path.abspath(output_filename)))
+    jobs = [(filename, arcname, spooldir, level) for filename, arcname, _ in deflated]
+    pool = None
+    complete = False
+    # entries already checkpointed, bytes written since the last checkpoint
+    state = [len(zf.infolist()), 0]
+    # bytes deflated, seconds spent by the workers, time the last result
+    # came back
+    deflate = [0, 0.0, None]
+
+    def commit(nbytes, force=False):
+        state[1] += nbytes
+        if checkpoint is None or not (force or state[1] >= CHECKPOINT_BYTES):
+            return
+        fp.flush()
+        os.fsync(fp.fileno())
+        checkpoint({'offset': fp.tell(), 'entries': [zipinfo_to_dict(z) for z in zf.infolist()[state[0]:]]})
+        state[0] = len(zf.infolist())
+        state[1] = 0
+
+    try:
+        with zf:
+            # add directories (needed for empty dirs)
+            for root, arcroot in dirs:
+                zf.write(root, arcroot)
+
+            deflateStart = time.time()
+            if processes == 0 or not jobs:
+                results = (deflate_file(job) for job in jobs)
+            else:
+                pool = create_pool(processes)
+                results = pool.imap_unordered(deflate_file, jobs)
+
+            def next_result(timeout):
+                if pool is None:
+                    return next(results)
+                return results.next(timeout)
+
+            def write_result(result):
+                t = time.time()
+                deflate[0] += result[3]
+                deflate[1] += result[7]
+                deflate[2] = t
+                write_precompressed(appender, result)
+                stats.add('write', result[4], time.time() - t)
+                progress.advance(result[3])
+                commit(result[4])
+
+            # Stream stored files while the workers deflate the rest, and
+            # drain whatever the workers have finished in between
+            pending = len(jobs)
+            for filename, arcname, size in stored:
+                t = time.time()
+                write_stored(appender, filename, arcname, progress)
+                stats.add('store', size, time.time() - t)
+                commit(size)
+                while pool is not None and pending:
+                    try:
+                        result = results.next(0)
+                    except multiprocessing.TimeoutError:
+                        break
+                    write_result(result)
+                    pending -= 1
+
+            while pending:
+                try:
+                    result = next_result(0.2)
+                except multiprocessing.TimeoutError:
+                    progress.check()
+                    continue
+                write_result(result)
+                pending -= 1
+
+            if jobs:
+                # In the current process the jobs run one after the other,
+                # their own time is the wall clock of the stage
+                stats.add('deflate', deflate[0], deflate[1] if pool is None else deflate[2] - deflateStart)
+
+            commit(0, force=True)
+
+        fp.close()
+        if os.path.exists(output_filename):
+            os.remove(output_filename)
+        os.rename(partial, output_filename)
+
+        if pool is not None:
+            pool.close()
+        complete = True
+    finally:
+        if not fp.closed:
+            fp.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        shutil.rmtree(spooldir, ignore_errors=True)
+        if not complete and checkpoint is None and os.path.exists(partial):
+            os.remove(partial)
+
+    stats.add('total', totalBytes, time.time() - start)
+
+    return stats
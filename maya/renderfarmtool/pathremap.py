@@ -0,0 +1,138 @@
+##################################################################
+#               BULK TEXTURE PATH REMAPPING                      #
+##################################################################
+
+import maya.cmds as mc
+import maya.api.OpenMaya as om
+
+import scriptspath
+import bulkedit
+
+
+"""
+    Desc:
+        Class to hold the outcome of a remap
+"""
+class RemapResult(object):
+
+    def __init__(self):
+        self.changed = []
+        self.unchanged = []
+        self.skipped = []
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return ("%d nodes changed, %d unchanged, %d skipped in %.3fs"
+                % (len(self.changed), len(self.unchanged), len(self.skipped), self.elapsed))
+
+
+# Texture path attribute of file nodes, remapped by default
+FILE_TEXTURE = [("file", "fileTextureName")]
+
+
+"""
+    Desc:
+        Read attributes of every node of a type in one pass through the
+        API, without a getAttr round trip per node and attribute
+    Parameters:
+        nodeType: node type to read
+        readers: list of (attribute name, function plug -> value), e.g.
+                 ("uvTilingMode", om.MPlug.asInt)
+    Returns:
+        list of (node, tuple of values in the order of readers)
+"""
+def read_attributes(nodeType, readers):
+    nodes = mc.ls(type=nodeType) or []
+    sel = om.MSelectionList()
+    for node in nodes:
+        sel.add(node)
+
+    values = []
+    fnNode = om.MFnDependencyNode()
+    for i in range(sel.length()):
+        fnNode.setObject(sel.getDependNode(i))
+        values.append((nodes[i], tuple(read(fnNode.findPlug(attr, False)) for attr, read in readers)))
+    return values
+
+
+"""
+    Desc:
+        Read the path attribute of every node of a type in one pass
+        through the API, without a getAttr round trip per node
+    Parameters:
+        nodeType: node type to read, file nodes by default
+        attr: name of the string attribute holding the path
+    Returns:
+        list of (node, path) tuples
+"""
+def read_paths(nodeType="file", attr="fileTextureName"):
+    return [(node, values[0]) for node, values in read_attributes(nodeType, [(attr, om.MPlug.asString)])]
+
+
+# Mapper keeping the part of the path from the "sourceimages" folder on
+def sourceimages_relative(path):
+    parts = path.split("sourceimages", 1)
+    if len(parts) < 2:
+        return None
+    return "sourceimages" + parts[1]
+
+
+# Mapper moving the part after "sourceimages" under another root folder
+def rebase_mapper(root):
+    def mapper(path):
+        parts = path.split("sourceimages", 1)
+        if len(parts) < 2:
+            return None
+        return root + parts[1]
+    return mapper
+
+
+"""
+    Desc:
+        Compute the new path of every node in pure python
+    Parameters:
+        paths: list of (node, path) tuples as returned by read_paths
+        mapper: function returning the new path, or None when the path
+                can't be mapped (e.g. it has no "sourceimages" segment)
+    Returns:
+        RemapResult, changed holds (node, old path, new path) tuples
+"""
+def compute_remap(paths, mapper):
+    result = RemapResult()
+    for node, path in paths:
+        newPath = mapper(path) if path else None
+        if newPath is None:
+            result.skipped.append((node, path))
+        elif newPath == path:
+            result.unchanged.append(node)
+        else:
+            result.changed.append((node, path, newPath))
+    return result
+
+
+"""
+    Desc:
+        Remap the file paths of the scene. The paths of every node type
+        are read in one pass each, the remap is computed in python and
+        only the plugs whose path changes are written, all in a single
+        undo chunk.
+    Parameters:
+        mapper: function path -> new path or None, see compute_remap
+        attributes: list of (node type, name of the string attribute
+                    holding the path), file nodes by default, e.g.
+                    dependencies.available_file_attributes()
+    Returns:
+        RemapResult, nodes are given as "node.attribute" plugs
+"""
+def remap_paths(mapper=sourceimages_relative, attributes=FILE_TEXTURE):
+    with bulkedit.BulkEdit("remapPaths") as edit:
+        paths = []
+        for nodeType, attr in attributes:
+            paths.extend(("%s.%s" % (node, attr), path) for node, path in read_paths(nodeType, attr))
+        result = compute_remap(paths, mapper)
+
+        for plug, _, newPath in result.changed:
+            mc.setAttr(plug, newPath, type="string")
+
+    result.elapsed = edit.elapsed
+    return result
@@ -0,0 +1,89 @@
+##################################################################
+#           PROGRESS, THROUGHPUT AND CANCELLATION                #
+##################################################################
+
+import time
+
+
+"""
+    Desc:
+        Raised inside a stage when the user cancelled it
+"""
+class Cancelled(Exception):
+    pass
+
+
+"""
+    Desc:
+        Class passed to the I/O stages (copy, hash, zip) to report how many
+        bytes are done and to check for cancellation. The callback is
+        called with (stage, done bytes, total bytes, bytes per second) at
+        most every interval seconds, from the thread running the stage.
+    Parameters:
+        callback: optional function called with the progress
+        cancelEvent: optional threading.Event, set to cancel the stage
+        interval: minimum time between two callback calls
+"""
+class Progress(object):
+
+    def __init__(self, callback=None, cancelEvent=None, interval=0.1):
+        self.callback = callback
+        self.cancelEvent = cancelEvent
+        self.interval = interval
+        self.stage = ""
+        self.total = 0
+        self.done = 0
+        self.startTime = time.time()
+        self.lastReport = 0.0
+
+    """
+    Desc:
+        Method to start a new stage
+    Parameters:
+        stage: name of the stage, shown to the user
+        total: number of bytes the stage will process
+    Returns:
+        NONE
+    """
+    def start(self, stage, total):
+        self.check()
+        self.stage = stage
+        self.total = total
+        self.done = 0
+        self.startTime = time.time()
+        self.lastReport = 0.0
+        self.report(force=True)
+
+    """
+    Desc:
+        Method to add processed bytes, raises Cancelled if cancelled
+    Parameters:
+        nbytes: number of bytes processed since the last call
+    Returns:
+        NONE
+    """
+    def advance(self, nbytes):
+        self.done += nbytes
+        self.check()
+        self.report()
+
+    # Raise Cancelled when the cancel event is set
+    def check(self):
+        if self.cancelEvent is not None and self.cancelEvent.is_set():
+            raise Cancelled(self.stage)
+
+    # Bytes per second since the start of the stage
+    def rate(self):
+        elapsed = time.time() - self.startTime
+        if elapsed <= 0.0:
+            return 0.0
+        return self.done / elapsed
+
+    # Call the callback, throttled to one call per interval
+    def report(self, force=False):
+        if self.callback is None:
+            return
+        now = time.time()
+        if force or self.done >= self.total or now - self.lastReport >= self.interval:
+            self.lastReport = now
+            self.callback(self.stage, self.done, self.total, self.rate())
@@ -0,0 +1,143 @@
+##################################################################
+#        IMPORT (FLATTEN) REFERENCES IN DEPENDENCY ORDER          #
+##################################################################
+
+import maya.cmds as mc
+import time
+
+import scriptspath
+import bulkedit
+
+
+# Reference nodes Maya creates for its own bookkeeping
+IGNORED_NODES = ("sharedReferenceNode", "_UNKNOWN_REF_NODE_")
+
+
+"""
+    Desc:
+        Class to hold the outcome of a reference import
+"""
+class ImportReport(object):
+
+    def __init__(self):
+        self.imported = []
+        self.skipped = []
+        self.timings = []
+        self.elapsed = 0.0
+
+    """
+    Desc:
+        Method to return the slowest imports first
+    Parameters:
+        count: number of references to return
+    Returns:
+        list of (reference node, file, seconds) tuples
+    """
+    def slowest(self, count=10):
+        return sorted(self.timings, key=lambda t: t[2], reverse=True)[:count]
+
+    def __str__(self):
+        return ("%d references imported, %d skipped in %.2fs"
+                % (len(self.imported), len(self.skipped), self.elapsed))
+
+
+"""
+    Desc:
+        Build the reference graph of the scene once
+    Parameters:
+        NONE
+    Returns:
+        dict {reference node: {"file", "parent", "loaded", "depth"}}, "file"
+        keeping its copy number ("{1}"), and a list of (reference node,
+        reason) for the nodes left out
+"""
+def build_reference_graph():
+    graph = {}
+    skipped = []
+    for rn in mc.ls(type='reference') or []:
+        if rn in graph or any(name in rn for name in IGNORED_NODES):
+            continue
+        try:
+            graph[rn] = {
+                "file": mc.referenceQuery(rn, filename=True),
+                "parent": mc.referenceQuery(rn, referenceNode=True, parent=True),
+                "loaded": mc.referenceQuery(rn, isLoaded=True),
+            }
+        except RuntimeError:
+            # Reference node not associated to any file
+            skipped.append((rn, "no file"))
+
+    for rn, ref in graph.items():
+        depth = 0
+        parent = ref["parent"]
+        while parent in graph:
+            depth += 1
+            parent = graph[parent]["parent"]
+        ref["depth"] = depth
+
+    return graph, skipped
+
+
+"""
+    Desc:
+        Sort the references so parents come before their children, with
+        unloaded and duplicate references left out. A reference is a
+        duplicate only when it is the same reference as another node: same
+        parent and same file, copy number included. The copies of an asset
+        referenced several times ("asset.ma", "asset.ma{1}") are all
+        imported.
+    Parameters:
+        graph: dict as returned by build_reference_graph
+    Returns:
+        list of reference nodes in import order, list of (node, reason)
+"""
+def import_order(graph):
+    order = []
+    skipped = []
+    seen = set()
+    ordered = set()
+    for rn in sorted(graph, key=lambda n: (graph[n]["depth"], n)):
+        ref = graph[rn]
+        parent = ref["parent"]
+        if not ref["loaded"]:
+            skipped.append((rn, "unloaded"))
+        elif parent in graph and parent not in ordered:
+            skipped.append((rn, "parent %s not imported" % parent))
+        elif (parent, ref["file"]) in seen:
+            skipped.append((rn, "duplicate of %s" % ref["file"]))
+        else:
+            seen.add((parent, ref["file"]))
+            ordered.add(rn)
+            order.append(rn)
+    return order, skipped
+
+
+"""
+    Desc:
+        Import every reference of the scene into it. The graph is built
+        once and references are imported parents first, so nested ones
+        are top level by the time they are imported.
+    Parameters:
+        deferUndo: turn the undo queue off while importing
+        suspendRefresh: suspend viewport refresh while importing. This
+                        only skips viewport redraws, the DG is still
+                        evaluated as each reference comes in
+    Returns:
+        ImportReport with the time spent on every reference
+"""
+def import_references(deferUndo=True, suspendRefresh=True):
+    report = ImportReport()
+    with bulkedit.BulkEdit("importReferences", undoChunk=False, recordUndo=not deferUndo,
+                           suspendRefresh=suspendRefresh) as edit:
+        graph, report.skipped = build_reference_graph()
+        order, skipped = import_order(graph)
+        report.skipped.extend(skipped)
+
+        for rn in order:
+            t = time.time()
+            mc.file(importReference=True, referenceNode=rn)
+            report.timings.append((rn, graph[rn]["file"], time.time() - t))
+            report.imported.append(rn)
+
+    report.elapsed = edit.elapsed
+    return report
@@ -0,0 +1,19 @@
+##################################################################
+#        SHARED MODULES OF THE MAYA SCRIPTS FOLDER                #
+##################################################################
+#
+#   import scriptspath
+#   import bulkedit
+#
+#   Inside Maya the scripts folder is on the script path. Run on its own,
+#   e.g. headless under mayapy, the render farm tool finds the modules it
+#   shares with the Maya tools (bulkedit) in the sibling scripts folder.
+
+import os
+import sys
+
+
+SCRIPTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+if SCRIPTS_DIR not in [os.path.normpath(os.path.abspath(p)) for p in sys.path]:
+    sys.path.append(SCRIPTS_DIR)
@@ -2,17 +2,12 @@
 #                   SETTING RELATIVE PATH - WORKING              #
 ##################################################################
 
-filenames = cmds.ls(type="file")
+import pathremap
 
-for f in filenames:
-    attrib = "%s.fileTextureName" %f
-    oldpath = cmds.getAttr(attrib)
-    #print oldpath
-    sub_path = oldpath.split("sourceimages",1)[1] 
-    #print sub_path
-    new_path = "sourceimages" + sub_path
-    print new_path
-    cmds.setAttr(attrib, new_path, type="string")
+result = pathremap.remap_paths(pathremap.sourceimages_relative)
+print("Relative paths: %s" % result)
+for node, path in result.skipped:
+    print("No sourceimages folder in %s: %s" % (node, path))
 
 
 
@@ -20,14 +15,5 @@ for f in filenames:
 
 ## To set path for shotgun maya file
 
-filenames = cmds.ls(type="file")
-
-for f in filenames:
-    attrib = "%s.fileTextureName" %f
-    oldpath = cmds.getAttr(attrib)
-    #print "old path:" + oldpath
-    sub_path = oldpath.split("sourceimages", 1)[1] 
-    #print "sub path: " + sub_path
-    new_path = "R:/Hand-ins/MDDN541/TOM/MAYA/TEXTURES" + sub_path
-    print "new path: " + new_path
-    cmds.setAttr(attrib, new_path, type="string")
\ No newline at end of file
+result = pathremap.remap_paths(pathremap.rebase_mapper("R:/Hand-ins/MDDN541/TOM/MAYA/TEXTURES"))
+print("Shotgun paths: %s" % result)
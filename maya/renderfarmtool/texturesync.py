@@ -0,0 +1,257 @@
+##################################################################
+#             INCREMENTAL, CONTENT-HASHED TEXTURE SYNC           #
+##################################################################
+
+import os
+import time
+import json
+import shutil
+import hashlib
+
+from progress import Progress
+
+
+# Manifest kept in the destination folder between two submissions
+MANIFEST_NAME = ".texturesync.json"
+MANIFEST_VERSION = 1
+
+# Read block size used while hashing
+CHUNK_SIZE = 1024 * 1024
+
+# Difference of modification times still taken as the same time, copystat
+# doesn't always carry the time over to the nanosecond
+MTIME_TOLERANCE = 0.01
+
+# Bytes copied between two checkpoints of the manifest
+CHECKPOINT_BYTES = 256 * 1024 * 1024
+
+
+"""
+    Desc:
+        Class to hold the outcome of a sync
+"""
+class SyncResult(object):
+
+    def __init__(self):
+        self.copied = []
+        self.skipped = []
+        self.deleted = []
+        self.bytesCopied = 0
+        self.bytesHashed = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return ("%d copied (%.1f MB), %d unchanged, %d deleted in %.2fs"
+                % (len(self.copied), self.bytesCopied / (1024.0 * 1024.0),
+                   len(self.skipped), len(self.deleted), self.elapsed))
+
+
+# Returns the sha1 of a file content
+def hash_file(filename, progress=None):
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sha.update(chunk)
+            if progress is not None:
+                progress.advance(len(chunk))
+    return sha.hexdigest()
+
+
+# Copy a file with its stats, in chunks so the copy can be cancelled
+def copy_file(src, dest, progress=None):
+    destdir = os.path.dirname(dest)
+    if not os.path.exists(destdir):
+        os.makedirs(destdir)
+    with open(src, 'rb') as fsrc:
+        with open(dest, 'wb') as fdest:
+            while True:
+                chunk = fsrc.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                fdest.write(chunk)
+                if progress is not None:
+                    progress.advance(len(chunk))
+    shutil.copystat(src, dest)
+
+
+# Walk a folder and return {relative path: (size, mtime)}, paths use "/"
+def scan_files(root):
+    found = {}
+    for dirpath, _, files in os.walk(root):
+        for file in files:
+            filename = os.path.join(dirpath, file)
+            if not os.path.isfile(filename):
+                continue
+            relpath = os.path.relpath(filename, root).replace(os.sep, '/')
+            if relpath == MANIFEST_NAME:
+                continue
+            st = os.stat(filename)
+            found[relpath] = (st.st_size, st.st_mtime)
+    return found
+
+
+# Stat the given relative paths of root, missing files are left out
+def stat_files(root, relpaths):
+    found = {}
+    for relpath in relpaths:
+        filename = os.path.join(root, relpath)
+        if os.path.isfile(filename):
+            st = os.stat(filename)
+            found[relpath] = (st.st_size, st.st_mtime)
+    return found
+
+
+# Read the manifest stored in dest, empty when missing or unreadable
+def load_manifest(dest):
+    try:
+        with open(os.path.join(dest, MANIFEST_NAME)) as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+# Write the manifest next to the synced files, replacing the old one atomically
+def save_manifest(dest, entries):
+    filename = os.path.join(dest, MANIFEST_NAME)
+    tmpname = filename + ".tmp"
+    with open(tmpname, 'w') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": entries}, f, indent=1, sort_keys=True)
+    if os.path.exists(filename):
+        os.remove(filename)
+    os.rename(tmpname, filename)
+
+
+# Remove the folders of root left empty after deleting the given files,
+# other empty folders (e.g. workspace ones) are left alone
+def prune_empty_dirs(root, relpaths):
+    folders = set()
+    for relpath in relpaths:
+        folder = os.path.dirname(relpath)
+        while folder:
+            folders.add(folder)
+            folder = os.path.dirname(folder)
+    # deepest first, so a parent is only checked once its children are gone
+    for folder in sorted(folders, key=lambda f: f.count("/"), reverse=True):
+        dirpath = os.path.join(root, folder)
+        if os.path.isdir(dirpath) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+# Whether a file of dest is still the copy recorded in the manifest: same
+# size and modification time (the copy keeps the one of its source)
+def unchanged_copy(stat, entry):
+    return (stat is not None and entry is not None and stat[0] == entry["size"]
+            and abs(stat[1] - entry["mtime"]) < MTIME_TOLERANCE)
+
+
+"""
+    Desc:
+        Incrementally mirror src into dest. A manifest of size, mtime and
+        sha1 for every file is kept in dest, only files which were added
+        or whose content changed since the last sync are copied, and files
+        a previous sync copied which are no longer wanted are deleted
+        instead of wiping dest. Files of dest the manifest doesn't know
+        about weren't copied by a sync and are left alone.
+    Parameters:
+        src: folder to copy from, e.g. the network texture library
+        dest: folder to copy to, e.g. the project sourceimages folder
+        files: optional relative paths ("/" separated) to restrict the sync
+               to, e.g. the textures referenced by the scene
+        progress: optional Progress reporting the hash and copy stages
+        checkpoint: optional function called with {"files", "bytes"} each
+                    time the manifest is saved during the copy, every
+                    CHECKPOINT_BYTES. A rerun skips what was copied.
+        extra: optional dict {relative path in dest: source file} of files
+               from outside src to sync along with it
+    Returns:
+        SyncResult
+"""
+def sync_directory(src, dest, files=None, progress=None, checkpoint=None, extra=None):
+    start = time.time()
+    result = SyncResult()
+    progress = progress or Progress()
+
+    if not os.path.exists(dest):
+        os.makedirs(dest)
+
+    manifest = load_manifest(dest)
+    if files is None:
+        srcFiles = scan_files(src)
+    else:
+        srcFiles = stat_files(src, files)
+    sources = dict((relpath, os.path.join(src, relpath)) for relpath in srcFiles)
+    for relpath, filename in (extra or {}).items():
+        if os.path.isfile(filename):
+            st = os.stat(filename)
+            srcFiles[relpath] = (st.st_size, st.st_mtime)
+            sources[relpath] = filename
+    destFiles = scan_files(dest)
+    entries = {}
+    toHash = []
+
+    for relpath in sorted(srcFiles):
+        size, mtime = srcFiles[relpath]
+        known = manifest.get(relpath)
+        # The copy in dest wasn't edited since it was made
+        present = unchanged_copy(destFiles.get(relpath), known)
+
+        # Same size and mtime as last time: trust it without reading the file
+        if known and present and known["size"] == size and known["mtime"] == mtime:
+            entries[relpath] = known
+            result.skipped.append(relpath)
+        else:
+            toHash.append((relpath, known, present))
+
+    toCopy = []
+    progress.start("Hashing textures", sum(srcFiles[r][0] for r, _, _ in toHash))
+    for relpath, known, present in toHash:
+        size, mtime = srcFiles[relpath]
+        digest = hash_file(sources[relpath], progress)
+        result.bytesHashed += size
+        entries[relpath] = {"size": size, "mtime": mtime, "hash": digest}
+
+        # Touched but not modified, the copy in dest is still good: give
+        # it the new time so the next sync trusts it again
+        if known and present and known["hash"] == digest:
+            shutil.copystat(sources[relpath], os.path.join(dest, relpath))
+            result.skipped.append(relpath)
+        else:
+            toCopy.append(relpath)
+
+    # Manifest saved at every checkpoint: what was known before, updated
+    # with the files verified or copied so far
+    committed = dict(manifest)
+    for relpath in result.skipped:
+        committed[relpath] = entries[relpath]
+    sinceCheckpoint = 0
+
+    progress.start("Copying textures", sum(srcFiles[r][0] for r in toCopy))
+    for relpath in toCopy:
+        copy_file(sources[relpath], os.path.join(dest, relpath), progress)
+        result.copied.append(relpath)
+        result.bytesCopied += srcFiles[relpath][0]
+        committed[relpath] = entries[relpath]
+        sinceCheckpoint += srcFiles[relpath][0]
+        if checkpoint is not None and sinceCheckpoint >= CHECKPOINT_BYTES:
+            save_manifest(dest, committed)
+            checkpoint({"files": len(result.copied), "bytes": result.bytesCopied})
+            sinceCheckpoint = 0
+
+    for relpath in sorted(destFiles):
+        if relpath in manifest and relpath not in srcFiles:
+            os.remove(os.path.join(dest, relpath))
+            result.deleted.append(relpath)
+
+    if result.deleted:
+        prune_empty_dirs(dest, result.deleted)
+
+    save_manifest(dest, entries)
+    result.elapsed = time.time() - start
+
+    return result
@@ -1,17 +1,11 @@
 from PySide2 import QtCore, QtWidgets, QtGui
 import shiboken2
 
-import maya.cmds as mc
 import maya.OpenMayaUI as omui
-import maya.mel as mel
-import os
-import shutil
-import errno
-import zipfile
+import threading
 
-
-# Global variable
-g_texturesPath = "R:/Hand-ins/MDDN541/TOM/MAYA/TEXTURES"
+import farmprep
+import progress
 
 
 def getMainWindow():
@@ -35,45 +29,44 @@ def getMainWindow():
     return mainWin
 
 
-# Create folder function definition
-def create_folder( directory ):
-    if not os.path.exists( directory ):
-        os.makedirs( directory )
-
-
-# Import all references into current scene file
-def import_references():
-    refs = mc.ls(type='reference')
-
-    for i in refs:
-        rFile = mc.referenceQuery(i, f=True)
-        mc.file(rFile, importReference=True)
-
-
-def copyDirectory(src, dest):
-    try:
-        shutil.copytree(src, dest)
-    except OSError as e:
-        # If the error was caused because the source wasn't a directory
-        if e.errno == errno.ENOTDIR:
-            shutil.copy(src, dest)
-        else:
-            print('Directory not copied. Error: %s' % e)
-
-
-def make_zipfile(output_filename, source_dir):
-    relroot = os.path.abspath(os.path.join(source_dir, os.pardir))
-    #print relroot
-    with zipfile.ZipFile(output_filename, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zip:
-        for root, dirs, files in os.walk(source_dir):
-            #print root
-            # add directory (needed for empty dirs)
-            zip.write(root, os.path.relpath(root, relroot))
-            for file in files:
-                filename = os.path.join(root, file)
-                if os.path.isfile(filename): # regular files only
-                    arcname = os.path.join(os.path.relpath(root, relroot), file)
-                    zip.write(filename, arcname)
+"""
+    Desc:
+        Thread running the I/O heavy stages (texture hash/copy, zip) away
+        from the Maya main thread. Every stage is a function taking a
+        Progress object, progress and outcome are sent as Qt signals.
+    Parameters:
+        stages: list of functions to run one after the other
+"""
+class PackagingThread(QtCore.QThread):
+    progressed = QtCore.Signal(str, float, float, float)
+    succeeded = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    def __init__(self, stages, parent=None):
+        super(PackagingThread, self).__init__(parent)
+        self.stages = stages
+        self.cancelEvent = threading.Event()
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def emitProgress(self, stage, done, total, rate):
+        self.progressed.emit(stage, float(done), float(total), float(rate))
+
+    def run(self):
+        prog = progress.Progress(self.emitProgress, self.cancelEvent)
+        results = []
+        try:
+            for stage in self.stages:
+                results.append(stage(prog))
+        except progress.Cancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.failed.emit("%s: %s" % (type(e).__name__, e))
+            return
+        self.succeeded.emit(results)
 
 
 """
@@ -117,6 +110,27 @@ class SettingsPanel(object):
         self.txtScene.setFixedWidth(250)
         fbox.addRow(lblScene, self.txtScene)
 
+        lblSync = QtWidgets.QLabel("Incremental texture sync")
+        self.chkSync = QtWidgets.QCheckBox()
+        self.chkSync.setChecked(True)
+        fbox.addRow(lblSync, self.chkSync)
+
+        lblRefOnly = QtWidgets.QLabel("Copy referenced textures only")
+        self.chkRefOnly = QtWidgets.QCheckBox()
+        self.chkRefOnly.setChecked(True)
+        fbox.addRow(lblRefOnly, self.chkRefOnly)
+
+        lblStore = QtWidgets.QLabel("Deduplicate textures in store")
+        self.chkStore = QtWidgets.QCheckBox()
+        self.chkStore.setChecked(False)
+        self.chkStore.setToolTip(farmprep.g_storePath)
+        fbox.addRow(lblStore, self.chkStore)
+
+        lblResume = QtWidgets.QLabel("Resume interrupted run")
+        self.chkResume = QtWidgets.QCheckBox()
+        self.chkResume.setChecked(True)
+        fbox.addRow(lblResume, self.chkResume)
+
         grpBox.setLayout(fbox)
 
         return grpBox
@@ -142,6 +156,10 @@ class RenderFarmTool(QtWidgets.QMainWindow):
         self.grid = QtWidgets.QGridLayout()
 
         self.settingsPnl = SettingsPanel()
+        self.worker = None
+        self.journal = None
+        # A run is going on, from the click until the worker is finished
+        self.busy = False
 
         self.grid.addWidget(self.settingsPnl.createUI("Run RenderFarm file preparation process"), 1, 1)
         self.grid.addWidget(self.createButtonsPanel(), 2, 1)
@@ -164,15 +182,19 @@ class RenderFarmTool(QtWidgets.QMainWindow):
         grpBox = QtWidgets.QGroupBox()
         vbox = QtWidgets.QVBoxLayout()
 
-        lbl = QtWidgets.QLabel("NOTE: This will initiate the file preparation process and can't be stopped.")
+        lbl = QtWidgets.QLabel("NOTE: Copying and zipping run in the background and can be cancelled.")
         vbox.addWidget(lbl)
 
         hbox1 = QtWidgets.QHBoxLayout()
         verticalSpacer1 = QtWidgets.QSpacerItem(340, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         hbox1.addItem(verticalSpacer1)
-        btnCreate = QtWidgets.QPushButton("Create RenderFarm file")
-        btnCreate.clicked.connect(lambda: self.createClicked())
-        hbox1.addWidget(btnCreate)
+        self.btnCreate = QtWidgets.QPushButton("Create RenderFarm file")
+        self.btnCreate.clicked.connect(lambda: self.createClicked())
+        hbox1.addWidget(self.btnCreate)
+        self.btnCancel = QtWidgets.QPushButton("Cancel")
+        self.btnCancel.setEnabled(False)
+        self.btnCancel.clicked.connect(lambda: self.cancelClicked())
+        hbox1.addWidget(self.btnCancel)
         vbox.addItem(hbox1)
 
         lblSTxt = QtWidgets.QLabel("Status:")
@@ -181,6 +203,11 @@ class RenderFarmTool(QtWidgets.QMainWindow):
         self.lblStatus = QtWidgets.QLabel("...")
         vbox.addWidget(self.lblStatus)
 
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setRange(0, 1000)
+        self.progressBar.setTextVisible(False)
+        vbox.addWidget(self.progressBar)
+
         grpBox.setLayout(vbox)
 
         return grpBox
@@ -188,80 +215,158 @@ class RenderFarmTool(QtWidgets.QMainWindow):
 
     """
     Desc:
-        Method to run the file preparation process
+        Method to show a status message, repainting the UI right away
+        while the Maya stages block the main thread
+    Parameters:
+        text: message to show
+    Returns:
+        NONE
+    """
+    def setStatus(self, text):
+        print(text)
+        self.lblStatus.setText(text)
+        QtWidgets.QApplication.processEvents()
+
+
+    """
+    Desc:
+        Method to run the file preparation process. The Maya stages run
+        here on the main thread, copying and zipping are handed over to
+        a PackagingThread.
     Parameters:
         NONE
     Returns:
         NONE
     """
     def createClicked(self):
-        print("Initiating file preparation process ...")
-        self.lblStatus.setText("Initiating file preparation process ...")
+        # setStatus processes events while the Maya stages run, the button
+        # is disabled first so a second click can't start another run
+        if self.busy:
+            return
+        self.busy = True
+        self.btnCreate.setEnabled(False)
+        started = False
+        try:
+            self.startRun()
+            started = True
+        finally:
+            if not started:
+                self.busy = False
+                self.btnCreate.setEnabled(True)
+
+
+    """
+    Desc:
+        Method to run the Maya stages and start the background ones, see
+        createClicked
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def startRun(self):
+        self.setStatus("Initiating file preparation process ...")
 
         # Set path to Maya project folder
         maya_dir = self.settingsPnl.txtLoc.text() + "/" + self.settingsPnl.txtPrj.text()
+        incremental = self.settingsPnl.chkSync.isChecked()
+        store = farmprep.g_storePath if self.settingsPnl.chkStore.isChecked() else None
+
+        # Every stage is checkpointed, a cancelled or crashed run resumes
+        sceneName = self.settingsPnl.txtScene.text()
+        referencedOnly = self.settingsPnl.chkRefOnly.isChecked()
+        settings = farmprep.run_settings(sceneName, referencedOnly=referencedOnly, incremental=incremental,
+                                         store=store)
+        runJournal = farmprep.open_journal(maya_dir, self.settingsPnl.chkResume.isChecked(), settings)
+        resumed = farmprep.describe_resume(runJournal)
+        if resumed:
+            self.setStatus("Resuming previous run: " + resumed)
+        self.journal = runJournal
+
+        textures, externals = farmprep.prepare_maya_scene(maya_dir, sceneName, referencedOnly=referencedOnly,
+                                                          status=self.setStatus, runJournal=runJournal)
+
+        def copyTextures(prog):
+            return farmprep.copy_textures(maya_dir, textures, incremental=incremental, progress=prog,
+                                          runJournal=runJournal, externals=externals)
+
+        def zipProject(prog):
+            return farmprep.zip_project(maya_dir, progress=prog, store=store, runJournal=runJournal)
+
+        self.worker = PackagingThread([copyTextures, zipProject], self)
+        self.worker.progressed.connect(self.onProgress)
+        self.worker.succeeded.connect(self.onSucceeded)
+        self.worker.failed.connect(self.onFailed)
+        self.worker.cancelled.connect(self.onCancelled)
+        self.worker.finished.connect(self.onFinished)
+
+        self.btnCancel.setEnabled(True)
+        self.progressBar.setValue(0)
+        self.worker.start()
+
+
+    """
+    Desc:
+        Method to cancel the background stages
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def cancelClicked(self):
+        if self.worker is not None:
+            self.lblStatus.setText("Cancelling ...")
+            self.worker.cancel()
+
 
-        # Create project structure
-        create_folder(maya_dir)
-
-        mel.eval('setProject \"' + maya_dir + '\"')
-
-        self.lblStatus.setText("Creating project and workspace ...")
-        print("Creating project and workspace ...")
-        # Create folder structure
-        for file_rule in mc.workspace(query=True, fileRuleList=True):
-            file_rule_dir = mc.workspace(fileRuleEntry=file_rule)
-            maya_file_rule_dir = os.path.join( maya_dir, file_rule_dir)
-            print(maya_file_rule_dir)
-            create_folder( maya_file_rule_dir )
-
-        # Import the references into maya file before saving
-        self.lblStatus.setText("Importing references ...")
-        print("Importing references ...")
-        import_references()
-
-        #srcpath = 'D:/test/ball'
-        # Test directory shouldn't exists
-        destexpath = maya_dir + "/sourceimages"
-
-        # Delete sourceimages folder and create new one
-        shutil.rmtree(destexpath)
-
-        self.lblStatus.setText("Copying textures ...")
-        print("Copying textures ...")
-        #copyDirectory(g_texturesPath, destexpath)
-
-        self.lblStatus.setText("Setting relative path to textures ...")
-        print("Setting relative path to textures ...")
-        # Set to Relative path
-        filenames = mc.ls(type="file")
-        for f in filenames:
-            attrib = "%s.fileTextureName" %f
-            oldpath = mc.getAttr(attrib)
-            #print oldpath
-            sub_path = oldpath.split("sourceimages",1)[1] 
-            #print sub_path
-            new_path = "sourceimages" + sub_path
-            print new_path
-            mc.setAttr(attrib, new_path, type="string")
-
-
-        self.lblStatus.setText("Saving scene file ...")
-        print("Saving scene file ...")
-        # Save the file as .ma
-        file_name = self.settingsPnl.txtScene.text() + ".ma"
-        mc.file( rename=file_name )
-        mc.file( save=True, type='mayaAscii')
-
-        # Output zip filepath 
-        output_zipfname = maya_dir + ".zip"  #'D:/test/copy/test.zip'
-
-        self.lblStatus.setText("Creating zip file ...") 
-        print("Creating zip file ...") 
-        make_zipfile(output_zipfname, maya_dir)
-
-        self.lblStatus.setText("File ready for render farm.")
-        print("File ready for render farm.")
+    """
+    Desc:
+        Event method, raised by the worker thread with the progress of the
+        current stage
+    Parameters:
+        stage: name of the stage
+        done: number of bytes done
+        total: number of bytes of the stage
+        rate: bytes per second
+    Returns:
+        NONE
+    """
+    def onProgress(self, stage, done, total, rate):
+        mb = 1024.0 * 1024.0
+        self.lblStatus.setText("%s %.1f / %.1f MB (%.1f MB/s)" % (stage, done / mb, total / mb, rate / mb))
+        self.progressBar.setValue(int(1000 * done / total) if total > 0 else 1000)
+
+    def onSucceeded(self, results):
+        syncResult, stats = results
+        if syncResult is None:
+            print("Texture sync: skipped, done by the previous run")
+        else:
+            print("Texture sync: %s" % syncResult)
+        self.journal.reset()
+        self.progressBar.setValue(1000)
+        if stats is None:
+            self.setStatus("File ready for render farm. Zip done by the previous run")
+            return
+        for line in stats.report():
+            print(line)
+        self.setStatus("File ready for render farm. Zipped at %.1f MB/s" % stats.throughput('total'))
+
+    def onFailed(self, message):
+        self.setStatus("File preparation failed: %s. Run again to resume." % message)
+
+    def onCancelled(self):
+        self.setStatus("File preparation cancelled. Run again to resume.")
+
+    def onFinished(self):
+        self.busy = False
+        self.btnCreate.setEnabled(True)
+        self.btnCancel.setEnabled(False)
+
+    def closeEvent(self, event):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        super(RenderFarmTool, self).closeEvent(event)
 
 
 """
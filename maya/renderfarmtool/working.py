@@ -5,6 +5,8 @@
 import maya.cmds as mc
 import maya.mel as mel
 
+import references
+
 # Create folder function definition
 def create_folder( directory ):
     if not os.path.exists( directory ):
@@ -12,11 +14,10 @@ def create_folder( directory ):
 
 # Import all references into current scene file
 def import_references():
-    refs = mc.ls(type='reference')
-
-    for i in refs:
-        rFile = mc.referenceQuery(i, f=True)
-        mc.file(rFile, importReference=True)
+    report = references.import_references()
+    print(report)
+    for rn, path, seconds in report.slowest():
+        print("  %6.2fs %s (%s)" % (seconds, rn, path))
 
         
 # Set directory path
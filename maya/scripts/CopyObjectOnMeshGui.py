@@ -4,6 +4,15 @@ import shiboken2
 import maya.cmds as mc
 import maya.OpenMayaUI as omui
 
+import bulkedit
+import cloner
+import distribution
+import meshdata
+
+
+# Milliseconds without changes before the live preview is rebuilt
+PREVIEW_DELAY = 300
+
 def getMainWindow():
     """
     Returns the main maya window as the appropriate QObject to use as a parent.
@@ -25,18 +34,11 @@ def getMainWindow():
     return mainWin
 
 """
-    Generic function to return normals from a mesh,
-    not used at the moment in this program
+    Generic function to return the vertex normals of a mesh,
+    fetched in one query, see meshdata
 """
 def getNormalsFromMesh(mesh):
-    for normal in mc.polyInfo(mesh, fn=True):
-        strNormals = normal.partition(": ")[2].split(' ')
-        x, y, z = [float(x) for x in strNormals]
-        yield (x, y, z)
-
-
-# for n in getNormalsFromMesh('pSphereShape1'):
-#     print n
+    return meshdata.iter_vectors(meshdata.get_normals(mesh))
 
 """
     Class to create ObjectCloner tool UI
@@ -61,6 +63,7 @@ class ObjectCloner(QtWidgets.QMainWindow):
         self.mainlayout.addLayout(self.grid)
         self.createRButtons()
         self.createAttachButton()
+        self.createPreviewControls()
         self.setCentralWidget(widget)
         self.show()
         self.raise_()
@@ -95,7 +98,7 @@ class ObjectCloner(QtWidgets.QMainWindow):
 
     """
     Create Attach Button - this button clones the object on
-    every vertex of selected source object
+    the selected source objects
 
     Returns:
         NONE
@@ -105,12 +108,190 @@ class ObjectCloner(QtWidgets.QMainWindow):
         verticalSpacer = QtWidgets.QSpacerItem(340, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         hlayout.addItem(verticalSpacer)
 
+        lblMode = QtWidgets.QLabel("Output")
+        hlayout.addWidget(lblMode)
+        self.cboxMode = QtWidgets.QComboBox()
+        for mode in cloner.MODES:
+            self.cboxMode.addItem(mode)
+        self.cboxMode.setToolTip("Instances share one primitive shape, much lighter than duplicates on "
+                                 "dense meshes. Merged mesh builds every clone as one mesh, for render only.")
+        hlayout.addWidget(self.cboxMode)
+
         btn = QtWidgets.QPushButton('Attach Object')
         btn.clicked.connect(lambda:self.btn_clicked())
         hlayout.addWidget(btn)
 
         self.mainlayout.addLayout(hlayout)
 
+        # Random rotation/scale of the merged mesh clones
+        rlayout = QtWidgets.QHBoxLayout()
+        rlayout.addItem(QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum))
+        rlayout.addWidget(QtWidgets.QLabel("Random rotate"))
+        self.spnRotate = QtWidgets.QDoubleSpinBox()
+        self.spnRotate.setRange(0.0, 180.0)
+        self.spnRotate.setSuffix(" deg")
+        rlayout.addWidget(self.spnRotate)
+        rlayout.addWidget(QtWidgets.QLabel("Random scale"))
+        self.spnScale = QtWidgets.QDoubleSpinBox()
+        self.spnScale.setRange(0.0, 0.99)
+        self.spnScale.setSingleStep(0.05)
+        rlayout.addWidget(self.spnScale)
+        rlayout.addWidget(QtWidgets.QLabel("Seed"))
+        self.spnSeed = QtWidgets.QSpinBox()
+        self.spnSeed.setRange(0, 99999)
+        self.spnSeed.setToolTip("Seed of the random rotation/scale and of the random distributions")
+        rlayout.addWidget(self.spnSeed)
+        self.chkAlign = QtWidgets.QCheckBox("Align to normal")
+        self.chkAlign.setToolTip("Turn the Y axis of every clone along the surface normal")
+        rlayout.addWidget(self.chkAlign)
+        self.mainlayout.addLayout(rlayout)
+
+        # Where the clones go, few for a quick preview, many for final
+        dlayout = QtWidgets.QHBoxLayout()
+        dlayout.addItem(QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum))
+        dlayout.addWidget(QtWidgets.QLabel("Distribution"))
+        self.cboxSpread = QtWidgets.QComboBox()
+        for spread in distribution.MODES:
+            self.cboxSpread.addItem(spread)
+        dlayout.addWidget(self.cboxSpread)
+        self.lblAmount = QtWidgets.QLabel()
+        dlayout.addWidget(self.lblAmount)
+        self.spnAmount = QtWidgets.QDoubleSpinBox()
+        self.spnAmount.setRange(0.0, 1000000.0)
+        dlayout.addWidget(self.spnAmount)
+        self.mainlayout.addLayout(dlayout)
+
+        self.cboxMode.currentIndexChanged.connect(lambda: self.modeChanged())
+        self.modeChanged()
+        self.cboxSpread.currentIndexChanged.connect(lambda: self.spreadChanged())
+        self.spreadChanged()
+
+    """
+    Create Live preview controls - while checked, the clones of the
+    selected meshes are rebuilt a moment after any option changes
+
+    Returns:
+        NONE
+    """
+    def createPreviewControls(self):
+        self.preview = None
+        self.previewMeshes = []
+
+        # Restarted on every change, so a burst of changes rebuilds once
+        self.previewTimer = QtCore.QTimer(self)
+        self.previewTimer.setSingleShot(True)
+        self.previewTimer.setInterval(PREVIEW_DELAY)
+        self.previewTimer.timeout.connect(lambda: self.updatePreview())
+
+        playout = QtWidgets.QHBoxLayout()
+        playout.addItem(QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum))
+        self.chkPreview = QtWidgets.QCheckBox("Live preview")
+        self.chkPreview.setToolTip("Rebuild the clones of the selected meshes as options change, "
+                                   "Attach Object keeps them. Preview edits are not recorded for undo")
+        self.chkPreview.toggled.connect(lambda: self.previewToggled())
+        playout.addWidget(self.chkPreview)
+        self.mainlayout.addLayout(playout)
+
+        for rbt in (self.rbtSp, self.rbtCb, self.rbtCy, self.rbtCn, self.rbtPl, self.rbtTr, self.rbtPr, self.rbtPy):
+            rbt.toggled.connect(lambda: self.schedulePreview())
+        for cbox in (self.cboxMode, self.cboxSpread):
+            cbox.currentIndexChanged.connect(lambda: self.schedulePreview())
+        for spn in (self.spnRotate, self.spnScale, self.spnSeed, self.spnAmount):
+            spn.valueChanged.connect(lambda: self.schedulePreview())
+        self.chkAlign.toggled.connect(lambda: self.schedulePreview())
+
+    """
+        Event method - random rotation/scale only applies to merged mesh
+        clones
+        Returns:
+            NONE
+    """
+    def modeChanged(self):
+        merged = self.cboxMode.currentText() == cloner.MERGED
+        for widget in (self.spnRotate, self.spnScale):
+            widget.setEnabled(merged)
+
+    """
+        Event method - show what the amount means for the distribution
+        Returns:
+            NONE
+    """
+    def spreadChanged(self):
+        amount = distribution.AMOUNTS[self.cboxSpread.currentText()]
+        self.lblAmount.setText(amount or "")
+        self.spnAmount.setEnabled(amount is not None)
+        if amount == "spacing":
+            self.spnAmount.setDecimals(3)
+            self.spnAmount.setValue(0.5)
+        elif amount is not None:
+            self.spnAmount.setDecimals(0)
+            self.spnAmount.setValue(2 if amount == "N" else 1000)
+
+    """
+        Event method - start the live preview on the selected meshes, or
+        remove it
+        Returns:
+            NONE
+    """
+    def previewToggled(self):
+        if self.chkPreview.isChecked():
+            self.previewMeshes = mc.filterExpand(selectionMask=12) or []
+            if not self.previewMeshes:
+                print("Please select one or more polygon meshes")
+            self.schedulePreview()
+        else:
+            self.previewTimer.stop()
+            self.clearPreview()
+
+    def schedulePreview(self):
+        if self.chkPreview.isChecked() and self.previewMeshes:
+            self.previewTimer.start()
+
+    # Everything but the primitive, which instances can swap in place
+    def previewSettings(self):
+        return (self.cboxMode.currentText(), self.spnSeed.value(), self.spnRotate.value(), self.spnScale.value(),
+                self.chkAlign.isChecked(), self.cboxSpread.currentText(), self.spnAmount.value())
+
+    """
+        Rebuild the live preview. When only the primitive changed on an
+        instances preview, the shape shared by every clone is swapped, and
+        nothing else is rebuilt. Meshes are planned on the Maya thread,
+        and no rebuild is recorded for undo.
+        Returns:
+            NONE
+    """
+    def updatePreview(self):
+        obj = self.getSelectedOption()
+        settings = self.previewSettings()
+        preview = self.preview
+
+        with bulkedit.BulkEdit("clonePreview", recordUndo=False):
+            if preview is not None and preview["settings"] == settings and preview["source"] is not None:
+                if preview["obj"] != obj:
+                    cloner.swap_source(preview["source"], obj)
+                    preview["obj"] = obj
+                    print("Preview: swapped to %s" % obj)
+                return
+
+            self.clearPreview()
+            source = None
+            if settings[0] == cloner.INSTANCES:
+                source = cloner.make_preview_source(obj)
+            report = cloner.clone_on_meshes(self.previewMeshes, obj, *settings, threads=0, source=source)
+            self.preview = {"obj": obj, "settings": settings, "source": source, "groups": report.groups}
+            mc.select(self.previewMeshes)
+        print("Preview: %s" % report)
+
+    # Delete the clones of the live preview, not recorded for undo
+    def clearPreview(self):
+        if self.preview is None:
+            return
+        nodes = [n for n in self.preview["groups"] + [self.preview["source"]] if n and mc.objExists(n)]
+        if nodes:
+            with bulkedit.BulkEdit("clearPreview", recordUndo=False):
+                mc.delete(nodes)
+        self.preview = None
+
     """
         Function to return which UI option is selected
         Parameters:
@@ -139,65 +320,39 @@ class ObjectCloner(QtWidgets.QMainWindow):
 
     """
         Button click event handler - the main functionality of cloning an
-        object happens here.
-        We first get the every vertex of the selected source object and
-        loop through them, and attach the selected option to each
-        and every vertex
+        object happens here, see cloner.
+        The positions of every selected source object are fetched in one
+        query, sampled with the selected distribution, and the selected
+        option is attached to each of them, as duplicates, as instances of
+        one primitive or as one merged mesh. Meshes are sampled in
+        parallel and the whole run is undone in one step.
 
         Returns:
             NONE
     """
     def btn_clicked(self):
-        # Get the selected object
-        selObjs = mc.ls(sl=True)
+        if self.preview is not None:
+            # Keep the live preview as it is, cut off the template cache
+            if self.preview["source"] is not None and mc.objExists(self.preview["source"]):
+                with bulkedit.BulkEdit("keepPreview", recordUndo=False):
+                    cloner.detach_source(self.preview["source"])
+            self.preview = None
+            self.chkPreview.setChecked(False)
+            print("Object attached!" + self.getSelectedOption())
+            return
+
+        # Get the selected polygon objects
+        selObjs = mc.filterExpand(selectionMask=12) or []
+        if not selObjs:
+            print("Please select one or more polygon meshes")
+            return
 
         obj = self.getSelectedOption()
 
-        divisions = 4
-        radius=0.1
-        width=0.1
-        height=0.1
-        depth=0.1
-
-        grpName = obj + '_Grp'
-        mc.group(em=True, name=grpName)
-        # Fetch all the vertices for the selected object
-        srcVrts = mc.ls('%s.vtx[:]' % selObjs[0], fl=True)
-
-        # # loop through vertices in mesh vertices list
-        for vtx in srcVrts:
-            # get the position of the vertex in model space
-            loc = mc.pointPosition(vtx, l=True)
-
-            if obj == "Sphere":
-                _item = mc.polySphere(sx=9, sy=9, r=radius)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Cube":
-                _item = mc.polyCube(sx=1, sy=1, sz=1, w=width, h=height, d=depth)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Cylinder":
-                _item = mc.polyCylinder(radius=radius, sx=9, sy=9, sz=9, h=height)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Cone":
-                _item = mc.polyCone(sx=9, sy=9, sz=divisions, r=radius, h=height)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Plane":
-                _item = mc.polyPlane(sx=1, sy=1, w=width, h=height)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Torus":
-                _item = mc.polyTorus(r=radius, sr=0.125,sx=8, sy=8)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Prism":
-                _item = mc.polyPrism(l=0.1, ns=3, w=0.1, sc=1, sh=1)
-                mc.group(_item[0], parent=grpName)
-            elif obj == "Pyramid":
-                _item = mc.polyPyramid(sh=0.1, ns=4, sc=0, w=0.1)
-                mc.group(_item[0], parent=grpName)
-
-            # translate the created sphere to vertex location in space
-            mc.setAttr('%s.translateX' % _item[0], loc[0])
-            mc.setAttr('%s.translateY' % _item[0], loc[1])
-            mc.setAttr('%s.translateZ' % _item[0], loc[2])
+        report = cloner.clone_on_meshes(selObjs, obj, self.cboxMode.currentText(), self.spnSeed.value(),
+                                        self.spnRotate.value(), self.spnScale.value(), self.chkAlign.isChecked(),
+                                        self.cboxSpread.currentText(), self.spnAmount.value())
+        print(report)
 
         print("Object attached!" + obj)
 
@@ -4,9 +4,11 @@ import shiboken2
 import maya.cmds as mc
 import maya.OpenMayaUI as omui
 import math
-import json
 import os
 
+import lightpresets
+import lightrig
+
 def getMainWindow():
     """
     Returns the main maya window as the appropriate QObject to use as a parent.
@@ -27,115 +29,6 @@ def getMainWindow():
 
     return mainWin
 
-"""
-    Desc:
-        Class to create a 3-point light rig
-
-    Parameters:
-        Needs keylight, filllight, rimLigth, and light rig object settings
-        at the time of initialization
-"""
-class LightRig():
-
-    def __init__(self, keyLight, fillLight, rimLight, rigSettings):
-        self.keyLight = keyLight
-        self.fillLight = fillLight
-        self.rimLight = rimLight
-        self.settings = rigSettings
-
-    """
-    Desc:
-        The is the main function which actually creates
-        3-point light rig
-    Parameters:
-        NONE
-    Returns:
-        NONE
-    """
-    def createRig(self):
-        # Create a Cube for test cases
-        mc.polySphere(name='mySphere')
-        objCenter = mc.objectCenter('mySphere', l=True)
-
-        # Get the bounding box for the selected ojbject
-        XYZ = mc.xform('mySphere', bb=True, q=True)
-        rad = XYZ[3] / 2 * self.settings.radius
-        strltPos = self.settings.lightPos
-        lightP = 0.0
-
-        if strltPos == "High":
-            lightP = 5.0
-        elif strltPos == "Low":
-            lightP = -5.0
-        else:
-            lightP = 0.0
-
-        # Create a circle to place three point lights
-        mc.circle(n='curveLights', nr=(0, 1, 0), c=(0, 0, 0), sections=9, radius=rad)
-
-        # Create lights in three positions on the curve
-        loc = mc.pointOnCurve('curveLights', pr=0.0, p=True)
-        #_item = mc.spotLight(name='FillLight', coneAngle=45)
-        _item = self.createLight(self.fillLight, "FillLight")
-        mc.move(loc[0], loc[1]+lightP, loc[2], _item, ls=True)
-
-        loc = mc.pointOnCurve('curveLights', pr=3.0, p=True)
-        #_item = mc.spotLight(name='KeyLight', coneAngle=45)
-        _item = self.createLight(self.keyLight, "KeyLight")
-        mc.move(loc[0], loc[1]+lightP, loc[2], _item, ls=True)
-
-        loc = mc.pointOnCurve('curveLights', pr=6.0, p=True)
-        #_item = mc.spotLight(name='RimLight', coneAngle=45)
-        _item = self.createLight(self.rimLight, "RimLight")
-        mc.move(loc[0], loc[1]+lightP, loc[2], _item, ls=True)
-
-        # Create space locator and aimConstraints
-        mc.spaceLocator(n='fillLocator', p=(objCenter[0], objCenter[1], objCenter[2]))
-        mc.aimConstraint('fillLocator', 'FillLight', aimVector=(0.0, 0.0, -1.0))
-        mc.parent('fillLocator', 'curveLights', relative=True)
-
-        mc.spaceLocator(n='keyLocator', p=(objCenter[0], objCenter[1], objCenter[2]))
-        mc.aimConstraint('keyLocator', 'KeyLight', aimVector=(0.0, 0.0, -1.0))
-        mc.parent('keyLocator', 'curveLights', relative=True)
-
-        mc.spaceLocator(n='rimLocator', p=(objCenter[0], objCenter[1], objCenter[2]))
-        mc.aimConstraint('rimLocator', 'RimLight', aimVector=(0.0, 0.0, -1.0))
-        mc.parent('rimLocator', 'curveLights', relative=True)
-
-        # Create lights main locator
-        mc.spaceLocator(n='lightsMainLocator', p=(objCenter[0], objCenter[1], objCenter[2]))
-        mc.parent('FillLight', 'lightsMainLocator', relative=True)
-        mc.parent('KeyLight', 'lightsMainLocator', relative=True)
-        mc.parent('RimLight', 'lightsMainLocator', relative=True)
-
-        # Create Main Group for the entire light rig
-        mc.group('curveLights', 'lightsMainLocator', n='LightRigGroup')
-
-
-    """
-    Desc:
-        Method to create light
-    Parameters:
-        Light settings objects
-    Returns:
-        light object
-    """
-    def createLight(self, lightObj, name):
-        print "Intensity is: "
-        print(lightObj.intensity)
-        if lightObj.lightType == "Directional":
-            light = mc.directionalLight(name=name, rgb=lightObj.color, intensity=lightObj.intensity,
-                                 rs=lightObj.castShadows)
-        elif lightObj.lightType == "Point":
-            light = mc.pointLight(name=name, rgb=lightObj.color, intensity=lightObj.intensity,
-                                 rs=lightObj.castShadows)
-        else:
-            light = mc.spotLight(name=name, coneAngle=45, rgb=lightObj.color, intensity=lightObj.intensity,
-                                 rs=lightObj.castShadows)
-
-        return light
-
-
 """
     Desc:
         Class to create light panel with all UI elements
@@ -298,6 +191,7 @@ class LightRigPanel(object):
     def __init__(self):
         self.lightPos = "Center"
         self.radius = 5.0
+        self.rigType = lightrig.RIG_CURVE
 
     """
     Desc:
@@ -329,6 +223,16 @@ class LightRigPanel(object):
         self.txtRad.setFixedWidth(50)
         fbox.addRow(lblRad, self.txtRad)
 
+        lblRigType = QtWidgets.QLabel("Rig Type")
+        self.cboxRigType = QtWidgets.QComboBox()
+        for rigType in lightrig.RIG_TYPES:
+            self.cboxRigType.addItem(rigType)
+        self.cboxRigType.setToolTip("Curve: lights on a circle aimed by constraints\n"
+                                    "Static: lights placed and aimed once, no other node\n"
+                                    "Driven: static lights under one driver transform")
+        self.cboxRigType.currentIndexChanged.connect(lambda: self.rigTypeChanged())
+        fbox.addRow(lblRigType, self.cboxRigType)
+
         grpBox.setLayout(fbox)
 
         return grpBox
@@ -359,6 +263,17 @@ class LightRigPanel(object):
     def selectionChanged(self):
         self.lightPos = self.cboxPos.currentText()
 
+    """
+    Desc:
+        Event method, raised when the rig type selection is changed
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def rigTypeChanged(self):
+        self.rigType = self.cboxRigType.currentText()
+
     """
     Desc:
         Method to set default values in UI controls when button is clicked
@@ -367,19 +282,25 @@ class LightRigPanel(object):
     Returns:
         NONE
     """
-    def reloadDefaults(self, radius="10.0", pos=None):
+    def reloadDefaults(self, radius="10.0", pos=None, rigType=None):
         pos = pos or "Center"
+        rigType = rigType or lightrig.RIG_CURVE
         self.txtRad.setText(str(radius))
 
         index = self.cboxPos.findText(pos, QtCore.Qt.MatchFixedString)
         if index > 0:
             self.cboxPos.setCurrentIndex(index)
 
+        index = self.cboxRigType.findText(rigType, QtCore.Qt.MatchFixedString)
+        if index >= 0:
+            self.cboxRigType.setCurrentIndex(index)
+
     def toJSON(self):
         data = {
             'name': self.name,
             'lightPos': self.lightPos,
-            'radius': self.radius
+            'radius': self.radius,
+            'rigType': self.rigType
         }
         return data
 
@@ -411,6 +332,7 @@ class LightRigTool(QtWidgets.QMainWindow):
         self.grid.addWidget(self.fillLight.createUI("Fill Light"), 2, 1)
         self.grid.addWidget(self.createButtonsPanel(), 2, 2)
         self.grid.addWidget(self.rimLight.createUI("Rim/Back Light"), 3, 1)
+        self.grid.addWidget(self.createLibraryPanel(), 3, 2)
         self.grid.setSpacing(15)
         self.mainLayout.addLayout(self.grid)
         self.setCentralWidget(widget)
@@ -429,7 +351,7 @@ class LightRigTool(QtWidgets.QMainWindow):
         grpBox = QtWidgets.QGroupBox()
         vbox = QtWidgets.QVBoxLayout()
 
-        lbl = QtWidgets.QLabel("NOTE: Please select a source object before you create a 3-point light setup")
+        lbl = QtWidgets.QLabel("NOTE: Please select the objects to light before you create 3-point light setups")
         vbox.addWidget(lbl)
 
         hbox1 = QtWidgets.QHBoxLayout()
@@ -440,6 +362,23 @@ class LightRigTool(QtWidgets.QMainWindow):
         hbox1.addWidget(btnCreate)
         vbox.addItem(hbox1)
 
+        hbox3 = QtWidgets.QHBoxLayout()
+        verticalSpacer3 = QtWidgets.QSpacerItem(340, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        hbox3.addItem(verticalSpacer3)
+        btnBatch = QtWidgets.QPushButton("Create From Batch File")
+        btnBatch.clicked.connect(lambda: self.batchClicked())
+        hbox3.addWidget(btnBatch)
+        vbox.addItem(hbox3)
+
+        hbox4 = QtWidgets.QHBoxLayout()
+        verticalSpacer4 = QtWidgets.QSpacerItem(340, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        hbox4.addItem(verticalSpacer4)
+        btnApplyRigs = QtWidgets.QPushButton("Apply To Rigs")
+        btnApplyRigs.setToolTip("Apply the light settings to the selected rigs, or to every rig of the scene")
+        btnApplyRigs.clicked.connect(lambda: self.applyRigsClicked())
+        hbox4.addWidget(btnApplyRigs)
+        vbox.addItem(hbox4)
+
         hbox2 = QtWidgets.QHBoxLayout()
         verticalSpacer2 = QtWidgets.QSpacerItem(340, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         hbox2.addItem(verticalSpacer2)
@@ -468,16 +407,140 @@ class LightRigTool(QtWidgets.QMainWindow):
 
     """
     Desc:
-        Method to actually create a 3-point light rig
+        Method to create the preset library panel: search field, list of
+        the presets of the library, apply and save buttons
+    Parameters:
+        NONE
+    Returns:
+        groupbox
+    """
+    def createLibraryPanel(self):
+        grpBox = QtWidgets.QGroupBox("Preset Library")
+        vbox = QtWidgets.QVBoxLayout()
+
+        self.library = lightpresets.get_library()
+
+        self.txtSearch = QtWidgets.QLineEdit()
+        self.txtSearch.setPlaceholderText("Search presets")
+        self.txtSearch.textChanged.connect(lambda: self.searchChanged(refresh=False))
+        vbox.addWidget(self.txtSearch)
+
+        self.lstPresets = QtWidgets.QListWidget()
+        self.lstPresets.itemDoubleClicked.connect(lambda: self.applyClicked())
+        vbox.addWidget(self.lstPresets)
+
+        hbox = QtWidgets.QHBoxLayout()
+        btnApply = QtWidgets.QPushButton("Apply")
+        btnApply.clicked.connect(lambda: self.applyClicked())
+        btnSave = QtWidgets.QPushButton("Save To Library")
+        btnSave.clicked.connect(lambda: self.saveToLibraryClicked())
+        btnRefresh = QtWidgets.QPushButton("Refresh")
+        btnRefresh.clicked.connect(lambda: self.searchChanged())
+        hbox.addWidget(btnApply)
+        hbox.addWidget(btnSave)
+        hbox.addWidget(btnRefresh)
+        vbox.addItem(hbox)
+
+        grpBox.setLayout(vbox)
+        self.searchChanged()
+
+        return grpBox
+
+    """
+    Desc:
+        Event method, raised when the search text changes: lists the
+        matching presets from the index of the library
+    Parameters:
+        refresh: check the library files for changes first
+    Returns:
+        NONE
+    """
+    def searchChanged(self, refresh=True):
+        self.lstPresets.clear()
+        self.lstPresets.addItems(self.library.search(self.txtSearch.text(), refresh=refresh))
+        if refresh:
+            for name, (mtime, error) in sorted(self.library.errors.items()):
+                mc.warning("Invalid preset %s: %s" % (name, error))
+
+    """
+    Desc:
+        Method to load the selected library preset in the UI
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def applyClicked(self):
+        item = self.lstPresets.currentItem()
+        if item is not None:
+            self.parseJSON(self.library.get(item.text()))
+
+    """
+    Desc:
+        Method to save the settings of the UI as a library preset
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def saveToLibraryClicked(self):
+        name, ok = QtWidgets.QInputDialog.getText(self, "Save To Library", "Preset name")
+        if ok and name:
+            self.library.save(name, self.presetData())
+            self.searchChanged(refresh=False)
+
+    """
+    Desc:
+        Method to actually create a 3-point light rig around every
+        selected object
     Parameters:
         NONE
     Returns:
         NONE
     """
     def createClicked(self):
-        print "Create Clicked"
-        mainRig = LightRig(self.keyLight, self.fillLight, self.rimLight, self.lightRig)
-        mainRig.createRig()
+        targets = mc.ls(selection=True, transforms=True)
+        if not targets:
+            mc.warning("Select the objects to light")
+            return
+        mainRig = lightrig.LightRig(self.keyLight, self.fillLight, self.rimLight, self.lightRig)
+        print(mainRig.createRigs(targets))
+
+    """
+    Desc:
+        Method to create a 3-point light rig around every object listed
+        in a batch file, with the light settings of the file if it has
+        them, else the ones of the UI
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def batchClicked(self):
+        options = QtWidgets.QFileDialog.Options()
+        options |= QtWidgets.QFileDialog.DontUseNativeDialog
+        fileName, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Batch File", "",
+                                                            "JSON Files (*.json)", options=options)
+        if fileName:
+            print(lightrig.build_rigs_from_file(fileName, self.keyLight, self.fillLight,
+                                                self.rimLight, self.lightRig))
+
+    """
+    Desc:
+        Method to apply the light settings of the UI to the existing rigs:
+        the selected ones, or all of them when no rig is selected. Only
+        the attributes that differ are written.
+    Parameters:
+        NONE
+    Returns:
+        NONE
+    """
+    def applyRigsClicked(self):
+        rigs = lightrig.find_rigs(mc.ls(selection=True)) or lightrig.find_rigs()
+        if not rigs:
+            mc.warning("No light rig in the scene")
+            return
+        print(lightrig.apply_to_rigs(self.keyLight, self.fillLight, self.rimLight, rigs))
 
     """
     Desc:
@@ -501,15 +564,16 @@ class LightRigTool(QtWidgets.QMainWindow):
                                                             "JSON Files (*.json)", options=options)
         if fileName:
             print(fileName)
-            uidata = {
-                'KeyLight': self.keyLight.toJSON(),
-                'FillLight': self.fillLight.toJSON(),
-                'RimLight': self.rimLight.toJSON(),
-                'LightRig': self.lightRig.toJSON()
-            }
-            data = json.dumps(uidata, indent=4)
-            with open(fileName, 'w') as outfile:
-                json.dump(data, outfile)
+            lightpresets.save(fileName, self.presetData())
+
+    # Settings of the UI as a preset
+    def presetData(self):
+        return {
+            'KeyLight': self.keyLight.toJSON(),
+            'FillLight': self.fillLight.toJSON(),
+            'RimLight': self.rimLight.toJSON(),
+            'LightRig': self.lightRig.toJSON()
+        }
 
     def loadClicked(self):
         options = QtWidgets.QFileDialog.Options()
@@ -518,12 +582,14 @@ class LightRigTool(QtWidgets.QMainWindow):
                                                   "JSON Files (*.json)", options=options)
         if fileName:
             print(fileName)
-            with open(fileName) as data_file:
-                data_loaded = json.load(data_file)
-                self.parseJSON(data_loaded)
-
-    def parseJSON(self, data_loaded):
-        data = json.loads(data_loaded)
+            try:
+                data = lightpresets.load(fileName)
+            except ValueError as e:
+                mc.warning("Invalid preset %s: %s" % (fileName, e))
+                return
+            self.parseJSON(data)
+
+    def parseJSON(self, data):
         self.keyLight.reloadDefaults(type=data["KeyLight"]["lightType"]
                                      ,shadows=data["KeyLight"]["castshadows"]
                                      ,intensity=data["KeyLight"]["intensity"]
@@ -540,7 +606,8 @@ class LightRigTool(QtWidgets.QMainWindow):
                                      , color=data["RimLight"]["color"])
 
         self.lightRig.reloadDefaults(radius=data["LightRig"]["radius"]
-                                     ,pos=data["LightRig"]["lightPos"])
+                                     ,pos=data["LightRig"]["lightPos"]
+                                     ,rigType=data["LightRig"].get("rigType"))
 
 
 """
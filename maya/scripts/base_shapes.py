@@ -1,7 +1,9 @@
 import maya.cmds as mc
 
+import primcache
 
-def make_shape(type, name, divisions):
+
+def make_shape(type, name, divisions, cached=False):
     """
     Creates shape based on argument passed
 
@@ -10,21 +12,20 @@ def make_shape(type, name, divisions):
         name: name of the object
         divisions: number of subdivisions we want to apply in x,y and z axis.
                    Same value will be taken in all axis.
+        cached: duplicate a hidden template built once per session for this
+                type and divisions instead of building the shape again,
+                see primcache. The copy has no construction history.
     Return:
-        None
+        name of the shape transform
     """
 
-    if type == 'cube':
-        mc.polyCube(n=name, sx=divisions, sy=divisions, sz=divisions)
-    elif type == 'cone':
-        mc.polyCone(n=name, sx=divisions, sy=divisions, sz=divisions)
-    elif type == 'cylinder':
-        mc.polyCylinder(n=name, sx=divisions, sy=divisions, sz=divisions)
-    elif type == 'plane':
-        mc.polyPlane(n=name, sx=divisions, sy=divisions)
-    elif type == 'torus':
-        mc.polyTorus(n=name, sx=divisions, sy=divisions)
-    elif type == 'sphere':
-        mc.polySphere(n=name, sx=divisions, sy=divisions)
+    if type in ('cube', 'cone', 'cylinder'):
+        flags = {'sx': divisions, 'sy': divisions, 'sz': divisions}
+    elif type in ('plane', 'torus', 'sphere'):
+        flags = {'sx': divisions, 'sy': divisions}
     else:
-        mc.polySphere()
\ No newline at end of file
+        return mc.polySphere()[0]
+
+    if cached:
+        return primcache.duplicate(type, flags, name=name)
+    return primcache.create(type, flags, name=name)
@@ -0,0 +1,115 @@
+##################################################################
+#        EXECUTION CONTEXT FOR BULK SCENE EDITS                   #
+##################################################################
+#
+#   with bulkedit.BulkEdit("cloneOnMeshes"):
+#       ... thousands of commands ...
+#
+#   The commands are undone in one step, the viewport doesn't redraw
+#   until the edit is over and, optionally, no construction history is
+#   made. Undo, refresh and history are always put back as they were,
+#   even when the edit fails. The edit is timed.
+#
+#   Also used by the render farm tool, see renderfarmtool/scriptspath.py.
+
+import functools
+import time
+
+import maya.cmds as mc
+
+
+# Nested edits leave the refresh suspended until the outermost one ends
+_suspendDepth = 0
+
+
+def _suspend_refresh():
+    global _suspendDepth
+    if _suspendDepth == 0:
+        mc.refresh(suspend=True)
+    _suspendDepth += 1
+
+
+def _resume_refresh():
+    global _suspendDepth
+    _suspendDepth -= 1
+    if _suspendDepth == 0:
+        mc.refresh(suspend=False)
+
+
+"""
+    Desc:
+        Context manager wrapping a bulk scene edit
+    Parameters:
+        name: name of the undo chunk and of the timing
+        undoChunk: record every command in one undo chunk
+        recordUndo: record undo at all, False turns the undo queue off
+                    (without flushing it) for edits that can't be undone
+                    anyway, e.g. importing references
+        suspendRefresh: suspend viewport refresh
+        history: make construction history, False turns it off
+        verbose: print the time the edit took
+"""
+class BulkEdit(object):
+
+    def __init__(self, name, undoChunk=True, recordUndo=True, suspendRefresh=True, history=True, verbose=False):
+        self.name = name
+        self.undoChunk = undoChunk
+        self.recordUndo = recordUndo
+        self.suspendRefresh = suspendRefresh
+        self.history = history
+        self.verbose = verbose
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.time()
+        self.undoState = mc.undoInfo(query=True, stateWithoutFlush=True)
+        if not self.recordUndo:
+            mc.undoInfo(stateWithoutFlush=False)
+        elif self.undoChunk:
+            mc.undoInfo(openChunk=True, chunkName=self.name)
+
+        if not self.history:
+            self.historyState = mc.constructionHistory(query=True, toggle=True)
+            mc.constructionHistory(toggle=False)
+
+        if self.suspendRefresh:
+            _suspend_refresh()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        try:
+            if self.suspendRefresh:
+                _resume_refresh()
+        finally:
+            try:
+                if not self.history:
+                    mc.constructionHistory(toggle=self.historyState)
+            finally:
+                if not self.recordUndo:
+                    mc.undoInfo(stateWithoutFlush=self.undoState)
+                elif self.undoChunk:
+                    mc.undoInfo(closeChunk=True)
+
+        self.elapsed = time.time() - self.start
+        if self.verbose:
+            print("%s: %.2fs%s" % (self.name, self.elapsed, " (failed)" if excType else ""))
+        return False
+
+
+"""
+    Desc:
+        Decorator running a function as a BulkEdit
+    Parameters:
+        name: name of the edit, defaults to the function name
+        options: BulkEdit options
+    Returns:
+        decorator
+"""
+def bulk_edit(name=None, **options):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with BulkEdit(name or func.__name__, **options):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,56 @@
+##################################################################
+#        BENCHMARK THE CLONER OUTPUT MODES (RUN WITH MAYAPY)     #
+##################################################################
+#
+#   mayapy clone_benchmark.py 10 30 60
+#
+#   Clones a primitive on polySpheres of growing subdivisions, once per
+#   output mode, each in a new scene, and prints the CloneReport of
+#   every run with its nodes and heap memory measured against the
+#   duplicates run of the same sphere. Can also be run from the script
+#   editor: run().
+
+import sys
+
+import maya.cmds as mc
+
+import cloner
+
+
+"""
+    Desc:
+        Run every output mode on source spheres of growing density
+    Parameters:
+        subdivisions: subdivisions of the source spheres
+        obj: name of the primitive to clone
+        modes: output modes to compare
+    Returns:
+        list of (vertex count, CloneReport)
+"""
+def run(subdivisions=(10, 30, 60), obj="Sphere", modes=cloner.MODES):
+    results = []
+    for sub in subdivisions:
+        duplicates = None
+        for mode in modes:
+            mc.file(new=True, force=True)
+            source = mc.polySphere(sx=sub, sy=sub, r=5)[0]
+            vertices = mc.polyEvaluate(source, vertex=True)
+            report = cloner.clone_on_mesh(source, obj, mode)
+            if mode == cloner.DUPLICATES:
+                duplicates = report
+            print("%6d vertices  %s%s" % (vertices, report, compared(report, duplicates)))
+            results.append((vertices, report))
+    return results
+
+
+# Nodes and memory of a run against the duplicates run, measured both
+def compared(report, duplicates):
+    if duplicates is None or report is duplicates:
+        return ""
+    return " (duplicates: %d nodes, %.1f MB)" % (duplicates.nodes, duplicates.memory)
+
+
+if __name__ == '__main__':
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    run([int(arg) for arg in sys.argv[1:]] or (10, 30, 60))
@@ -0,0 +1,505 @@
+##################################################################
+#        CLONE A PRIMITIVE ON THE SURFACE OF A MESH, NO UI        #
+##################################################################
+
+import maya.cmds as mc
+import array
+import math
+import multiprocessing.pool
+import random
+import time
+
+import bulkedit
+import meshdata
+import primcache
+import distribution
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Output modes
+DUPLICATES = "Duplicates"
+INSTANCES = "Instances"
+MERGED = "Merged mesh"
+MODES = (DUPLICATES, INSTANCES, MERGED)
+
+# Normals shorter than this have no direction: the clone keeps the
+# identity orientation
+NORMAL_TOLERANCE = 1e-8
+
+
+# Primitive type, subdivision and size flags of every cloner option
+PRIMITIVES = {
+    "Sphere": ("sphere", {"sx": 9, "sy": 9}, {"r": 0.1}),
+    "Cube": ("cube", {"sx": 1, "sy": 1, "sz": 1}, {"w": 0.1, "h": 0.1, "d": 0.1}),
+    "Cylinder": ("cylinder", {"sx": 9, "sy": 9, "sz": 9}, {"r": 0.1, "h": 0.1}),
+    "Cone": ("cone", {"sx": 9, "sy": 9, "sz": 4}, {"r": 0.1, "h": 0.1}),
+    "Plane": ("plane", {"sx": 1, "sy": 1}, {"w": 0.1, "h": 0.1}),
+    "Torus": ("torus", {"sx": 8, "sy": 8}, {"r": 0.1, "sr": 0.125}),
+    "Prism": ("prism", {"ns": 3, "sc": 1, "sh": 1}, {"l": 0.1, "w": 0.1}),
+    "Pyramid": ("pyramid", {"ns": 4, "sc": 0, "sh": 0.1}, {"w": 0.1}),
+}
+
+
+# Type, divisions and dimensions of a cloner option
+def primitive_settings(obj):
+    if obj not in PRIMITIVES:
+        raise ValueError("Unknown primitive: %s" % obj)
+    return PRIMITIVES[obj]
+
+
+"""
+    Desc:
+        Create one primitive with the settings of the cloner
+    Parameters:
+        obj: name of the primitive, see CopyObjectOnMeshGui options
+        cached: duplicate the cached template instead of building the
+                primitive with its history, see primcache
+    Returns:
+        name of the primitive transform
+"""
+def make_primitive(obj, cached=False):
+    if cached:
+        return primcache.duplicate(*primitive_settings(obj))
+    return primcache.create(*primitive_settings(obj))
+
+
+# Hidden group holding the instance sources of live previews
+PREVIEW_SOURCE_GROUP = "clonePreviewSources_Grp"
+
+
+"""
+    Desc:
+        Create a hidden copy of the primitive for a live preview to
+        instance: swap_source changes every clone at once through it
+    Parameters:
+        obj: name of the primitive
+    Returns:
+        name of the source transform
+"""
+def make_preview_source(obj):
+    source = make_primitive(obj, cached=True)
+    return mc.parent(source, primcache.hidden_group(PREVIEW_SOURCE_GROUP))[0]
+
+
+"""
+    Desc:
+        Turn every instance of a preview source into another primitive,
+        by feeding the cached template mesh into the source shape: one
+        connection instead of recreating the clones
+    Parameters:
+        source: transform made by make_preview_source
+        obj: name of the new primitive
+    Returns:
+        NONE
+"""
+def swap_source(source, obj):
+    template = primcache.get_template(*primitive_settings(obj))
+    templateShape = mc.listRelatives(template, shapes=True, fullPath=True)[0]
+    sourceShape = mc.listRelatives(source, shapes=True, fullPath=True)[0]
+    mc.connectAttr(templateShape + '.outMesh', sourceShape + '.inMesh', force=True)
+
+
+"""
+    Desc:
+        Cut a preview source off the cached template it was swapped to,
+        keeping its current geometry, so the clones of a kept preview
+        don't change when the template cache evicts or clears it
+    Parameters:
+        source: transform made by make_preview_source
+    Returns:
+        NONE
+"""
+def detach_source(source):
+    sourceShape = mc.listRelatives(source, shapes=True, fullPath=True)[0]
+    for plug in mc.listConnections(sourceShape + '.inMesh', source=True, destination=False, plugs=True) or []:
+        mc.disconnectAttr(plug, sourceShape + '.inMesh')
+
+
+# Heap memory used by Maya in MB
+def heap_memory():
+    mem = mc.memory(heapMemory=True, megaByte=True)
+    return float(mem[0] if isinstance(mem, list) else mem)
+
+
+"""
+    Desc:
+        Class to hold what a clone run made, for comparing the modes:
+        nodes and heap memory are measured before and after the run, see
+        clone_benchmark to compare them between modes
+"""
+class CloneReport(object):
+
+    def __init__(self, mode, obj):
+        self.mode = mode
+        self.obj = obj
+        self.clones = 0
+        self.nodes = 0
+        self.memory = 0.0
+        self.meshes = 0
+        self.elapsed = 0.0
+        self.timings = []
+        self.groups = []
+
+    def __str__(self):
+        text = ("%s: %d %s clones on %d meshes, %d nodes, %.1f MB in %.2fs"
+                % (self.mode, self.clones, self.obj, self.meshes, self.nodes, self.memory, self.elapsed))
+        if self.timings:
+            text += " [%s]" % ", ".join("%s %.2fs" % t for t in self.timings)
+        return text
+
+
+# Move a clone to its position, and rotation if any, in one command
+def place(item, loc, rotation=None):
+    if rotation is None:
+        mc.setAttr('%s.translate' % item, loc[0], loc[1], loc[2])
+    else:
+        mc.xform(item, translation=loc, rotation=rotation)
+
+
+"""
+    Desc:
+        Create a copy of the primitive, with its own shape, for every
+        point. Copies are duplicated from the cached template.
+    Parameters:
+        points: flat array of positions, see meshdata
+        obj: name of the primitive
+        grpName: group the clones are parented to
+        rotations: optional rotation of every clone in degrees
+    Returns:
+        list of clone transforms
+"""
+def clone_duplicates(points, obj, grpName, rotations=None):
+    clones = []
+    for i, loc in enumerate(meshdata.iter_vectors(points)):
+        _item = make_primitive(obj, cached=True)
+        mc.group(_item, parent=grpName)
+        # translate the created primitive to vertex location in space
+        place(_item, loc, rotations[i] if rotations else None)
+        clones.append(_item)
+    return clones
+
+
+"""
+    Desc:
+        Instance the cached template of the primitive on every point: each
+        clone is a single transform sharing the template shape
+    Parameters:
+        points: flat array of positions, see meshdata
+        obj: name of the primitive
+        grpName: group the clones are parented to
+        rotations: optional rotation of every clone in degrees
+        source: optional hidden node to instance instead of the template,
+                see make_preview_source
+    Returns:
+        list of clone transforms
+"""
+def clone_instances(points, obj, grpName, rotations=None, source=None):
+    if source is not None:
+        clones = primcache.instance_node(source, len(points) // 3, grpName)
+    else:
+        shapeType, divisions, dimensions = primitive_settings(obj)
+        clones = primcache.instance(shapeType, divisions, dimensions, len(points) // 3, grpName)
+    for i, loc in enumerate(meshdata.iter_vectors(points)):
+        place(clones[i], loc, rotations[i] if rotations else None)
+    return clones
+
+
+"""
+    Desc:
+        Random rotation and uniform scale of every clone, as row-major 3x3
+        matrices. The same seed always gives the same matrices.
+    Parameters:
+        count: number of clones
+        seed: seed of the random generator
+        rotate: maximum rotation in degrees around each axis
+        scale: maximum scale variation, scale is picked in [1-scale, 1+scale]
+    Returns:
+        list of 9-tuples, None when there is nothing random to apply
+"""
+def random_matrices(count, seed=0, rotate=0.0, scale=0.0):
+    if not rotate and not scale:
+        return None
+    rand = random.Random(seed)
+    matrices = []
+    for i in range(count):
+        rx, ry, rz = [math.radians(rand.uniform(-rotate, rotate)) for axis in range(3)]
+        s = rand.uniform(1.0 - scale, 1.0 + scale)
+        cx, sx = math.cos(rx), math.sin(rx)
+        cy, sy = math.cos(ry), math.sin(ry)
+        cz, sz = math.cos(rz), math.sin(rz)
+        # Rz * Ry * Rx, the xyz rotate order of Maya transforms
+        matrices.append((s * cy * cz, s * (sx * sy * cz - cx * sz), s * (cx * sy * cz + sx * sz),
+                         s * cy * sz, s * (sx * sy * sz + cx * cz), s * (cx * sy * sz - sx * cz),
+                         s * -sy, s * sx * cy, s * cx * cy))
+    return matrices
+
+
+"""
+    Desc:
+        Rotation of every clone turning its Y axis along the surface
+        normal, computed for all clones in one pass
+    Parameters:
+        normals: flat array of vertex normals, see meshdata
+    Returns:
+        row-major 3x3 matrices, one row of 9 floats per clone, the
+        identity for a zero-length normal
+"""
+def normal_matrices(normals):
+    if numpy is not None:
+        y = numpy.array(normals, dtype=numpy.float64).reshape(-1, 3)
+        length = numpy.linalg.norm(y, axis=1)
+        # Zero-length normals are taken as +Y, which gives the identity
+        flat = ~(length > NORMAL_TOLERANCE)
+        y[flat] = (0.0, 1.0, 0.0)
+        length[flat] = 1.0
+        y = y / length[:, None]
+        # Reference axis not parallel to the normal
+        ref = numpy.zeros_like(y)
+        nearX = numpy.abs(y[:, 0]) > 0.9
+        ref[nearX, 1] = 1.0
+        ref[~nearX, 0] = 1.0
+        z = numpy.cross(ref, y)
+        z /= numpy.linalg.norm(z, axis=1)[:, None]
+        x = numpy.cross(y, z)
+        return numpy.stack((x, y, z), axis=2).reshape(-1, 9)
+
+    matrices = []
+    for nx, ny, nz in meshdata.iter_vectors(normals):
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        if not length > NORMAL_TOLERANCE:
+            matrices.append((1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0))
+            continue
+        nx, ny, nz = nx / length, ny / length, nz / length
+        rx, ry, rz = (0.0, 1.0, 0.0) if abs(nx) > 0.9 else (1.0, 0.0, 0.0)
+        # z = ref x normal, x = normal x z
+        zx, zy, zz = ry * nz - rz * ny, rz * nx - rx * nz, rx * ny - ry * nx
+        length = math.sqrt(zx * zx + zy * zy + zz * zz)
+        zx, zy, zz = zx / length, zy / length, zz / length
+        xx, xy, xz = ny * zz - nz * zy, nz * zx - nx * zz, nx * zy - ny * zx
+        matrices.append((xx, nx, zx, xy, ny, zy, xz, nz, zz))
+    return matrices
+
+
+# Multiply two lists of row-major 3x3 matrices clone by clone, a * b
+def multiply_matrices(a, b):
+    if numpy is not None:
+        m = numpy.matmul(numpy.asarray(a, dtype=numpy.float64).reshape(-1, 3, 3),
+                         numpy.asarray(b, dtype=numpy.float64).reshape(-1, 3, 3))
+        return m.reshape(-1, 9)
+    return [tuple(sum(ma[r * 3 + k] * mb[k * 3 + c] for k in range(3)) for r in range(3) for c in range(3))
+            for ma, mb in zip(a, b)]
+
+
+# Rotation in degrees (xyz rotate order) of every row-major 3x3 matrix
+def matrices_to_euler(matrices):
+    rotations = []
+    for m in matrices:
+        if abs(m[6]) < 0.99999:
+            rx = math.atan2(m[7], m[8])
+            ry = math.asin(-m[6])
+            rz = math.atan2(m[3], m[0])
+        else:
+            # Gimbal lock: rotation around y of +-90 degrees
+            rx = math.atan2(-m[5], m[4])
+            ry = math.copysign(math.pi / 2, -m[6])
+            rz = 0.0
+        rotations.append((math.degrees(rx), math.degrees(ry), math.degrees(rz)))
+    return rotations
+
+
+"""
+    Desc:
+        Copy the point and face arrays of a template once per clone,
+        moved to the clone position, in bulk. Uses numpy when Maya has it.
+    Parameters:
+        template: (points, counts, connects) of the primitive
+        points: flat array of clone positions
+        matrices: optional rotation/scale matrix of every clone
+    Returns:
+        points, counts and connects of the merged mesh
+"""
+def merge_arrays(template, points, matrices=None):
+    tPoints, tCounts, tConnects = template
+    nVerts = len(tPoints) // 3
+    nClones = len(points) // 3
+
+    if numpy is not None:
+        tp = numpy.asarray(tPoints, dtype=numpy.float64).reshape(-1, 3)
+        locs = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+        if matrices is not None:
+            m = numpy.asarray(matrices, dtype=numpy.float64).reshape(-1, 3, 3)
+            merged = numpy.einsum('nij,vj->nvi', m, tp) + locs[:, None, :]
+        else:
+            merged = tp[None, :, :] + locs[:, None, :]
+        offsets = numpy.arange(nClones, dtype=numpy.int32)[:, None] * nVerts
+        connects = (numpy.asarray(tConnects, dtype=numpy.int32)[None, :] + offsets).ravel()
+        return merged.ravel(), tCounts * nClones, connects.tolist()
+
+    tVectors = list(meshdata.iter_vectors(tPoints))
+    merged = array.array('d')
+    connects = array.array('i')
+    for i, (lx, ly, lz) in enumerate(meshdata.iter_vectors(points)):
+        if matrices is not None:
+            m = matrices[i]
+            for x, y, z in tVectors:
+                merged.extend((m[0] * x + m[1] * y + m[2] * z + lx,
+                               m[3] * x + m[4] * y + m[5] * z + ly,
+                               m[6] * x + m[7] * y + m[8] * z + lz))
+        else:
+            for x, y, z in tVectors:
+                merged.extend((x + lx, y + ly, z + lz))
+        offset = i * nVerts
+        connects.extend([c + offset for c in tConnects])
+    return merged, tCounts * nClones, connects
+
+
+# Matrix of every clone: random rotation/scale, then normal alignment
+def clone_matrices(count, seed=0, rotate=0.0, scale=0.0, normals=None):
+    matrices = random_matrices(count, seed, rotate, scale)
+    if normals is None:
+        return matrices
+    aligned = normal_matrices(normals)
+    if matrices is None:
+        return aligned
+    return multiply_matrices(aligned, matrices)
+
+
+"""
+    Desc:
+        Build every clone of a template mesh as one merged mesh in one
+        step: no transform, shape or history per clone. Meant for render
+        only scatter results.
+    Parameters:
+        template: name of the mesh to clone, left untouched
+        points: flat array of clone positions, see meshdata
+        name: name of the merged mesh
+        seed, rotate, scale: random rotation/scale, see random_matrices
+        normals: optional flat array of normals to align the clones to
+    Returns:
+        name of the merged mesh transform
+"""
+def merge_on_points(template, points, name, seed=0, rotate=0.0, scale=0.0, normals=None):
+    tPoints = meshdata.get_points(template)
+    tCounts, tConnects = meshdata.get_topology(template)
+    matrices = clone_matrices(len(points) // 3, seed, rotate, scale, normals)
+    merged = merge_arrays((tPoints, tCounts, tConnects), points, matrices)
+    return meshdata.create_mesh(merged[0], merged[1], merged[2], name)
+
+
+"""
+    Desc:
+        Worker: work out where the clones of one mesh go and how they are
+        turned, from numeric arrays only, so it can run on another thread
+    Parameters:
+        job: dict with the mesh data (see distribution.read_mesh), the
+             clone settings and, in MERGED mode, the template arrays
+    Returns:
+        dict with the clone points and, in MERGED mode, the merged mesh
+        arrays, else the rotation of every clone
+"""
+def plan_clones(job):
+    points, normals = distribution.sample(job["data"], job["spread"], job["amount"], job["seed"],
+                                          job["alignToNormal"])
+    plan = {"mesh": job["mesh"], "points": points}
+    if job["mode"] == MERGED:
+        matrices = clone_matrices(len(points) // 3, job["seed"], job["rotate"], job["scale"], normals)
+        plan["merged"] = merge_arrays(job["template"], points, matrices)
+    elif normals is not None:
+        plan["rotations"] = matrices_to_euler(normal_matrices(normals))
+    return plan
+
+
+# Plan the clones of every mesh, on a few threads when there is more
+# than one: the work is light and mostly numpy, not worth a process pool
+def plan_all(jobs, threads=None):
+    if threads == 0 or len(jobs) < 2:
+        return [plan_clones(job) for job in jobs]
+    pool = multiprocessing.pool.ThreadPool(min(threads or multiprocessing.cpu_count(), len(jobs)))
+    try:
+        plans = pool.map(plan_clones, jobs)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return plans
+
+
+"""
+    Desc:
+        Clone a primitive on every selected mesh, each in a group named
+        after the mesh and the primitive, and measure what it cost.
+        Mesh arrays are read in bulk, clone positions and turns are worked
+        out on a few threads, then every node is made in one pass,
+        as one BulkEdit.
+    Parameters:
+        meshes: names of the source meshes
+        obj: name of the primitive
+        mode: DUPLICATES, INSTANCES or MERGED
+        seed, rotate, scale: random rotation/scale of the merged mesh
+                             clones, see random_matrices
+        alignToNormal: turn the Y axis of every clone along the surface
+                       normal
+        spread: where the clones go, see distribution.MODES
+        amount: N, number of clones or spacing of the distribution
+        threads: number of planning threads, 0 to plan on the calling
+                 thread
+        source: INSTANCES mode, optional hidden node to instance instead
+                of the template, see make_preview_source
+    Returns:
+        CloneReport
+"""
+def clone_on_meshes(meshes, obj, mode=DUPLICATES, seed=0, rotate=0.0, scale=0.0, alignToNormal=False,
+                    spread=distribution.ALL_VERTICES, amount=None, threads=None, source=None):
+    start = time.time()
+    report = CloneReport(mode, obj)
+    nodeCount = len(mc.ls())
+    memory = heap_memory()
+
+    template = None
+    if mode == MERGED:
+        primitive = primcache.get_template(*primitive_settings(obj))
+        template = (meshdata.get_points(primitive),) + meshdata.get_topology(primitive)
+
+    jobs = []
+    for mesh in meshes:
+        jobs.append({"mesh": mesh, "data": distribution.read_mesh(mesh, spread, alignToNormal),
+                     "spread": spread, "amount": amount, "seed": seed, "alignToNormal": alignToNormal,
+                     "mode": mode, "rotate": rotate, "scale": scale, "template": template})
+    report.timings.append(("read", time.time() - start))
+
+    t = time.time()
+    plans = plan_all(jobs, threads)
+    report.timings.append(("plan", time.time() - t))
+
+    with bulkedit.BulkEdit("cloneOnMeshes") as edit:
+        for plan in plans:
+            shortName = plan["mesh"].split('|')[-1]
+            grpName = mc.group(em=True, name='%s_%s_Grp' % (shortName, obj))
+            if mode == MERGED:
+                merged = plan["merged"]
+                mc.parent(meshdata.create_mesh(merged[0], merged[1], merged[2], '%s_%s_Merged' % (shortName, obj)),
+                          grpName)
+            elif mode == INSTANCES:
+                clone_instances(plan["points"], obj, grpName, plan.get("rotations"), source)
+            else:
+                clone_duplicates(plan["points"], obj, grpName, plan.get("rotations"))
+            report.clones += len(plan["points"]) // 3
+            report.groups.append(grpName)
+    report.timings.append(("create", edit.elapsed))
+
+    report.meshes = len(meshes)
+    report.nodes = len(mc.ls()) - nodeCount
+    report.memory = heap_memory() - memory
+    report.elapsed = time.time() - start
+
+    return report
+
+
+# Clone a primitive on one mesh, see clone_on_meshes
+def clone_on_mesh(mesh, obj, mode=DUPLICATES, seed=0, rotate=0.0, scale=0.0, alignToNormal=False,
+                  spread=distribution.ALL_VERTICES, amount=None):
+    return clone_on_meshes([mesh], obj, mode, seed, rotate, scale, alignToNormal, spread, amount, threads=0)
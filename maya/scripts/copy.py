@@ -1,30 +1,46 @@
 import maya.cmds as mc
 
+import bulkedit
+import cloner
+import meshdata
+
 """
 The below script generates a sphere on every vertex
 of the selected mesh.
 It is mandatory to select a POLYGONAL mesh before executing
 the below script
 
+Set mergedOutput to build every sphere as one merged mesh instead,
+for render only scatter results, see cloner.merge_on_points
+
 Args:
     NONE
 Return:
     None
 """
-    
+
+# Build one merged mesh instead of one sphere per vertex
+mergedOutput = False
+
 # Get the selected object
 selObjs = mc.ls(sl=True)
 
-# Fetch all the vertices for the selected object
-srcVrts = mc.ls('%s.vtx[:]' % selObjs[0], fl=True)
-
-# loop through vertices in mesh vertices list
-for vtx in srcVrts:
-    # get the position of the vertex in model space
-    loc = mc.pointPosition(vtx, l=True)
-    # create a sphere with below flags
-    sphr = mc.polySphere(sx=8, sy=8, r = 0.1)
-    # translate the created sphere to vertex location in space
-    mc.setAttr('%s.translateX' % sphr[0], loc[0])
-    mc.setAttr('%s.translateY' % sphr[0], loc[1])
-    mc.setAttr('%s.translateZ' % sphr[0], loc[2])
+# Fetch the model space position of every vertex in one query
+points = meshdata.get_points(selObjs[0])
+
+# one undo step, no viewport refresh while the spheres are made
+with bulkedit.BulkEdit("copy", verbose=True):
+    if mergedOutput:
+        # one sphere template, copied on every vertex in one mesh
+        sphr = mc.polySphere(sx=8, sy=8, r = 0.1)
+        cloner.merge_on_points(sphr[0], points, '%s_Spheres' % selObjs[0])
+        mc.delete(sphr[0])
+    else:
+        # loop through vertex positions
+        for loc in meshdata.iter_vectors(points):
+            # create a sphere with below flags
+            sphr = mc.polySphere(sx=8, sy=8, r = 0.1)
+            # translate the created sphere to vertex location in space
+            mc.setAttr('%s.translateX' % sphr[0], loc[0])
+            mc.setAttr('%s.translateY' % sphr[0], loc[1])
+            mc.setAttr('%s.translateZ' % sphr[0], loc[2])
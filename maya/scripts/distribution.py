@@ -0,0 +1,257 @@
+##################################################################
+#        WHERE TO PUT THE CLONES ON A MESH, FROM MESH ARRAYS      #
+##################################################################
+#
+#   Every mode works on the flat arrays of meshdata in one pass, no
+#   per vertex or per face command, and returns the flat positions
+#   (and normals) of the clones.
+
+import array
+import bisect
+import math
+import random
+
+import maya.api.OpenMaya as om
+
+import meshdata
+
+
+# Distribution modes, and what their amount means
+ALL_VERTICES = "All vertices"
+EVERY_NTH = "Every Nth vertex"
+MAX_COUNT = "Max clone count"
+RANDOM_ON_FACES = "Random on faces"
+POISSON_DISK = "Poisson disk"
+MODES = (ALL_VERTICES, EVERY_NTH, MAX_COUNT, RANDOM_ON_FACES, POISSON_DISK)
+AMOUNTS = {
+    ALL_VERTICES: None,
+    EVERY_NTH: "N",
+    MAX_COUNT: "clones",
+    RANDOM_ON_FACES: "clones",
+    POISSON_DISK: "spacing",
+}
+
+# Candidates tested per disk area by the Poisson disk mode
+POISSON_CANDIDATES = 4
+POISSON_MAX_CANDIDATES = 2000000
+
+
+# Keep the vectors of a flat array at the given indices
+def take(flat, indices):
+    if flat is None:
+        return None
+    out = array.array('d')
+    for i in indices:
+        out.extend(flat[i * 3:i * 3 + 3])
+    return out
+
+
+"""
+    Desc:
+        Keep one vertex out of every N
+    Parameters:
+        points, normals: flat arrays, normals may be None
+        step: N
+    Returns:
+        flat points and normals of the kept vertices
+"""
+def every_nth(points, normals, step):
+    indices = range(0, len(points) // 3, max(1, int(step)))
+    return take(points, indices), take(normals, indices)
+
+
+"""
+    Desc:
+        Keep at most count vertices, picked at random but always the same
+        for the same seed, in vertex order
+    Parameters:
+        points, normals: flat arrays, normals may be None
+        count: maximum number of vertices
+        seed: seed of the random generator
+    Returns:
+        flat points and normals of the kept vertices
+"""
+def max_count(points, normals, count, seed=0):
+    total = len(points) // 3
+    count = int(count)
+    if count >= total:
+        return points, normals
+    indices = sorted(random.Random(seed).sample(range(total), max(0, count)))
+    return take(points, indices), take(normals, indices)
+
+
+"""
+    Desc:
+        Split every face in triangles (fans) and measure them
+    Parameters:
+        points: flat vertex positions
+        counts, connects: faces, see meshdata.get_topology
+    Returns:
+        list of (a, b, c) vertex indices, list of cumulated areas
+"""
+def triangles(points, counts, connects):
+    tris = []
+    cumulated = []
+    total = 0.0
+    start = 0
+    for count in counts:
+        a = connects[start]
+        for k in range(1, count - 1):
+            b, c = connects[start + k], connects[start + k + 1]
+            ax, ay, az = points[a * 3:a * 3 + 3]
+            ux, uy, uz = points[b * 3] - ax, points[b * 3 + 1] - ay, points[b * 3 + 2] - az
+            vx, vy, vz = points[c * 3] - ax, points[c * 3 + 1] - ay, points[c * 3 + 2] - az
+            cx, cy, cz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+            total += 0.5 * math.sqrt(cx * cx + cy * cy + cz * cz)
+            tris.append((a, b, c))
+            cumulated.append(total)
+        start += count
+    return tris, cumulated
+
+
+"""
+    Desc:
+        Random points on the surface, faces getting clones in proportion
+        to their area, with the normal of the face they fall on
+    Parameters:
+        points: flat vertex positions
+        counts, connects: faces, see meshdata.get_topology
+        count: number of clones
+        seed: seed of the random generator
+    Returns:
+        flat points and normals of the clones
+"""
+def random_on_faces(points, counts, connects, count, seed=0):
+    tris, cumulated = triangles(points, counts, connects)
+    outPoints = array.array('d')
+    outNormals = array.array('d')
+    if not tris or cumulated[-1] <= 0.0:
+        return outPoints, outNormals
+
+    rand = random.Random(seed)
+    total = cumulated[-1]
+    for i in range(int(count)):
+        a, b, c = tris[min(bisect.bisect_left(cumulated, rand.random() * total), len(tris) - 1)]
+        # Uniform barycentric coordinates
+        r1, r2 = math.sqrt(rand.random()), rand.random()
+        wa, wb, wc = 1.0 - r1, r1 * (1.0 - r2), r1 * r2
+        ax, ay, az = points[a * 3:a * 3 + 3]
+        bx, by, bz = points[b * 3:b * 3 + 3]
+        cx, cy, cz = points[c * 3:c * 3 + 3]
+        outPoints.extend((wa * ax + wb * bx + wc * cx, wa * ay + wb * by + wc * cy, wa * az + wb * bz + wc * cz))
+        ux, uy, uz = bx - ax, by - ay, bz - az
+        vx, vy, vz = cx - ax, cy - ay, cz - az
+        nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+        length = math.sqrt(nx * nx + ny * ny + nz * nz) or 1.0
+        outNormals.extend((nx / length, ny / length, nz / length))
+    return outPoints, outNormals
+
+
+"""
+    Desc:
+        Points on the surface no closer to each other than a spacing:
+        random candidates are tested against their neighbours in a grid
+        and kept when none is too close (dart throwing)
+    Parameters:
+        points: flat vertex positions
+        counts, connects: faces, see meshdata.get_topology
+        spacing: minimum distance between two clones
+        seed: seed of the random generator
+    Returns:
+        flat points and normals of the clones
+"""
+def poisson_disk(points, counts, connects, spacing, seed=0):
+    outPoints = array.array('d')
+    outNormals = array.array('d')
+    if spacing <= 0.0:
+        return outPoints, outNormals
+
+    area = triangles(points, counts, connects)[1]
+    area = area[-1] if area else 0.0
+    candidates = min(POISSON_MAX_CANDIDATES, int(POISSON_CANDIDATES * area / (spacing * spacing)) + 1)
+    candPoints, candNormals = random_on_faces(points, counts, connects, candidates, seed)
+
+    # No two points kept can share a cell of this size
+    cellSize = spacing / math.sqrt(3.0)
+    grid = {}
+    spacing2 = spacing * spacing
+    kept = 0
+    for i, (x, y, z) in enumerate(meshdata.iter_vectors(candPoints)):
+        cx, cy, cz = int(math.floor(x / cellSize)), int(math.floor(y / cellSize)), int(math.floor(z / cellSize))
+        tooClose = False
+        for dx in (-2, -1, 0, 1, 2):
+            for dy in (-2, -1, 0, 1, 2):
+                for dz in (-2, -1, 0, 1, 2):
+                    j = grid.get((cx + dx, cy + dy, cz + dz))
+                    if j is not None:
+                        px, py, pz = outPoints[j * 3:j * 3 + 3]
+                        if (px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2 < spacing2:
+                            tooClose = True
+                            break
+                if tooClose:
+                    break
+            if tooClose:
+                break
+        if not tooClose:
+            grid[(cx, cy, cz)] = kept
+            outPoints.extend((x, y, z))
+            outNormals.extend(candNormals[i * 3:i * 3 + 3])
+            kept += 1
+    return outPoints, outNormals
+
+
+"""
+    Desc:
+        Read the arrays a distribution mode needs from a mesh, in bulk and
+        in world space, where the clones are placed: the transform of the
+        mesh is taken into account. Must run on the Maya main thread,
+        sample() can run anywhere.
+    Parameters:
+        mesh: name of the source mesh
+        mode: one of MODES
+        withNormals: also read the normals
+    Returns:
+        dict of flat arrays: points, and normals or counts and connects
+"""
+def read_mesh(mesh, mode=ALL_VERTICES, withNormals=False):
+    data = {"points": meshdata.get_points(mesh, om.MSpace.kWorld), "normals": None}
+    if mode in (RANDOM_ON_FACES, POISSON_DISK):
+        data["counts"], data["connects"] = meshdata.get_topology(mesh)
+    elif withNormals:
+        data["normals"] = meshdata.get_normals(mesh, om.MSpace.kWorld)
+    return data
+
+
+"""
+    Desc:
+        Positions (and normals) of the clones, from the arrays of read_mesh
+    Parameters:
+        data: dict as returned by read_mesh
+        mode: one of MODES
+        amount: N, number of clones or spacing, see AMOUNTS
+        seed: seed of the random modes
+        withNormals: also return the normals, else None
+    Returns:
+        flat points and normals in world space
+"""
+def sample(data, mode=ALL_VERTICES, amount=None, seed=0, withNormals=False):
+    points = data["points"]
+
+    if mode in (RANDOM_ON_FACES, POISSON_DISK):
+        if mode == RANDOM_ON_FACES:
+            points, normals = random_on_faces(points, data["counts"], data["connects"], amount, seed)
+        else:
+            points, normals = poisson_disk(points, data["counts"], data["connects"], amount, seed)
+        return points, normals if withNormals else None
+
+    normals = data["normals"] if withNormals else None
+    if mode == EVERY_NTH:
+        return every_nth(points, normals, amount)
+    if mode == MAX_COUNT:
+        return max_count(points, normals, amount, seed)
+    return points, normals
+
+
+# Positions (and normals) of the clones on a mesh, see sample
+def sample_mesh(mesh, mode=ALL_VERTICES, amount=None, seed=0, withNormals=False):
+    return sample(read_mesh(mesh, mode, withNormals), mode, amount, seed, withNormals)
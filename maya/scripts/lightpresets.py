@@ -0,0 +1,227 @@
+##################################################################
+#        LIGHT RIG PRESET LIBRARY                                 #
+##################################################################
+#
+#   library = lightpresets.get_library()
+#   library.search("night")      # names of the matching presets
+#   library.get("nightExterior") # the preset, a dict
+#
+#   A preset is one JSON file, encoded once, holding the settings of the
+#   three lights and of the rig (and optionally a Targets list, see
+#   lightrig.load_batch). Presets are checked against a schema when they
+#   are read and before they are saved. The files of a library directory
+#   are read once into an in-memory index and only read again when their
+#   modification time changes.
+
+import json
+import os
+
+import lightrig
+
+
+# Default library directory
+PRESET_DIR = os.environ.get("LIGHT_RIG_PRESETS",
+                            os.path.join(os.path.expanduser("~"), "maya", "lightRigPresets"))
+PRESET_EXT = ".json"
+
+LIGHT_TYPES = ("Spot", "Directional", "Point")
+LIGHT_NAMES = ("KeyLight", "FillLight", "RimLight")
+RIG_NAME = "LightRig"
+
+
+# An int or float, not a bool
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check(condition, message):
+    if not condition:
+        raise ValueError(message)
+
+
+"""
+    Desc:
+        Check a preset against the schema
+    Parameters:
+        data: decoded preset
+    Returns:
+        the preset
+    Raises:
+        ValueError naming the first invalid entry
+"""
+def validate(data):
+    _check(isinstance(data, dict), "A preset must be a JSON object")
+    for name in LIGHT_NAMES:
+        light = data.get(name)
+        _check(isinstance(light, dict), "%s is missing" % name)
+        _check(light.get("lightType") in LIGHT_TYPES, "%s: unknown lightType %r" % (name, light.get("lightType")))
+        _check(is_number(light.get("intensity")), "%s: intensity must be a number" % name)
+        color = light.get("color")
+        _check(isinstance(color, list) and len(color) == 3 and all(is_number(c) for c in color),
+               "%s: color must be 3 numbers" % name)
+        _check(isinstance(light.get("castshadows"), bool), "%s: castshadows must be true or false" % name)
+
+    rig = data.get(RIG_NAME)
+    _check(isinstance(rig, dict), "%s is missing" % RIG_NAME)
+    _check(rig.get("lightPos") in lightrig.LIGHT_HEIGHTS, "%s: unknown lightPos %r" % (RIG_NAME, rig.get("lightPos")))
+    _check(is_number(rig.get("radius")), "%s: radius must be a number" % RIG_NAME)
+    _check(rig.get("rigType", lightrig.RIG_CURVE) in lightrig.RIG_TYPES,
+           "%s: unknown rigType %r" % (RIG_NAME, rig.get("rigType")))
+
+    targets = data.get(lightrig.TARGETS_KEY, [])
+    _check(isinstance(targets, list), "%s must be a list" % lightrig.TARGETS_KEY)
+    return data
+
+
+"""
+    Desc:
+        Read and check a preset file
+    Parameters:
+        fileName: path of the preset
+    Returns:
+        preset dict
+    Raises:
+        ValueError if the file isn't a valid preset
+"""
+def load(fileName):
+    with open(fileName) as presetFile:
+        data = json.load(presetFile)
+    # Presets saved by earlier versions of the tool are encoded twice
+    if not isinstance(data, (dict, list)):
+        data = json.loads(data)
+    return validate(data)
+
+
+# Check and write a preset, encoded once
+def save(fileName, data):
+    validate(data)
+    with open(fileName, 'w') as presetFile:
+        json.dump(data, presetFile, indent=4, sort_keys=True)
+
+
+"""
+    Desc:
+        In-memory index of the presets of a directory
+    Parameters:
+        directory: library directory, created when a preset is saved
+"""
+class PresetLibrary(object):
+
+    def __init__(self, directory=PRESET_DIR):
+        self.directory = directory
+        # {name: (mtime, preset, search text)}
+        self.index = {}
+        # {name: (mtime, error message)} of the files that aren't valid
+        # presets
+        self.errors = {}
+
+    # Path of the file of a preset
+    def path(self, name):
+        return os.path.join(self.directory, name + PRESET_EXT)
+
+    """
+    Desc:
+        Bring the index up to date: only files that are new or were
+        modified since they were indexed are read
+    Parameters:
+        NONE
+    Returns:
+        number of files read
+    """
+    def refresh(self):
+        try:
+            fileNames = [f for f in os.listdir(self.directory) if f.endswith(PRESET_EXT)]
+        except OSError:
+            fileNames = []
+
+        names = set()
+        read = 0
+        for fileName in fileNames:
+            name = fileName[:-len(PRESET_EXT)]
+            try:
+                mtime = os.path.getmtime(os.path.join(self.directory, fileName))
+            except OSError:
+                continue
+            names.add(name)
+            entry = self.index.get(name)
+            if entry is not None and entry[0] == mtime:
+                continue
+            if name in self.errors and self.errors[name][0] == mtime:
+                continue
+
+            read += 1
+            try:
+                self.add(name, load(self.path(name)), mtime)
+            except (IOError, OSError, ValueError) as e:
+                self.index.pop(name, None)
+                self.errors[name] = (mtime, str(e))
+
+        for name in set(self.index) - names:
+            del self.index[name]
+        for name in set(self.errors) - names:
+            del self.errors[name]
+        return read
+
+    # Index a preset
+    def add(self, name, preset, mtime):
+        searchText = " ".join([name] + [preset[light]["lightType"] for light in LIGHT_NAMES]
+                              + [preset[RIG_NAME]["lightPos"], preset[RIG_NAME].get("rigType", lightrig.RIG_CURVE)])
+        self.index[name] = (mtime, preset, searchText.lower())
+        self.errors.pop(name, None)
+
+    # Sorted names of every valid preset
+    def names(self):
+        self.refresh()
+        return sorted(self.index)
+
+    """
+    Desc:
+        Find presets from the index
+    Parameters:
+        text: words that must all be in the name, light types, light
+              position or rig type of a preset, case insensitive
+        refresh: check the files for changes first
+    Returns:
+        sorted names of the matching presets
+    """
+    def search(self, text="", refresh=True):
+        if refresh:
+            self.refresh()
+        words = text.lower().split()
+        return sorted(name for name, (mtime, preset, searchText) in self.index.items()
+                      if all(word in searchText for word in words))
+
+    # Preset of a name, from the index
+    def get(self, name):
+        if name not in self.index:
+            self.refresh()
+        return self.index[name][1]
+
+    """
+    Desc:
+        Save a preset in the library and index it
+    Parameters:
+        name: name of the preset, its file name without extension
+        preset: preset dict
+    Returns:
+        path of the preset file
+    """
+    def save(self, name, preset):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self.path(name)
+        save(path, preset)
+        self.add(name, preset, os.path.getmtime(path))
+        return path
+
+
+# One library per directory for the whole session
+_libraries = {}
+
+
+# Library of a directory, scanned the first time it is asked for
+def get_library(directory=PRESET_DIR):
+    directory = os.path.abspath(directory)
+    if directory not in _libraries:
+        _libraries[directory] = PresetLibrary(directory)
+    return _libraries[directory]
@@ -0,0 +1,566 @@
+##################################################################
+#        3-POINT LIGHT RIGS AROUND TARGET OBJECTS, NO UI          #
+##################################################################
+#
+#   lightrig.build_rigs(["chair", "table"])
+#   lightrig.build_rigs_from_file("/path/to/set.json")
+#
+#   Every rig is built in its own namespace, so any number of rigs can
+#   live in one scene, and a whole batch is one undo chunk. The group of
+#   every rig records the object it lights.
+
+import json
+import math
+import re
+import time
+
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+import maya.mel as mel
+
+import bulkedit
+
+
+# Height of the lights above the target center for each light position
+LIGHT_HEIGHTS = {"High": 5.0, "Low": -5.0, "Center": 0.0}
+
+# Rig types: lights placed on a circle curve and aimed by constraints,
+# placed analytically with no other node, or placed analytically under a
+# single driver transform moving the whole rig
+RIG_CURVE = "Curve"
+RIG_STATIC = "Static"
+RIG_DRIVEN = "Driven"
+RIG_TYPES = (RIG_CURVE, RIG_STATIC, RIG_DRIVEN)
+
+# Sections of the circle of the curve rigs
+CIRCLE_SECTIONS = 9
+
+# Settings attribute, node name, locator name and circle parameter of
+# every light
+LIGHTS = (
+    ("fillLight", "FillLight", "fillLocator", 0.0),
+    ("keyLight", "KeyLight", "keyLocator", 3.0),
+    ("rimLight", "RimLight", "rimLocator", 6.0),
+)
+
+# Node type of every light type
+LIGHT_NODE_TYPES = {"Spot": "spotLight", "Directional": "directionalLight", "Point": "pointLight"}
+
+# Values closer than this are not written again by apply_to_rigs
+APPLY_TOLERANCE = 1e-6
+
+# Namespaces of the rigs are <prefix>_<target>
+NAMESPACE_PREFIX = "lightRig"
+
+# String attribute of the rig group naming the object it lights
+TARGET_ATTR = "lightRigTarget"
+
+# Name of the rig groups, rigs built before TARGET_ATTR existed are only
+# known by it and by the names of their lights
+RIG_GROUP_NAME = "LightRigGroup"
+
+# Key of the target list in a batch file
+TARGETS_KEY = "Targets"
+
+
+"""
+    Desc:
+        Settings of one light, same attributes as a LightPanel of the
+        tool, for rigs built without the UI
+"""
+class LightSettings(object):
+
+    def __init__(self, lightType="Spot", intensity=3.0, color=None, castShadows=False):
+        self.lightType = lightType
+        self.intensity = intensity
+        self.color = color or [1.0, 1.0, 1.0]
+        self.castShadows = castShadows
+
+
+"""
+    Desc:
+        Settings of the rig, same attributes as the LightRigPanel of the
+        tool, for rigs built without the UI
+"""
+class RigSettings(object):
+
+    def __init__(self, lightPos="Center", radius=5.0, rigType=RIG_CURVE):
+        self.lightPos = lightPos
+        self.radius = radius
+        self.rigType = rigType
+
+
+class RigReport(object):
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.rigs = []
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.timings = []
+
+    def __str__(self):
+        text = ("%d light rigs on %d targets, %d nodes in %.2fs"
+                % (len(self.rigs), self.targets, self.nodes, self.elapsed))
+        if self.timings:
+            text += " [%s]" % ", ".join("%s %.2fs" % t for t in self.timings)
+        return text
+
+
+class ApplyReport(object):
+
+    def __init__(self):
+        self.rigs = 0
+        self.lights = 0
+        self.attributes = 0
+        self.unchanged = 0
+        # Lights whose type differs from the preset, left as they are
+        self.skipped = []
+        self.elapsed = 0.0
+
+    def __str__(self):
+        text = ("%d attributes changed on %d lights of %d rigs, %d unchanged, in %.2fs"
+                % (self.attributes, self.lights, self.rigs, self.unchanged, self.elapsed))
+        if self.skipped:
+            text += " (%d lights of another type skipped)" % len(self.skipped)
+        return text
+
+
+"""
+    Desc:
+        Get the world bounding box of many objects in one API pass, no
+        command per object
+    Parameters:
+        targets: names of the objects
+    Returns:
+        list of (xmin, ymin, zmin, xmax, ymax, zmax), same as
+        mc.exactWorldBoundingBox, in the order of the targets
+"""
+def get_bounding_boxes(targets):
+    boxes = []
+    for target in targets:
+        selList = om.MSelectionList()
+        selList.add(target)
+        dagPath = selList.getDagPath(0)
+        # The box of a transform already includes its own matrix
+        box = om.MFnDagNode(dagPath).boundingBox
+        box.transformUsing(dagPath.exclusiveMatrix())
+        boxes.append((box.min.x, box.min.y, box.min.z, box.max.x, box.max.y, box.max.z))
+    return boxes
+
+
+# Free namespace for the rig of a target
+def unique_namespace(target):
+    base = "%s_%s" % (NAMESPACE_PREFIX, target.split("|")[-1].replace(":", "_"))
+    namespace = base
+    index = 1
+    while mc.namespace(exists=":" + namespace):
+        namespace = "%s%d" % (base, index)
+        index += 1
+    return namespace
+
+
+# Center, circle radius and light height of the rig of a bounding box
+def rig_frame(bbox, settings):
+    center = ((bbox[0] + bbox[3]) / 2.0, (bbox[1] + bbox[4]) / 2.0, (bbox[2] + bbox[5]) / 2.0)
+    radius = (bbox[3] - bbox[0]) / 4.0 * settings.radius
+    return center, radius, LIGHT_HEIGHTS.get(settings.lightPos, 0.0)
+
+
+# Rotation in degrees pointing the -Z axis of a light along a direction,
+# Y up, what the aimConstraints of the curve rigs solve for
+def aim_rotation(direction):
+    dx, dy, dz = direction
+    horizontal = math.sqrt(dx * dx + dz * dz)
+    return (math.degrees(math.atan2(dy, horizontal)), math.degrees(math.atan2(-dx, -dz)), 0.0)
+
+
+"""
+    Desc:
+        Position and aim rotation of every light of a rig, computed
+        directly: same positions as the points of the circle of the curve
+        rigs, aimed at the center
+    Parameters:
+        bbox: world bounding box of the target
+        settings: rig settings
+    Returns:
+        center, list of (translation, rotation) in the order of LIGHTS
+"""
+def light_placements(bbox, settings):
+    center, radius, height = rig_frame(bbox, settings)
+    placements = []
+    for attr, name, locatorName, param in LIGHTS:
+        angle = 2.0 * math.pi * param / CIRCLE_SECTIONS
+        position = (center[0] + radius * math.cos(angle), center[1] + height, center[2] - radius * math.sin(angle))
+        direction = (center[0] - position[0], center[1] - position[1], center[2] - position[2])
+        placements.append((position, aim_rotation(direction)))
+    return center, placements
+
+
+"""
+    Desc:
+        Write the translation and rotation of many transforms in one
+        round trip: a single MEL string of setAttr commands, still undone
+        with the rest of the chunk, where cmds would take a command per
+        node
+    Parameters:
+        transforms: list of (node, translation, rotation)
+"""
+def set_transforms(transforms):
+    commands = []
+    for node, translation, rotation in transforms:
+        commands.append('setAttr "%s.translate" -type double3 %.17g %.17g %.17g;' % ((node,) + tuple(translation)))
+        commands.append('setAttr "%s.rotate" -type double3 %.17g %.17g %.17g;' % ((node,) + tuple(rotation)))
+    if commands:
+        mel.eval("\n".join(commands))
+
+
+# Transform of a light, whether the light command gave the shape or not
+def light_transform(light):
+    parents = mc.listRelatives(light, parent=True)
+    if mc.objectType(light, isAType="shape") and parents:
+        return parents[0]
+    return light
+
+
+"""
+    Desc:
+        Class to create 3-point light rigs
+
+    Parameters:
+        Needs keylight, filllight, rimLigth, and light rig object settings
+        at the time of initialization: LightPanel and LightRigPanel of the
+        tool, or LightSettings and RigSettings
+"""
+class LightRig(object):
+
+    def __init__(self, keyLight, fillLight, rimLight, rigSettings):
+        self.keyLight = keyLight
+        self.fillLight = fillLight
+        self.rimLight = rimLight
+        self.settings = rigSettings
+
+    """
+    Desc:
+        Build one rig in the current namespace around a bounding box, the
+        way the rig type of the settings says
+    Parameters:
+        bbox: world bounding box of the target, see get_bounding_boxes
+    Returns:
+        name of the rig group
+    """
+    def build(self, bbox):
+        rigType = getattr(self.settings, "rigType", RIG_CURVE)
+        if rigType == RIG_CURVE:
+            return self.buildCurve(bbox)
+        return self.buildAnalytic(bbox, driven=rigType == RIG_DRIVEN)
+
+    """
+    Desc:
+        Build a rig with the lights on a circle, each aimed by a
+        constraint at a locator on the target center
+    Parameters:
+        bbox: world bounding box of the target
+    Returns:
+        name of the rig group
+    """
+    def buildCurve(self, bbox):
+        objCenter, rad, lightP = rig_frame(bbox, self.settings)
+
+        # Create a circle to place three point lights
+        curve = mc.circle(n='curveLights', nr=(0, 1, 0), c=objCenter, sections=CIRCLE_SECTIONS, radius=rad)[0]
+
+        # Create lights in three positions on the curve, each aimed at a
+        # locator on the target center
+        lights = []
+        for attr, name, locatorName, param in LIGHTS:
+            loc = mc.pointOnCurve(curve, pr=param, p=True)
+            light = light_transform(self.createLight(getattr(self, attr), name))
+            mc.move(loc[0], loc[1] + lightP, loc[2], light, ls=True)
+
+            locator = mc.spaceLocator(n=locatorName, p=objCenter)[0]
+            mc.aimConstraint(locator, light, aimVector=(0.0, 0.0, -1.0))
+            mc.parent(locator, curve, relative=True)
+            lights.append(light)
+
+        # Create lights main locator
+        mainLocator = mc.spaceLocator(n='lightsMainLocator', p=objCenter)[0]
+        mc.parent(lights, mainLocator, relative=True)
+
+        # Create Main Group for the entire light rig
+        return mc.group(curve, mainLocator, n=RIG_GROUP_NAME)
+
+    """
+    Desc:
+        Build a rig with the lights placed and aimed analytically: no
+        curve, locator or constraint, nothing to evaluate but the lights.
+        Driven rigs parent the lights to one driver transform on the
+        target center, moving or rotating it moves the whole rig; other
+        rigs are a static placement.
+    Parameters:
+        bbox: world bounding box of the target
+        driven: parent the lights to a driver transform
+    Returns:
+        name of the rig group
+    """
+    def buildAnalytic(self, bbox, driven=False):
+        center, placements = light_placements(bbox, self.settings)
+        lights = [light_transform(self.createLight(getattr(self, attr), name))
+                  for attr, name, locatorName, param in LIGHTS]
+
+        group = mc.group(em=True, n=RIG_GROUP_NAME)
+        parent = group
+        if driven:
+            parent = mc.group(em=True, n='lightsDriver', parent=group)
+            mc.setAttr(parent + '.translate', center[0], center[1], center[2])
+        lights = mc.parent(lights, parent)
+
+        # All the lights written in one batch, relative to the driver if any
+        origin = center if driven else (0.0, 0.0, 0.0)
+        set_transforms([(light, (position[0] - origin[0], position[1] - origin[1], position[2] - origin[2]), rotation)
+                        for light, (position, rotation) in zip(lights, placements)])
+        return group
+
+    """
+    Desc:
+        Method to create light
+    Parameters:
+        Light settings objects
+    Returns:
+        light object
+    """
+    def createLight(self, lightObj, name):
+        if lightObj.lightType == "Directional":
+            light = mc.directionalLight(name=name, rgb=lightObj.color, intensity=lightObj.intensity,
+                                        rs=lightObj.castShadows)
+        elif lightObj.lightType == "Point":
+            light = mc.pointLight(name=name, rgb=lightObj.color, intensity=lightObj.intensity,
+                                  rs=lightObj.castShadows)
+        else:
+            light = mc.spotLight(name=name, coneAngle=45, rgb=lightObj.color, intensity=lightObj.intensity,
+                                 rs=lightObj.castShadows)
+
+        return light
+
+    """
+    Desc:
+        Build a rig around every target, each in its own namespace, as
+        one BulkEdit: undone in one step, no viewport refresh while the
+        rigs are built
+    Parameters:
+        targets: names of the objects to light
+    Returns:
+        RigReport, its rigs are (target, namespace, rig group)
+    """
+    def createRigs(self, targets):
+        targets = list(targets)
+        report = RigReport(len(targets))
+        with bulkedit.BulkEdit("createRigs") as edit:
+            start = time.time()
+            boxes = get_bounding_boxes(targets)
+            report.timings.append(("bounding boxes", time.time() - start))
+
+            start = time.time()
+            current = mc.namespaceInfo(currentNamespace=True, absoluteName=True)
+            try:
+                for target, bbox in zip(targets, boxes):
+                    namespace = unique_namespace(target)
+                    mc.namespace(add=namespace, parent=":")
+                    mc.namespace(set=":" + namespace)
+                    group = self.build(bbox)
+                    mc.addAttr(group, longName=TARGET_ATTR, dataType="string")
+                    mc.setAttr("%s.%s" % (group, TARGET_ATTR), target, type="string")
+                    report.rigs.append((target, namespace, mc.ls(group)[0]))
+                    report.nodes += len(mc.namespaceInfo(":" + namespace, listOnlyDependencyNodes=True) or [])
+            finally:
+                mc.namespace(set=current)
+            report.timings.append(("build", time.time() - start))
+        report.elapsed = edit.elapsed
+        return report
+
+    # Build the rig of a single target, see createRigs
+    def createRig(self, target):
+        return self.createRigs([target])
+
+
+# Name of a rig light in LIGHTS, from its transform: no namespace and no
+# number Maya added to make it unique (KeyLight1 of a second legacy rig)
+def rig_light_name(light):
+    return re.sub(r"\d+$", "", light.split("|")[-1].split(":")[-1])
+
+
+# Whether an untagged group is a rig of an earlier version: named like the
+# rig groups, with at least one light named like the rig lights below it
+def is_legacy_rig(group):
+    names = set(name for attr, name, locatorName, param in LIGHTS)
+    shapes = mc.listRelatives(group, allDescendents=True, type="light", fullPath=True) or []
+    return any(rig_light_name(mc.listRelatives(shape, parent=True)[0]) in names for shape in shapes)
+
+
+"""
+    Desc:
+        Find the rigs in the scene, in any namespace: the groups tagged
+        with TARGET_ATTR, and the rigs built before the tag, found by the
+        names of their group and lights
+    Parameters:
+        nodes: only keep the rigs among these nodes, all the rigs of the
+               scene if None
+    Returns:
+        list of rig groups
+"""
+def find_rigs(nodes=None):
+    rigs = mc.ls("*.%s" % TARGET_ATTR, recursive=True, objectsOnly=True) or []
+    for group in mc.ls(RIG_GROUP_NAME + "*", recursive=True, type="transform") or []:
+        if not mc.attributeQuery(TARGET_ATTR, node=group, exists=True) and is_legacy_rig(group):
+            rigs.append(group)
+    if nodes is not None:
+        nodes = set(mc.ls(nodes))
+        rigs = [rig for rig in rigs if rig in nodes]
+    return rigs
+
+
+# Light attribute and value of every light setting
+def light_values(lightObj):
+    return (("color", tuple(lightObj.color)),
+            ("intensity", lightObj.intensity),
+            ("useRayTraceShadows", bool(lightObj.castShadows)))
+
+
+# Whether an attribute value differs from a setting
+def differs(current, value):
+    if isinstance(value, tuple):
+        return any(abs(c - v) > APPLY_TOLERANCE for c, v in zip(current[0], value))
+    return abs(current - value) > APPLY_TOLERANCE
+
+
+"""
+    Desc:
+        Apply light settings to existing rigs: the current attributes of
+        every light are compared to the settings and only the ones that
+        differ are written, all in one BulkEdit, undone in one step. A
+        light whose type isn't the one of the settings is skipped.
+    Parameters:
+        keyLight, fillLight, rimLight: light settings, a light is left as
+                                       it is when its settings are None
+        rigs: rig groups, all the rigs of the scene if None
+    Returns:
+        ApplyReport
+"""
+def apply_to_rigs(keyLight=None, fillLight=None, rimLight=None, rigs=None):
+    settings = {"keyLight": keyLight, "fillLight": fillLight, "rimLight": rimLight}
+    report = ApplyReport()
+    with bulkedit.BulkEdit("applyToRigs") as edit:
+        rigs = find_rigs() if rigs is None else rigs
+        for rig in rigs:
+            report.rigs += 1
+            shapes = mc.listRelatives(rig, allDescendents=True, type="light", fullPath=True) or []
+            for shape in shapes:
+                name = rig_light_name(mc.listRelatives(shape, parent=True)[0])
+                for attr, lightName, locatorName, param in LIGHTS:
+                    if lightName == name:
+                        lightObj = settings[attr]
+                        break
+                else:
+                    continue
+                if lightObj is None:
+                    continue
+                if mc.nodeType(shape) != LIGHT_NODE_TYPES.get(lightObj.lightType):
+                    report.skipped.append(shape)
+                    continue
+
+                changed = 0
+                for lightAttr, value in light_values(lightObj):
+                    plug = "%s.%s" % (shape, lightAttr)
+                    if not differs(mc.getAttr(plug), value):
+                        report.unchanged += 1
+                    elif isinstance(value, tuple):
+                        mc.setAttr(plug, *value, type="double3")
+                        changed += 1
+                    else:
+                        mc.setAttr(plug, value)
+                        changed += 1
+                report.attributes += changed
+                report.lights += 1 if changed else 0
+    report.elapsed = edit.elapsed
+    return report
+
+
+# Apply a preset (see lightpresets) to existing rigs, lights missing from
+# the preset are left as they are, see apply_to_rigs
+def apply_preset(preset, rigs=None):
+    lights = [light_settings(preset, name) if preset.get(name) else None
+              for name in ("KeyLight", "FillLight", "RimLight")]
+    return apply_to_rigs(lights[0], lights[1], lights[2], rigs)
+
+
+"""
+    Desc:
+        Read a batch file: a JSON list of targets, or a preset of the tool
+        (KeyLight, FillLight, RimLight, LightRig) with a Targets list
+    Parameters:
+        fileName: path of the file
+    Returns:
+        list of targets, dict of the file (empty for a plain list)
+"""
+def load_batch(fileName):
+    with open(fileName) as batchFile:
+        data = json.load(batchFile)
+    # Presets saved by earlier versions of the tool are encoded twice
+    if not isinstance(data, (dict, list)):
+        data = json.loads(data)
+    if isinstance(data, list):
+        return data, {}
+    return list(data.get(TARGETS_KEY, [])), data
+
+
+# LightSettings of a light of a preset, the defaults if it isn't there
+def light_settings(preset, name):
+    light = preset.get(name)
+    if not light:
+        return LightSettings()
+    return LightSettings(light["lightType"], light["intensity"], light["color"], light["castshadows"])
+
+
+# RigSettings of a preset, the defaults if it isn't there
+def rig_settings(preset):
+    rig = preset.get("LightRig")
+    if not rig:
+        return RigSettings()
+    return RigSettings(rig["lightPos"], rig["radius"], rig.get("rigType", RIG_CURVE))
+
+
+"""
+    Desc:
+        Build a rig around every target
+    Parameters:
+        targets: names of the objects to light
+        keyLight, fillLight, rimLight: light settings, defaults if None
+        rigSettings: rig settings, defaults if None
+    Returns:
+        RigReport
+"""
+def build_rigs(targets, keyLight=None, fillLight=None, rimLight=None, rigSettings=None):
+    rig = LightRig(keyLight or LightSettings(), fillLight or LightSettings(),
+                   rimLight or LightSettings(), rigSettings or RigSettings())
+    return rig.createRigs(targets)
+
+
+"""
+    Desc:
+        Build a rig around every target listed in a batch file, with the
+        light settings of the file when it has them
+    Parameters:
+        fileName: path of the batch file, see load_batch
+        keyLight, fillLight, rimLight, rigSettings: settings used when the
+                                                    file has none
+    Returns:
+        RigReport
+"""
+def build_rigs_from_file(fileName, keyLight=None, fillLight=None, rimLight=None, rigSettings=None):
+    targets, preset = load_batch(fileName)
+    if "KeyLight" in preset:
+        keyLight = light_settings(preset, "KeyLight")
+        fillLight = light_settings(preset, "FillLight")
+        rimLight = light_settings(preset, "RimLight")
+        rigSettings = rig_settings(preset)
+    return build_rigs(targets, keyLight, fillLight, rimLight, rigSettings)
@@ -0,0 +1,99 @@
+##################################################################
+#     CHECK THE ANALYTIC LIGHT PLACEMENTS (RUN WITH MAYAPY)      #
+##################################################################
+#
+#   mayapy lightrig_check.py
+#
+#   Compares the positions and aims lightrig.light_placements computes
+#   with the ones of the curve rigs: the points of a circle built like
+#   LightRig.buildCurve builds it, and the -Z axis the aimConstraints
+#   point at the center. Prints the largest errors and exits with 1 when
+#   they are over the tolerance. Can also be run from the script editor:
+#   run().
+
+import math
+import sys
+
+import maya.cmds as mc
+
+import lightrig
+
+
+# Largest position error, in scene units, and aim error, in degrees
+TOLERANCE = 1e-4
+
+# Bounding boxes of the check, centered on and off the origin
+BOXES = (
+    (-1.0, -1.0, -1.0, 1.0, 1.0, 1.0),
+    (3.0, 0.0, -7.0, 11.0, 4.0, 2.0),
+    (-250.0, 12.5, 40.0, -120.0, 80.0, 95.0),
+)
+
+
+# World direction of the -Z axis of a rotation in degrees, xyz order
+def aim_axis(rotation):
+    rx, ry = math.radians(rotation[0]), math.radians(rotation[1])
+    return (-math.cos(rx) * math.sin(ry), math.sin(rx), -math.cos(rx) * math.cos(ry))
+
+
+# Angle in degrees between two directions
+def angle_between(a, b):
+    lengths = math.sqrt(sum(v * v for v in a)) * math.sqrt(sum(v * v for v in b))
+    cosine = sum(x * y for x, y in zip(a, b)) / lengths
+    return math.degrees(math.acos(max(-1.0, min(1.0, cosine))))
+
+
+"""
+    Desc:
+        Compare light_placements with the circle of a curve rig for one
+        bounding box and rig settings
+    Parameters:
+        bbox: world bounding box
+        settings: rig settings
+    Returns:
+        largest position error, largest aim error in degrees
+"""
+def placement_error(bbox, settings):
+    center, placements = lightrig.light_placements(bbox, settings)
+    objCenter, radius, height = lightrig.rig_frame(bbox, settings)
+    curve = mc.circle(nr=(0, 1, 0), c=objCenter, sections=lightrig.CIRCLE_SECTIONS, radius=radius)[0]
+    try:
+        positionError = aimError = 0.0
+        for (attr, name, locatorName, param), (position, rotation) in zip(lightrig.LIGHTS, placements):
+            point = mc.pointOnCurve(curve, pr=param, p=True)
+            expected = (point[0], point[1] + height, point[2])
+            positionError = max(positionError, max(abs(p - e) for p, e in zip(position, expected)))
+            direction = tuple(c - e for c, e in zip(center, expected))
+            aimError = max(aimError, angle_between(aim_axis(rotation), direction))
+    finally:
+        mc.delete(curve)
+    return positionError, aimError
+
+
+"""
+    Desc:
+        Check every bounding box of BOXES with every light height and a
+        few radii
+    Parameters:
+        boxes: bounding boxes to check
+    Returns:
+        largest position error, largest aim error in degrees
+"""
+def run(boxes=BOXES):
+    positionError = aimError = 0.0
+    for bbox in boxes:
+        for lightPos in sorted(lightrig.LIGHT_HEIGHTS):
+            for radius in (1.0, 5.0, 20.0):
+                settings = lightrig.RigSettings(lightPos, radius, lightrig.RIG_STATIC)
+                errors = placement_error(bbox, settings)
+                positionError = max(positionError, errors[0])
+                aimError = max(aimError, errors[1])
+    print("largest position error %g, largest aim error %g degrees" % (positionError, aimError))
+    return positionError, aimError
+
+
+if __name__ == '__main__':
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    errors = run()
+    sys.exit(1 if max(errors) > TOLERANCE else 0)
@@ -0,0 +1,79 @@
+##################################################################
+#        UNDOABLE MESH CREATION FROM FLAT ARRAYS (PLUGIN)         #
+##################################################################
+#
+#   Loaded by meshdata.create_mesh, which stages the arrays under a
+#   token and runs createMeshFromArrays token -name name. MFnMesh.create
+#   on its own isn't undoable outside a command: wrapped in one, the mesh
+#   goes away with the rest of the undo chunk it was made in, and comes
+#   back on redo.
+
+import maya.api.OpenMaya as om
+
+import meshdata
+
+
+# Plugin written with the Python API 2.0
+def maya_useNewAPI():
+    pass
+
+
+class CreateMeshCommand(om.MPxCommand):
+    kName = "createMeshFromArrays"
+    kNameFlag = "-n"
+    kNameFlagLong = "-name"
+
+    def __init__(self):
+        om.MPxCommand.__init__(self)
+        self.data = None
+        self.transform = None
+
+    @staticmethod
+    def creator():
+        return CreateMeshCommand()
+
+    # Token of the staged arrays, name of the new transform
+    @staticmethod
+    def syntaxCreator():
+        syntax = om.MSyntax()
+        syntax.addArg(om.MSyntax.kString)
+        syntax.addFlag(CreateMeshCommand.kNameFlag, CreateMeshCommand.kNameFlagLong, om.MSyntax.kString)
+        return syntax
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        argData = om.MArgDatabase(self.syntax(), args)
+        name = None
+        if argData.isFlagSet(CreateMeshCommand.kNameFlag):
+            name = argData.flagArgumentString(CreateMeshCommand.kNameFlag, 0)
+        # Arrays staged by meshdata.create_mesh, kept for redo
+        self.data = meshdata.staged_arrays(argData.commandArgumentString(0)) + (name,)
+        self.redoIt()
+
+    def redoIt(self):
+        vertices, counts, connects, name = self.data
+        transform = om.MFnMesh().create(vertices, counts, connects)
+        fnDag = om.MFnDagNode(transform)
+        if name:
+            fnDag.setName(name)
+        self.transform = om.MObjectHandle(transform)
+        self.setResult(fnDag.partialPathName())
+
+    def undoIt(self):
+        if self.transform is not None and self.transform.isValid():
+            modifier = om.MDagModifier()
+            modifier.deleteNode(self.transform.object())
+            modifier.doIt()
+        self.transform = None
+
+
+def initializePlugin(mobject):
+    fnPlugin = om.MFnPlugin(mobject)
+    fnPlugin.registerCommand(CreateMeshCommand.kName, CreateMeshCommand.creator, CreateMeshCommand.syntaxCreator)
+
+
+def uninitializePlugin(mobject):
+    fnPlugin = om.MFnPlugin(mobject)
+    fnPlugin.deregisterCommand(CreateMeshCommand.kName)
@@ -0,0 +1,152 @@
+##################################################################
+#        BULK MESH DATA: VERTEX POSITIONS AND NORMALS            #
+##################################################################
+#
+#   Every vertex of a mesh in one API query instead of one
+#   mc.pointPosition call per flattened ".vtx[n]" string. Data is
+#   returned as flat, contiguous float arrays: x0, y0, z0, x1, y1, ...
+#   and meshes are created back from such arrays in one call.
+
+import array
+import itertools
+import os
+
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+
+
+"""
+    Desc:
+        Get the dag path of the mesh shape of a transform or shape
+    Parameters:
+        mesh: name of the mesh transform or shape
+    Returns:
+        MDagPath of the mesh shape
+"""
+def get_mesh_path(mesh):
+    selList = om.MSelectionList()
+    selList.add(mesh)
+    dagPath = selList.getDagPath(0)
+    dagPath.extendToShape()
+    if not dagPath.hasFn(om.MFn.kMesh):
+        raise TypeError("%s is not a polygonal mesh" % mesh)
+    return dagPath
+
+
+# Flatten an MPointArray or MFloatVectorArray into x, y, z doubles
+def flatten(vectors):
+    return array.array('d', [c for v in vectors for c in (v.x, v.y, v.z)])
+
+
+"""
+    Desc:
+        Get the position of every vertex of a mesh in one query
+    Parameters:
+        mesh: name of the mesh transform or shape
+        space: om.MSpace.kObject (same as mc.pointPosition(l=True)) or
+               om.MSpace.kWorld
+    Returns:
+        array('d') of 3 * vertex count floats
+"""
+def get_points(mesh, space=om.MSpace.kObject):
+    fnMesh = om.MFnMesh(get_mesh_path(mesh))
+    return flatten(fnMesh.getPoints(space))
+
+
+"""
+    Desc:
+        Get the normal of every vertex of a mesh in one query
+    Parameters:
+        mesh: name of the mesh transform or shape
+        space: om.MSpace.kObject or om.MSpace.kWorld
+        angleWeighted: weight the face normals by the angle they make at
+                       the vertex instead of averaging them
+    Returns:
+        array('d') of 3 * vertex count floats
+"""
+def get_normals(mesh, space=om.MSpace.kObject, angleWeighted=False):
+    fnMesh = om.MFnMesh(get_mesh_path(mesh))
+    return flatten(fnMesh.getVertexNormals(angleWeighted, space))
+
+
+# Iterate a flat array as (x, y, z) tuples
+def iter_vectors(flat):
+    return zip(flat[0::3], flat[1::3], flat[2::3])
+
+
+"""
+    Desc:
+        Get the faces of a mesh in one query
+    Parameters:
+        mesh: name of the mesh transform or shape
+    Returns:
+        array('i') of vertex count per face, array('i') of the vertex
+        indices of every face one after the other
+"""
+def get_topology(mesh):
+    fnMesh = om.MFnMesh(get_mesh_path(mesh))
+    counts, connects = fnMesh.getVertices()
+    return array.array('i', counts), array.array('i', connects)
+
+
+"""
+    Desc:
+        Build an MPointArray straight from a flat array, filled in place
+        with no list of (x, y, z) tuples in between
+    Parameters:
+        flat: flat array of positions
+    Returns:
+        MPointArray of len(flat) / 3 points
+"""
+def point_array(flat):
+    count = len(flat) // 3
+    points = om.MPointArray()
+    points.setLength(count)
+    for i in range(count):
+        points[i] = om.MPoint(flat[3 * i], flat[3 * i + 1], flat[3 * i + 2])
+    return points
+
+
+# Plugin with the undoable mesh creation command
+MESH_PLUGIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "meshcommand.py")
+
+# Arrays handed to the createMeshFromArrays command, by the token passed
+# as its argument, see meshcommand
+staged = {}
+tokens = itertools.count()
+
+
+# Arrays staged for a createMeshFromArrays command, see create_mesh
+def staged_arrays(token):
+    if token not in staged:
+        raise KeyError("No mesh arrays staged for %s" % token)
+    return staged[token]
+
+
+"""
+    Desc:
+        Create a new mesh from flat arrays in one call, with the default
+        shader assigned. The mesh is made by an undoable command, so it is
+        undone with the undo chunk it was made in. The arrays are staged
+        under a token of their own, nested or concurrent calls don't share
+        anything.
+    Parameters:
+        points: flat array of vertex positions
+        counts: vertex count per face
+        connects: vertex indices of every face
+        name: name of the new transform
+    Returns:
+        name of the new mesh transform
+"""
+def create_mesh(points, counts, connects, name):
+    if not mc.pluginInfo(MESH_PLUGIN, query=True, loaded=True):
+        mc.loadPlugin(MESH_PLUGIN, quiet=True)
+
+    token = "meshArrays%d" % next(tokens)
+    staged[token] = (point_array(points), list(counts), list(connects))
+    try:
+        meshName = mc.createMeshFromArrays(token, name=name)
+    finally:
+        staged.pop(token, None)
+    mc.sets(meshName, edit=True, forceElement='initialShadingGroup')
+    return meshName
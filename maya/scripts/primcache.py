@@ -0,0 +1,165 @@
+##################################################################
+#        PRIMITIVE TEMPLATE CACHE FOR MAKE_SHAPE AND THE CLONER   #
+##################################################################
+#
+#   Each primitive is built once per session with its construction
+#   settings, without history, in a hidden group. Later requests for the
+#   same (type, divisions, dimensions) duplicate or instance the template
+#   instead of building the primitive again. The least recently used
+#   templates are deleted past MAX_TEMPLATES, clear() deletes them all.
+
+import collections
+
+import maya.cmds as mc
+
+
+# Hidden group holding the templates
+TEMPLATE_GROUP = "primitiveTemplates_Grp"
+
+# Templates kept before the least recently used one is deleted
+MAX_TEMPLATES = 16
+
+# {(type, divisions, dimensions): uuid of the template transform}
+_templates = collections.OrderedDict()
+
+
+# Cache key of a primitive, flags sorted so the order they are given in
+# doesn't matter
+def make_key(shapeType, divisions=None, dimensions=None):
+    return (shapeType.lower(), tuple(sorted((divisions or {}).items())),
+            tuple(sorted((dimensions or {}).items())))
+
+
+"""
+    Desc:
+        Build a primitive with its construction history, no cache
+    Parameters:
+        shapeType: cube, cone, cylinder, plane, torus, sphere, prism or
+                   pyramid
+        divisions: dict of subdivision flags of the poly command, e.g. sx
+        dimensions: dict of size flags of the poly command, e.g. r, w, h
+        name: optional name of the new transform
+    Returns:
+        name of the primitive transform
+"""
+def create(shapeType, divisions=None, dimensions=None, name=None):
+    command = getattr(mc, "poly" + shapeType.lower().capitalize())
+    flags = dict(divisions or {})
+    flags.update(dimensions or {})
+    if name:
+        flags["name"] = name
+    return command(**flags)[0]
+
+
+# Long name of a template still in the scene, None if it was deleted
+def _resolve(uuid):
+    nodes = mc.ls(uuid, long=True)
+    return nodes[0] if nodes else None
+
+
+# Hidden group, created the first time it is needed
+def hidden_group(name=TEMPLATE_GROUP):
+    if not mc.objExists(name):
+        mc.group(em=True, name=name)
+        mc.setAttr(name + '.visibility', False)
+    return name
+
+
+"""
+    Desc:
+        Get the hidden template of a primitive, built the first time it is
+        asked for (or if it was deleted, e.g. by a new scene)
+    Parameters:
+        shapeType, divisions, dimensions: see create
+    Returns:
+        long name of the template transform
+"""
+def get_template(shapeType, divisions=None, dimensions=None):
+    key = make_key(shapeType, divisions, dimensions)
+    uuid = _templates.pop(key, None)
+    template = _resolve(uuid) if uuid else None
+
+    if template is None:
+        template = create(shapeType, divisions, dimensions, name="%sTemplate" % shapeType.lower())
+        mc.delete(template, constructionHistory=True)
+        template = mc.parent(template, hidden_group())[0]
+        uuid = mc.ls(template, uuid=True)[0]
+        template = _resolve(uuid)
+
+    # Most recently used last
+    _templates[key] = uuid
+    while len(_templates) > MAX_TEMPLATES:
+        oldKey, oldUuid = _templates.popitem(last=False)
+        old = _resolve(oldUuid)
+        if old is not None:
+            mc.delete(old)
+
+    return template
+
+
+# Move new copies out of the hidden group
+def _reparent(nodes, parent=None):
+    if parent:
+        return mc.parent(nodes, parent)
+    return mc.parent(nodes, world=True)
+
+
+"""
+    Desc:
+        Duplicate the template of a primitive
+    Parameters:
+        shapeType, divisions, dimensions: see create
+        name: optional name of the copy
+        parent: optional parent of the copy, else the world
+    Returns:
+        name of the new transform
+"""
+def duplicate(shapeType, divisions=None, dimensions=None, name=None, parent=None):
+    template = get_template(shapeType, divisions, dimensions)
+    copy = mc.duplicate(template, name=name)[0] if name else mc.duplicate(template)[0]
+    return _reparent(copy, parent)[0]
+
+
+"""
+    Desc:
+        Instance the template of a primitive: the new transforms share the
+        template shape
+    Parameters:
+        shapeType, divisions, dimensions: see create
+        count: number of instances
+        parent: optional parent of the instances, else the world
+    Returns:
+        list of new transforms
+"""
+def instance(shapeType, divisions=None, dimensions=None, count=1, parent=None):
+    return instance_node(get_template(shapeType, divisions, dimensions), count, parent)
+
+
+# Instance a node kept in a hidden group, e.g. a template, count times
+def instance_node(node, count=1, parent=None):
+    instances = [mc.instance(node)[0] for i in range(count)]
+    if not instances:
+        return []
+    return _reparent(instances, parent)
+
+
+"""
+    Desc:
+        Delete every template, e.g. before saving a scene or in a long
+        session
+    Parameters:
+        NONE
+    Returns:
+        number of templates deleted
+"""
+def clear():
+    deleted = 0
+    for uuid in _templates.values():
+        template = _resolve(uuid)
+        if template is not None:
+            mc.delete(template)
+            deleted += 1
+    _templates.clear()
+    if mc.objExists(TEMPLATE_GROUP) and not mc.listRelatives(TEMPLATE_GROUP, children=True):
+        mc.delete(TEMPLATE_GROUP)
+    return deleted
@@ -1,7 +1,18 @@
 import nuke
+import collections
 import json
 import os
+import re
 import sys
+import time
+
+
+# Node graph layout, in DAG units
+COLUMN_WIDTH = 150
+ROW_HEIGHT = 60
+
+# Row of the merges, below the node trees
+MERGE_ROW = 7
 
 
 def readJSON(filePath):
@@ -84,80 +95,165 @@ def readAOVCollectionNode(aovNode):
     return passDetails
 
 
-def createReadNode(folderPath, nodeName):
+class GraphBuilder(object):
     """
-    Method to create Read nodes for every render pass
-    :param folderPath: location to folder where the sequence of images are stored
-    :param nodeName: name of the node
-    :return: NONE
+    Builds the comp graph of render layers and passes without any
+    interactive node creation: every node is made with nuke.nodes.*, gets
+    a unique name, is wired to its inputs directly and placed by the
+    builder, so no selection, auto-placement or viewer update happens per
+    node. Every tree is merged into one chain, shown in the viewer at the
+    end.
     """
-    try:
-        for seq in nuke.getFileNameList(folderPath):
-            readNode = nuke.createNode('Read')
-            readNode.knob('name').setValue(nodeName)
-        readNode.knob('file').fromUserText(folderPath + '\\' + seq)
-    except:
-        print 'Error concatenating string ' + sys.exc_info()[0]
-
 
-def createNukeNodesFromPasses(layers, dirPath):
-    """
-    Method to extract pass names and create nuke nodes
-    :param layers: layers dictionary which contains all layers and passes
-    :param dirPath: location to the folder where .JSON file and render passes are kept
-    :return: NONE
-    """
-    for layer in layers:
-        layerFolder = layer["layer"]["renderedIn"]
-        try:
-            if len(layer["layer"]["passes"]) > 0:
-                for currentPass in layer["layer"]["passes"]:
+    def __init__(self):
+        self.names = set(node.name() for node in nuke.allNodes())
+        self.counts = collections.Counter()
+        self.missing = []
+        self.trees = 0
+        self.merge = None
+        self.elapsed = 0.0
+
+        # Start below the nodes already in the script
+        positions = [node.ypos() for node in nuke.allNodes()]
+        self.originX = 0
+        self.originY = max(positions) + 2 * ROW_HEIGHT if positions else 0
+
+    def uniqueName(self, base):
+        """
+        Name not used by any node of the script or of the graph
+        :param base: wanted name
+        :return: base, or base followed by the first free number
+        """
+        base = re.sub('[^A-Za-z0-9_]', '_', base)
+        name = base
+        index = 1
+        while name in self.names:
+            name = '%s%d' % (base, index)
+            index += 1
+        self.names.add(name)
+        return name
+
+    def createNode(self, nodeClass, baseName, inputs, column, row, **knobs):
+        """
+        Create a node, wired and placed
+        :param nodeClass: Nuke node class, e.g. 'Grade'
+        :param baseName: name of the node, made unique
+        :param inputs: input nodes
+        :param column: column of the node in the graph
+        :param row: row of the node in the graph
+        :param knobs: other knob values
+        :return: the node
+        """
+        node = getattr(nuke.nodes, nodeClass)(name=self.uniqueName(baseName), inputs=inputs, **knobs)
+        node.setXYpos(self.originX + column * COLUMN_WIDTH, self.originY + row * ROW_HEIGHT)
+        self.counts[nodeClass] += 1
+        return node
+
+    def createReadNode(self, folderPath, baseName, column):
+        """
+        Read node of the first image sequence of a folder
+        :param folderPath: location to folder where the sequence of images are stored
+        :param baseName: name of the node
+        :param column: column of the node tree
+        :return: the Read node
+        """
+        readNode = self.createNode('Read', baseName, [], column, 0)
+        sequences = nuke.getFileNameList(folderPath) if os.path.isdir(folderPath) else None
+        if sequences:
+            readNode.knob('file').fromUserText(os.path.join(folderPath, sequences[0]).replace('\\', '/'))
+        else:
+            self.missing.append(folderPath)
+        return readNode
+
+    def beautyTree(self, folderPath, baseName, column):
+        """
+        Nodes of a beauty pass: Read, EdgeBlur, Grade
+        :return: last node of the tree
+        """
+        node = self.createReadNode(folderPath, baseName + '_beautyRead', column)
+        node = self.createNode('EdgeBlur', baseName + '_edgeBlur', [node], column, 1)
+        return self.createNode('Grade', baseName + '_beautyGrade', [node], column, 2)
+
+    def shadowTree(self, folderPath, baseName, column):
+        """
+        Nodes of a shadow pass: Read, Shuffle, Grade, Premult, Blur, Blur
+        :return: last node of the tree
+        """
+        node = self.createReadNode(folderPath, baseName + '_shadowRead', column)
+        node = self.createNode('Shuffle', baseName + '_shuffle', [node], column, 1)
+        node = self.createNode('Grade', baseName + '_grade', [node], column, 2)
+        node = self.createNode('Premult', baseName + '_premult', [node], column, 3)
+        node = self.createNode('Blur', baseName + '_blurNode', [node], column, 4)
+        return self.createNode('Blur', baseName + '_blurMaskGrade', [node], column, 5)
+
+    def mergeTree(self, node, column):
+        """
+        Merge the last node of a tree into the merge chain
+        :param node: last node of the tree
+        :param column: column of the tree
+        :return: NONE
+        """
+        if self.merge is None:
+            self.merge = node
+        else:
+            # B is the running merge, A the new tree composited over it
+            self.merge = self.createNode('Merge2', 'finalMerge', [self.merge, node], column, MERGE_ROW)
+        self.trees += 1
+
+    def build(self, layers, dirPath):
+        """
+        Create the node trees of every layer and pass and merge them
+        :param layers: layers dictionary which contains all layers and passes
+        :param dirPath: location to the folder where .JSON file and render passes are kept
+        :return: last merge node
+        """
+        start = time.time()
+        column = 0
+        for layer in layers:
+            layerFolder = layer["layer"]["renderedIn"]
+            layerName = layer["layer"]["name"]
+            passes = [currentPass for currentPass in layer["layer"]["passes"] if currentPass]
+            if passes:
+                for currentPass in passes:
                     passFolder = currentPass["renderedIn"]
                     folderLoc = os.path.abspath(os.path.join(dirPath, layerFolder, passFolder))
-                    createReadNode(folderLoc, 'shadowRead')
-                    createShadowNodeTree()
+                    self.mergeTree(self.shadowTree(folderLoc, '%s_%s' % (layerName, currentPass["passName"]), column),
+                                   column)
+                    column += 1
             else:
                 folderLoc = os.path.abspath(os.path.join(dirPath, layerFolder, "beauty"))
-                createReadNode(folderLoc, 'beautyRead')
-                createBeautyNodeTree()
-        except:
-            print 'Error parsing JSON string from ' + layer + ":" + sys.exc_info()[0]
+                self.mergeTree(self.beautyTree(folderLoc, layerName, column), column)
+                column += 1
+
+        if self.merge is not None:
+            nuke.connectViewer(0, self.merge)
+        self.elapsed = time.time() - start
+        return self.merge
+
+    def summary(self):
+        """
+        :return: node count and timing summary
+        """
+        text = 'Created %d nodes (%s) for %d trees in %.2fs' % (
+            sum(self.counts.values()),
+            ', '.join('%d %s' % (count, nodeClass) for nodeClass, count in sorted(self.counts.items())),
+            self.trees, self.elapsed)
+        if self.missing:
+            text += ', %d folders without images' % len(self.missing)
+        return text
 
 
-def createBeautyNodeTree():
-    """
-    This method creates all the necessary nodes needed for a beauty pass.
-    This is basically like a preset which is followed in every similar scenario
-    :return:
-    """
-    node = nuke.toNode("beautyRead")
-    node['selected'].setValue(True)
-    nuke.createNode('EdgeBlur')
-    bGrade = nuke.createNode('Grade')
-    bGrade.knob('name').setValue('beautyGrade')
-
-
-def createShadowNodeTree():
+def createNukeNodesFromPasses(layers, dirPath):
     """
-    This method creates all the necessary nodes needed for a shadow pass.
-    This is basically like a preset which is followed in every similar scenario
-    :return:
+    Method to extract pass names and create nuke nodes
+    :param layers: layers dictionary which contains all layers and passes
+    :param dirPath: location to the folder where .JSON file and render passes are kept
+    :return: the GraphBuilder, see its summary
     """
-    node = nuke.toNode("shadowRead")
-    node['selected'].setValue(True)
-    nuke.createNode('Shuffle')
-    nuke.createNode('Grade')
-    nuke.createNode('Premult')
-    blurNode = nuke.createNode('Blur')
-    blurNode.knob('name').setValue('blurNode')
-
-    node['selected'].setValue(False)
-
-    bmNode = nuke.createNode('Blur')
-    bmNode.knob('name').setValue('blurMaskGrade')
-
-    nuke.nodes.Merge(name="finalMerge", inputs=[nuke.toNode("blurMaskGrade"), nuke.toNode("beautyGrade")])
-    nuke.connectViewer(0, nuke.toNode("finalMerge"))
+    builder = GraphBuilder()
+    builder.build(layers, dirPath)
+    print(builder.summary())
+    return builder
 
 
 def generateNukeScript():
@@ -167,8 +263,11 @@ def generateNukeScript():
     :return:
     """
     fileName = nuke.getFilename("Open JSON file", '*.json')
-    if fileName:
-        output = readJSON(fileName)
+    if not fileName:
+        return
+    output = readJSON(fileName)
+    if output is None:
+        return
 
     dirPath = os.path.dirname(os.path.abspath(fileName))
 
@@ -1,40 +1,177 @@
-import maya.OpenMaya as OpenMaya
-import maya.OpenMayaMPx as OpenMayaMPx
+import maya.api.OpenMaya as OpenMaya
+import array
 import math
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Plugin written with the Python API 2.0, whose arrays convert to and from
+# Python lists in one call
+def maya_useNewAPI():
+    pass
+
 kPluginNodeTypeName = "sineNode"
 kPluginNodeId = OpenMaya.MTypeId(0X81048)
 
-class sineNode(OpenMayaMPx.MPxNode):
+# One node driving a whole array of channels
+kArrayNodeTypeName = "sineArrayNode"
+kArrayNodeId = OpenMaya.MTypeId(0X81049)
+
+
+# sin(value * frequency) * amplitude + offset of every value, vectorized
+# with numpy when Maya has it
+def sineValues(values, amplitude, frequency, offset):
+    if numpy is not None:
+        return (numpy.sin(numpy.asarray(values, dtype=numpy.float64) * frequency) * amplitude + offset).tolist()
+    sin = math.sin
+    return [sin(value * frequency) * amplitude + offset for value in values]
+
+# How far from a baked sample an input may be and still be served by lookup
+kCacheTolerance = 1e-4
+
+"""
+    With "cache" on, the output is baked once over the input range
+    cacheStart..cacheEnd (one sample every cacheStep, e.g. every frame when
+    the input is driven by time) and playback or render frames are served
+    by looking up the baked array. The bake is thrown away and redone as
+    soon as amplitude, frequency, offset or the range change; inputs off
+    the baked samples are computed directly. While the bake is valid a
+    frame only pulls the input plug: the other plugs are only read again
+    once one of them is dirtied (setDependentsDirty in DG evaluation,
+    preEvaluation under the Evaluation Manager).
+"""
+class sineNode(OpenMaya.MPxNode):
     aInput = OpenMaya.MObject()
     aAmplitude = OpenMaya.MObject()
     aFrequency = OpenMaya.MObject()
     aOffset = OpenMaya.MObject()
+    aCache = OpenMaya.MObject()
+    aCacheStart = OpenMaya.MObject()
+    aCacheEnd = OpenMaya.MObject()
+    aCacheStep = OpenMaya.MObject()
     aOutput = OpenMaya.MObject()
 
     def __init__(self):
         #print("> sineNode.__init__")
-        OpenMayaMPx.MPxNode.__init__(self)
+        OpenMaya.MPxNode.__init__(self)
+        self.cacheKey = None
+        self.cacheTable = None
+        # Whether the bake still matches the settings plugs
+        self.cacheValid = False
+
+    # Plugs the bake depends on, every input but "input"
+    @staticmethod
+    def settingsAttributes():
+        return (sineNode.aAmplitude, sineNode.aFrequency, sineNode.aOffset, sineNode.aCache,
+                sineNode.aCacheStart, sineNode.aCacheEnd, sineNode.aCacheStep)
+
+    # DG evaluation: called for every plug dirtied on the node
+    def setDependentsDirty(self, plug, plugArray):
+        if any(plug == attribute for attribute in sineNode.settingsAttributes()):
+            self.cacheValid = False
+
+    # Evaluation Manager: setDependentsDirty isn't called, the dirty plugs
+    # are known before the node is evaluated
+    def preEvaluation(self, context, evaluationNode):
+        if not context.isNormal():
+            return
+        if any(evaluationNode.dirtyPlugExists(attribute) for attribute in sineNode.settingsAttributes()):
+            self.cacheValid = False
+
+    # Bake the output over the range, unless the current bake has the
+    # same settings
+    def bake(self, amplitude, frequency, offset, start, end, step):
+        key = (amplitude, frequency, offset, start, end, step)
+        if key == self.cacheKey:
+            return
+        count = int(math.floor((end - start) / step + kCacheTolerance)) + 1 if step > 0 and end >= start else 0
+        inputs = [start + i * step for i in range(count)]
+        self.cacheTable = array.array('f', sineValues(inputs, amplitude, frequency, offset))
+        self.cacheKey = key
+
+    # Baked output of an input, None if it isn't on a baked sample
+    def lookup(self, inputValue):
+        start, step = self.cacheKey[3], self.cacheKey[5]
+        position = (inputValue - start) / step
+        index = int(round(position))
+        if 0 <= index < len(self.cacheTable) and abs(position - index) < kCacheTolerance:
+            return self.cacheTable[index]
+        return None
 
     def compute(self, plug, block):
         #print("> compute")
         
         inputValue = block.inputValue(sineNode.aInput).asFloat()
+        if self.cacheValid:
+            result = self.lookup(inputValue)
+            if result is not None:
+                block.outputValue(sineNode.aOutput).setFloat(result)
+                block.setClean(plug)
+                return
+
         amplitude = block.inputValue(sineNode.aAmplitude).asFloat()
         frequency = block.inputValue(sineNode.aFrequency).asFloat()
         offset = block.inputValue(sineNode.aOffset).asFloat()
         outputData = block.outputValue(sineNode.aOutput)
 
-        result = math.sin(inputValue * frequency) * amplitude + offset
+        result = None
+        if block.inputValue(sineNode.aCache).asBool():
+            self.bake(amplitude, frequency, offset,
+                      block.inputValue(sineNode.aCacheStart).asFloat(),
+                      block.inputValue(sineNode.aCacheEnd).asFloat(),
+                      block.inputValue(sineNode.aCacheStep).asFloat())
+            self.cacheValid = True
+            result = self.lookup(inputValue)
+        elif self.cacheTable is not None:
+            self.cacheKey = None
+            self.cacheTable = None
+
+        if result is None:
+            result = math.sin(inputValue * frequency) * amplitude + offset
         outputData.setFloat(result)
         
         block.setClean(plug)
 
-        return OpenMaya.MStatus.kSuccess
+"""
+    Array variant of sineNode: the input is a double array, one value per
+    channel, and the output array holds the sine of every channel,
+    computed in one go. One node drives a whole rig of oscillating
+    channels instead of one node per channel.
+"""
+class sineArrayNode(OpenMaya.MPxNode):
+    aInput = OpenMaya.MObject()
+    aAmplitude = OpenMaya.MObject()
+    aFrequency = OpenMaya.MObject()
+    aOffset = OpenMaya.MObject()
+    aOutput = OpenMaya.MObject()
+
+    def __init__(self):
+        OpenMaya.MPxNode.__init__(self)
+
+    def compute(self, plug, block):
+        if plug != sineArrayNode.aOutput:
+            return None
+
+        inputArray = OpenMaya.MFnDoubleArrayData(block.inputValue(sineArrayNode.aInput).data()).array()
+        amplitude = block.inputValue(sineArrayNode.aAmplitude).asDouble()
+        frequency = block.inputValue(sineArrayNode.aFrequency).asDouble()
+        offset = block.inputValue(sineArrayNode.aOffset).asDouble()
+
+        # One conversion each way, no per-element API calls
+        result = sineValues(list(inputArray), amplitude, frequency, offset)
+        outputData = block.outputValue(sineArrayNode.aOutput)
+        outputData.setMObject(OpenMaya.MFnDoubleArrayData().create(OpenMaya.MDoubleArray(result)))
+
+        block.setClean(plug)
 
 def nodeCreator():
     #print("> nodeCreator")
-    return OpenMayaMPx.asMPxPtr(sineNode())
+    return sineNode()
+
+def arrayNodeCreator():
+    return sineArrayNode()
 
 def nodeInitializer():
     #print("> nodeInitializer")
@@ -56,27 +193,79 @@ def nodeInitializer():
     nAttr.setSoftMin(-10)
     nAttr.setSoftMax(10)
 
+    sineNode.aCache = nAttr.create("cache", "ca", OpenMaya.MFnNumericData.kBoolean, 0)
+
+    sineNode.aCacheStart = nAttr.create("cacheStart", "cst", OpenMaya.MFnNumericData.kFloat, 1)
+    sineNode.aCacheEnd = nAttr.create("cacheEnd", "cen", OpenMaya.MFnNumericData.kFloat, 120)
+    sineNode.aCacheStep = nAttr.create("cacheStep", "csp", OpenMaya.MFnNumericData.kFloat, 1)
+    nAttr.setMin(0.001)
+
     sineNode.aOutput = nAttr.create("output", "out", OpenMaya.MFnNumericData.kFloat)
-    nAttr.setWritable(False)
+    nAttr.writable = False
 
     sineNode.addAttribute(sineNode.aInput)
     sineNode.addAttribute(sineNode.aAmplitude)
     sineNode.addAttribute(sineNode.aFrequency)
     sineNode.addAttribute(sineNode.aOffset)
+    sineNode.addAttribute(sineNode.aCache)
+    sineNode.addAttribute(sineNode.aCacheStart)
+    sineNode.addAttribute(sineNode.aCacheEnd)
+    sineNode.addAttribute(sineNode.aCacheStep)
     sineNode.addAttribute(sineNode.aOutput)
 
     sineNode.attributeAffects(sineNode.aInput, sineNode.aOutput)
     sineNode.attributeAffects(sineNode.aAmplitude, sineNode.aOutput)
     sineNode.attributeAffects(sineNode.aFrequency, sineNode.aOutput)
     sineNode.attributeAffects(sineNode.aOffset, sineNode.aOutput)
+    sineNode.attributeAffects(sineNode.aCache, sineNode.aOutput)
+    sineNode.attributeAffects(sineNode.aCacheStart, sineNode.aOutput)
+    sineNode.attributeAffects(sineNode.aCacheEnd, sineNode.aOutput)
+    sineNode.attributeAffects(sineNode.aCacheStep, sineNode.aOutput)
+
+def arrayNodeInitializer():
+    tAttr = OpenMaya.MFnTypedAttribute()
+    nAttr = OpenMaya.MFnNumericAttribute()
+
+    sineArrayNode.aInput = tAttr.create("input", "in", OpenMaya.MFnData.kDoubleArray,
+                                        OpenMaya.MFnDoubleArrayData().create(OpenMaya.MDoubleArray()))
+
+    sineArrayNode.aAmplitude = nAttr.create("amplitude", "amp", OpenMaya.MFnNumericData.kDouble, 1)
+    nAttr.setSoftMin(-10)
+    nAttr.setSoftMax(10)
+
+    sineArrayNode.aFrequency = nAttr.create("frequency", "freq", OpenMaya.MFnNumericData.kDouble, 1)
+    nAttr.setSoftMin(0)
+    nAttr.setSoftMax(5)
+
+    sineArrayNode.aOffset = nAttr.create("offset", "ofs", OpenMaya.MFnNumericData.kDouble, 0)
+    nAttr.setSoftMin(-10)
+    nAttr.setSoftMax(10)
+
+    sineArrayNode.aOutput = tAttr.create("output", "out", OpenMaya.MFnData.kDoubleArray)
+    tAttr.writable = False
+    tAttr.storable = False
+
+    sineArrayNode.addAttribute(sineArrayNode.aInput)
+    sineArrayNode.addAttribute(sineArrayNode.aAmplitude)
+    sineArrayNode.addAttribute(sineArrayNode.aFrequency)
+    sineArrayNode.addAttribute(sineArrayNode.aOffset)
+    sineArrayNode.addAttribute(sineArrayNode.aOutput)
+
+    sineArrayNode.attributeAffects(sineArrayNode.aInput, sineArrayNode.aOutput)
+    sineArrayNode.attributeAffects(sineArrayNode.aAmplitude, sineArrayNode.aOutput)
+    sineArrayNode.attributeAffects(sineArrayNode.aFrequency, sineArrayNode.aOutput)
+    sineArrayNode.attributeAffects(sineArrayNode.aOffset, sineArrayNode.aOutput)
 
 def initializePlugin(mobject):
     #print("> initializePlugin")
-    fnPlugin = OpenMayaMPx.MFnPlugin(mobject)
-    fn.Plugin.registerNode(kPluginNodeTypeName, kPluginNodeId, nodeCreator, 
-                        nodeInitializer, OpenMayaMPx.MPxNode.kDependNode)
+    fnPlugin = OpenMaya.MFnPlugin(mobject)
+    fnPlugin.registerNode(kPluginNodeTypeName, kPluginNodeId, nodeCreator,
+                          nodeInitializer, OpenMaya.MPxNode.kDependNode)
+    fnPlugin.registerNode(kArrayNodeTypeName, kArrayNodeId, arrayNodeCreator,
+                          arrayNodeInitializer, OpenMaya.MPxNode.kDependNode)
 
 def uninitializePlugin(mobject):
     #print("> uninitializePlugin")
-    fnPlugin = OpenMayaMPx.MFnPlugin(mobject)
-    fn.Plugin.deregisterNode(kPluginNodeId)
+    fnPlugin = OpenMaya.MFnPlugin(mobject)
+    fnPlugin.deregisterNode(kArrayNodeId)
+    fnPlugin.deregisterNode(kPluginNodeId)
@@ -0,0 +1,79 @@
+##################################################################
+#        BENCHMARK THE SINENODE CACHE (RUN WITH MAYAPY)           #
+##################################################################
+#
+#   mayapy sineWave_benchmark.py 100 1000
+#
+#   Creates sineNodes driven by a linear animation curve over frames
+#   1..120, plays the range through once with the cache off and once with
+#   it on and prints the DG evaluation time of both. Can also be run from
+#   the script editor: run().
+
+import os
+import sys
+import time
+
+import maya.cmds as mc
+
+
+PLUGIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sineWave.py")
+
+
+# sineNodes with their input keyed linearly from start to end
+def make_nodes(count, start, end):
+    nodes = []
+    for i in range(count):
+        node = mc.createNode("sineNode")
+        mc.setAttr(node + ".frequency", 0.1 + i * 0.001)
+        mc.setKeyframe(node, attribute="input", time=start, value=start, inTangentType="linear", outTangentType="linear")
+        mc.setKeyframe(node, attribute="input", time=end, value=end, inTangentType="linear", outTangentType="linear")
+        mc.setAttr(node + ".cacheStart", start)
+        mc.setAttr(node + ".cacheEnd", end)
+        nodes.append(node)
+    return nodes
+
+
+# Time to evaluate every node on every frame of the range
+def play(nodes, start, end):
+    begin = time.time()
+    for frame in range(int(start), int(end) + 1):
+        mc.currentTime(frame, update=False)
+        for node in nodes:
+            mc.getAttr(node + ".output")
+    return time.time() - begin
+
+
+"""
+    Desc:
+        Compare playing sineNodes with and without the cache
+    Parameters:
+        counts: numbers of nodes to compare with
+        start, end: frame range
+        loops: number of times the range is played
+    Returns:
+        list of (node count, seconds without cache, seconds with cache)
+"""
+def run(counts=(100, 1000), start=1, end=120, loops=3):
+    if not mc.pluginInfo(PLUGIN, query=True, loaded=True):
+        mc.loadPlugin(PLUGIN)
+
+    results = []
+    for count in counts:
+        mc.file(new=True, force=True)
+        nodes = make_nodes(count, start, end)
+        timings = []
+        for cache in (False, True):
+            for node in nodes:
+                mc.setAttr(node + ".cache", cache)
+            # The first loop with the cache on includes the bake
+            timings.append(sum(play(nodes, start, end) for i in range(loops)))
+        print("%6d nodes  %d frames x %d  no cache: %.3fs  cache: %.3fs"
+              % (count, end - start + 1, loops, timings[0], timings[1]))
+        results.append((count, timings[0], timings[1]))
+    return results
+
+
+if __name__ == '__main__':
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    run([int(arg) for arg in sys.argv[1:]] or (100, 1000))